@@ -1,6 +1,15 @@
 from django.contrib import admin
-from .models import Supplier, SupplierStock, EstablishmentStock
+from .models import Supplier, SupplierStock, Establishment, EstablishmentStock, StockForecast, StockMovement, StockSnapshot, PriceChange, ProductionPlan, ProductionPlanItem, PurchaseOrder, PurchaseOrderLine
 
 admin.site.register(Supplier)
 admin.site.register(SupplierStock)
+admin.site.register(Establishment)
 admin.site.register(EstablishmentStock)
+admin.site.register(StockForecast)
+admin.site.register(StockMovement)
+admin.site.register(StockSnapshot)
+admin.site.register(PriceChange)
+admin.site.register(ProductionPlan)
+admin.site.register(ProductionPlanItem)
+admin.site.register(PurchaseOrder)
+admin.site.register(PurchaseOrderLine)
@@ -0,0 +1,30 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+
+from tochinalli_project.api import CachedJSONView
+from .models import Supplier, SupplierStock, EstablishmentStock
+
+
+class SupplierListAPIView(LoginRequiredMixin, CachedJSONView):
+    def get_version_keys(self, **kwargs):
+        return [('suppliers',)]
+
+    def get_payload(self, **kwargs):
+        return list(Supplier.objects.order_by('pk').values('id', 'name', 'contact_info'))
+
+
+class SupplierStockListAPIView(LoginRequiredMixin, CachedJSONView):
+    def get_version_keys(self, **kwargs):
+        return [('supplier_stock',)]
+
+    def get_payload(self, **kwargs):
+        return list(SupplierStock.objects.order_by('pk').values(
+            'id', 'supplier_id', 'ingredient_id', 'quantity', 'unit', 'price',
+        ))
+
+
+class EstablishmentStockListAPIView(LoginRequiredMixin, CachedJSONView):
+    def get_version_keys(self, **kwargs):
+        return [('establishment_stock',)]
+
+    def get_payload(self, **kwargs):
+        return list(EstablishmentStock.objects.order_by('pk').values('id', 'establishment_id', 'ingredient_id', 'quantity', 'unit'))
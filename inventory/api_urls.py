@@ -0,0 +1,10 @@
+from django.urls import path
+from .api import SupplierListAPIView, SupplierStockListAPIView, EstablishmentStockListAPIView
+
+app_name = 'inventory_api'
+
+urlpatterns = [
+    path('suppliers/', SupplierListAPIView.as_view(), name='supplier_list'),
+    path('supplier-stock/', SupplierStockListAPIView.as_view(), name='supplier_stock_list'),
+    path('establishment-stock/', EstablishmentStockListAPIView.as_view(), name='establishment_stock_list'),
+]
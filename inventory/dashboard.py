@@ -0,0 +1,82 @@
+"""Inventory dashboard aggregates, written against the async ORM.
+
+Each aggregate is independent, so dashboard() awaits them together instead of one after
+the other.
+"""
+import asyncio
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+
+from recipes.costing import CENT
+from recipes.models import RecipeCost
+from recipes.units import get_unit_table
+from .models import EstablishmentStock, IngredientBestPrice, PurchaseOrder, PurchaseOrderLine
+
+LOW_STOCK_THRESHOLD = Decimal('5')  # Quantity in the stock's own unit at or below which it counts as low
+TOP = 10
+
+
+async def stock_value():
+    """(value of the establishment stock at the cheapest supplier prices, stock rows without a price)."""
+    table = await sync_to_async(get_unit_table)()
+    prices = {
+        (ingredient_id, base_unit): price
+        async for ingredient_id, base_unit, price in IngredientBestPrice.objects.filter(
+            ingredient__establishment_stock__isnull=False,
+        ).values_list('ingredient_id', 'base_unit', 'unit_price')
+    }
+    total, unpriced = Decimal(0), 0
+    async for ingredient_id, quantity, unit in EstablishmentStock.objects.values_list('ingredient_id', 'quantity', 'unit'):
+        base_quantity, base_unit = table.try_normalize(ingredient_id, quantity, unit)
+        price = prices.get((ingredient_id, base_unit))
+        if price is None:
+            unpriced += 1
+        else:
+            total += base_quantity * price
+    return total.quantize(CENT), unpriced
+
+
+async def low_stock_count(threshold=LOW_STOCK_THRESHOLD):
+    return await EstablishmentStock.objects.filter(quantity__lte=threshold).acount()
+
+
+async def supplier_spend(limit=TOP):
+    """Suppliers with the largest sent or received orders, with what is still in draft orders."""
+    line_total = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=20, decimal_places=2))
+    rows = (
+        PurchaseOrderLine.objects.values('order__supplier_id', 'order__supplier__name')
+        .annotate(
+            spend=Sum(line_total, filter=~Q(order__status=PurchaseOrder.DRAFT), default=0),
+            drafted=Sum(line_total, filter=Q(order__status=PurchaseOrder.DRAFT), default=0),
+        )
+        .order_by('-spend', '-drafted', 'order__supplier__name')[:limit]
+    )
+    return [
+        {'supplier_id': row['order__supplier_id'], 'supplier': row['order__supplier__name'], 'spend': row['spend'], 'drafted': row['drafted']}
+        async for row in rows
+    ]
+
+
+async def expensive_recipes(limit=TOP):
+    """Recipes with the highest stored cost. Recipes not priced since their last change are left out."""
+    rows = RecipeCost.objects.order_by('-total', 'recipe_id').values('recipe_id', 'recipe__name', 'total', 'unpriced_lines')[:limit]
+    return [
+        {'recipe_id': row['recipe_id'], 'recipe': row['recipe__name'], 'total': row['total'], 'unpriced_lines': row['unpriced_lines']}
+        async for row in rows
+    ]
+
+
+async def dashboard(threshold=LOW_STOCK_THRESHOLD, limit=TOP):
+    (value, unpriced), low_stock, spend, recipes = await asyncio.gather(
+        stock_value(), low_stock_count(threshold), supplier_spend(limit), expensive_recipes(limit),
+    )
+    return {
+        'stock_value': value,
+        'unpriced_stock': unpriced,
+        'low_stock': low_stock,
+        'low_stock_threshold': threshold,
+        'supplier_spend': spend,
+        'expensive_recipes': recipes,
+    }
@@ -0,0 +1,22 @@
+from tochinalli_project.exports import CHUNK_SIZE, Dataset
+from .models import SupplierStock, EstablishmentStock
+
+
+class SupplierStockDataset(Dataset):
+    name = 'supplier_stock'
+    columns = ('id', 'supplier_id', 'supplier', 'ingredient_id', 'ingredient', 'quantity', 'unit', 'price')
+
+    def rows(self):
+        return SupplierStock.objects.order_by('pk').values_list(
+            'pk', 'supplier_id', 'supplier__name', 'ingredient_id', 'ingredient__name', 'quantity', 'unit', 'price',
+        ).iterator(chunk_size=CHUNK_SIZE)
+
+
+class EstablishmentStockDataset(Dataset):
+    name = 'establishment_stock'
+    columns = ('id', 'establishment_id', 'establishment', 'ingredient_id', 'ingredient', 'quantity', 'unit')
+
+    def rows(self):
+        return EstablishmentStock.objects.order_by('pk').values_list(
+            'pk', 'establishment_id', 'establishment__name', 'ingredient_id', 'ingredient__name', 'quantity', 'unit',
+        ).iterator(chunk_size=CHUNK_SIZE)
@@ -0,0 +1,160 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from recipes.units import UnitConversionError, get_unit_table
+from tochinalli_project.cache_versions import bump_version
+from .ledger import OUTFLOWS
+from .models import EstablishmentStock, IngredientBestPrice, StockForecast, StockMovement
+
+HISTORY_DAYS = 730
+SEASON = 7  # Weekly seasonality
+ALPHAS = np.array([0.05, 0.1, 0.2, 0.4])  # Level smoothing factors tried for every ingredient
+GAMMA = 0.1  # Seasonal smoothing factor
+SERVICE_LEVEL_Z = 1.65  # Safety stock covering about 95% of lead times
+COVER_DAYS = 7  # An order tops the stock up to the reorder point plus this many days of demand
+DEFAULT_LEAD_TIME_DAYS = 2  # For ingredients no supplier offers
+BLOCK_SIZE = 4096  # Stock rows fitted together, bounding memory to BLOCK_SIZE * days floats per smoothing factor
+FORECAST_FIELDS = (
+    'unit', 'daily_demand', 'demand_deviation', 'smoothing', 'lead_time_days', 'safety_stock', 'reorder_point',
+    'order_quantity', 'computed_at',
+)
+
+
+def fit_smoothing(demand):
+    """Fit additive exponential smoothing with weekly seasonality to every row of a (series, days) array.
+
+    The series are updated together one day at a time, and every factor in ALPHAS runs side
+    by side; each series keeps the factor with the lowest squared one-step error. Returns
+    (level, seasonal, alpha, deviation), seasonal being (series, SEASON) indexed by day number
+    modulo SEASON.
+    """
+    series, days = demand.shape
+    warmup = min(2 * SEASON, days)
+    level = demand[:, :warmup].mean(axis=1) if warmup else np.zeros(series)
+    seasonal = np.zeros((series, SEASON))
+    for slot in range(min(SEASON, warmup)):
+        seasonal[:, slot] = demand[:, slot:warmup:SEASON].mean(axis=1) - level
+    level = np.repeat(level[None, :], len(ALPHAS), axis=0)
+    seasonal = np.repeat(seasonal[None, :, :], len(ALPHAS), axis=0)
+    alphas = ALPHAS[:, None]
+    sse = np.zeros((len(ALPHAS), series))
+    for day in range(warmup, days):
+        slot = day % SEASON
+        error = demand[:, day] - level - seasonal[:, :, slot]
+        sse += error * error
+        level += alphas * error
+        seasonal[:, :, slot] += GAMMA * error
+    best, rows = sse.argmin(axis=0), np.arange(series)
+    deviation = np.sqrt(sse[best, rows] / max(days - warmup, 1))
+    return level[best, rows], seasonal[best, rows], ALPHAS[best], deviation
+
+
+def load_demand(stocks, since, days):
+    """Daily outflows of each stock row as a (rows, days) array in the stock unit, oldest day first."""
+    rows = {(stock.establishment_id, stock.ingredient_id): row for row, stock in enumerate(stocks)}
+    units = {key: stocks[row].unit for key, row in rows.items()}
+    first_day = timezone.localtime(since).date()
+    totals = (
+        StockMovement.objects
+        .filter(
+            establishment_id__in={site for site, ingredient_id in rows},
+            ingredient_id__in={ingredient_id for site, ingredient_id in rows},
+            kind__in=OUTFLOWS, created_at__gte=since, created_at__lt=since + timedelta(days=days),
+        )
+        .annotate(day=TruncDate('created_at'))
+        .values('establishment_id', 'ingredient_id', 'unit', 'day')
+        .annotate(total=Sum('quantity'))
+        .values_list('establishment_id', 'ingredient_id', 'unit', 'day', 'total')
+        .order_by()
+    )
+    table = get_unit_table()
+    demand = np.zeros((len(stocks), days))
+    for site, ingredient_id, unit, day, total in totals:
+        key = (site, ingredient_id)
+        if key not in rows:  # Another site's stock of an ingredient in this block
+            continue
+        if unit != units[key]:
+            # Movements keep the unit the stock had when they were recorded.
+            try:
+                total = table.convert(ingredient_id, total, unit, units[key])
+            except UnitConversionError:
+                continue
+        demand[rows[key], (day - first_day).days] -= float(total)
+    return demand
+
+
+def lead_times(ingredient_ids):
+    """{ingredient_id: days} for the suppliers currently offering the best price."""
+    return dict(
+        IngredientBestPrice.objects
+        .filter(ingredient_id__in=list(ingredient_ids))
+        .values('ingredient_id')
+        .annotate(days=Min('supplier_stock__supplier__lead_time_days'))
+        .values_list('ingredient_id', 'days')
+        .order_by()
+    )
+
+
+def _decimal(value):
+    return Decimal(f'{value:.2f}')
+
+
+def forecast_block(stocks, since, days, computed_at):
+    demand = load_demand(stocks, since, days)
+    level, seasonal, alpha, deviation = fit_smoothing(demand)
+    leads = lead_times(stock.ingredient_id for stock in stocks)
+    lead_days = np.array([leads.get(stock.ingredient_id, DEFAULT_LEAD_TIME_DAYS) for stock in stocks], dtype=int)
+    on_hand = np.array([float(stock.quantity) for stock in stocks])
+
+    # Demand for each coming day, then summed up to the end of the lead time and of the cover.
+    future = (days + np.arange(lead_days.max() + COVER_DAYS)) % SEASON
+    daily = np.maximum(level[:, None] + seasonal[:, future], 0)
+    cumulative = np.concatenate([np.zeros((len(stocks), 1)), daily.cumsum(axis=1)], axis=1)
+    rows = np.arange(len(stocks))
+    lead_demand = cumulative[rows, lead_days]
+    cover_demand = cumulative[rows, lead_days + COVER_DAYS] - lead_demand
+    safety_stock = SERVICE_LEVEL_Z * deviation * np.sqrt(lead_days)
+    reorder_point = lead_demand + safety_stock
+    order_quantity = np.where(on_hand <= reorder_point, np.maximum(reorder_point + cover_demand - on_hand, 0), 0)
+    daily_demand = daily[:, :SEASON].mean(axis=1)
+
+    forecasts = [
+        StockForecast(
+            stock=stock, unit=stock.unit, daily_demand=_decimal(daily_demand[row]),
+            demand_deviation=_decimal(deviation[row]), smoothing=_decimal(alpha[row]), lead_time_days=lead_days[row],
+            safety_stock=_decimal(safety_stock[row]), reorder_point=_decimal(reorder_point[row]),
+            order_quantity=_decimal(order_quantity[row]), computed_at=computed_at,
+        )
+        for row, stock in enumerate(stocks)
+    ]
+    StockForecast.objects.bulk_create(
+        forecasts, batch_size=1000, update_conflicts=True, unique_fields=['stock'], update_fields=FORECAST_FIELDS,
+    )
+    return len(forecasts)
+
+
+def forecast_stock(until=None, days=HISTORY_DAYS, block_size=BLOCK_SIZE):
+    """Refit every establishment stock forecast from the ``days`` full days of outflows before ``until``.
+
+    ``until`` defaults to the start of today. Stock rows are handled in blocks whose series
+    are fitted together, so the work per block is a fixed number of queries and array
+    operations whatever the number of ingredients. Returns the number of forecasts written.
+    """
+    until = until or timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    since = until - timedelta(days=days)
+    computed_at = timezone.now()
+    stocks = EstablishmentStock.objects.order_by('pk').only('pk', 'establishment_id', 'ingredient_id', 'quantity', 'unit')
+    written, last = 0, 0
+    while True:
+        block = list(stocks.filter(pk__gt=last)[:block_size])
+        if not block:
+            break
+        written += forecast_block(block, since, days, computed_at)
+        last = block[-1].pk
+    bump_version('establishment_stock')
+    return written
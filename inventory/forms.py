@@ -1,17 +1,70 @@
 from django import forms
-from .models import Supplier, SupplierStock, EstablishmentStock
+from recipes.forms import IngredientAutocompleteMixin, UnitValidationMixin
+from .models import Supplier, SupplierStock, Establishment, EstablishmentStock, StockMovement, ProductionPlan, ProductionPlanItem
 
 class SupplierForm(forms.ModelForm):
     class Meta:
         model = Supplier
-        fields = ['name', 'contact_info']
+        fields = ['name', 'contact_info', 'lead_time_days']
 
-class SupplierStockForm(forms.ModelForm):
+class SupplierStockForm(IngredientAutocompleteMixin, UnitValidationMixin, forms.ModelForm):
     class Meta:
         model = SupplierStock
         fields = ['ingredient', 'quantity', 'unit', 'price']
 
-class EstablishmentStockForm(forms.ModelForm):
+class EstablishmentForm(forms.ModelForm):
+    class Meta:
+        model = Establishment
+        fields = ['name', 'address']
+
+class EstablishmentStockForm(IngredientAutocompleteMixin, UnitValidationMixin, forms.ModelForm):
     class Meta:
         model = EstablishmentStock
         fields = ['ingredient', 'quantity', 'unit']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            # Editing counts this row's stock, another ingredient would be another row.
+            field = self.fields['ingredient']
+            field.disabled = True
+            if self.is_bound:
+                field.widget.label = self.instance.ingredient.name
+
+    def clean_ingredient(self):
+        # The establishment is not a form field, so the unique constraint is checked here.
+        ingredient = self.cleaned_data['ingredient']
+        stock = EstablishmentStock.objects.for_establishment(self.instance.establishment_id).filter(ingredient=ingredient)
+        if stock.exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError(f'{ingredient.name} is already stocked here, edit its row instead.')
+        return ingredient
+
+class StockMovementForm(IngredientAutocompleteMixin, UnitValidationMixin, forms.ModelForm):
+    class Meta:
+        model = StockMovement
+        fields = ['ingredient', 'kind', 'quantity', 'unit', 'note']
+        help_texts = {'quantity': 'Amount received, used or wasted. Adjustments may be negative.'}
+
+class PriceListImportForm(forms.Form):
+    supplier = forms.ModelChoiceField(queryset=Supplier.objects.all())
+    price_list = forms.FileField(help_text='CSV with ingredient, quantity, unit and price columns, or JSON / JSON Lines with the same keys.')
+    dry_run = forms.BooleanField(required=False)
+    background = forms.BooleanField(required=False, help_text='Import with the background job queue instead of waiting for it.')
+
+class ProductionPlanForm(forms.ModelForm):
+    class Meta:
+        model = ProductionPlan
+        fields = ['name', 'date']
+
+class ProductionPlanItemForm(forms.ModelForm):
+    class Meta:
+        model = ProductionPlanItem
+        fields = ['recipe', 'portions']
+
+PlanItemFormSet = forms.inlineformset_factory(
+    ProductionPlan,
+    ProductionPlanItem,
+    form=ProductionPlanItemForm,
+    extra=3,
+    can_delete=True
+)
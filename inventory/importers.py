@@ -0,0 +1,206 @@
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from recipes.costing import invalidate_ingredients
+from recipes.models import Ingredient
+from recipes.units import UnitConversionError, get_unit_table
+from tochinalli_project.cache_versions import bump_version
+from .models import SupplierStock
+from .price_history import record_price_changes
+from .procurement import refresh_best_prices
+
+FIELDS = ('ingredient', 'quantity', 'unit', 'price')
+MAX_VALUE = Decimal('1e8')  # SupplierStock decimals hold 10 digits, 2 of them decimal places
+MAX_ITEM_SIZE = 1 << 20  # Characters buffered for one item before it is rejected as invalid
+
+
+class PriceListError(ValueError):
+    pass
+
+
+def iter_csv(stream):
+    reader = csv.DictReader(stream)
+    missing = set(FIELDS) - set(reader.fieldnames or ())
+    if missing:
+        raise PriceListError(f"Missing columns: {', '.join(sorted(missing))}")
+    yield from reader
+
+
+def iter_json(stream, buffer_size=65536, max_item_size=MAX_ITEM_SIZE):
+    """Yield objects from a JSON array or JSON Lines stream without loading it whole.
+
+    Items that are not objects, and items that still do not decode once ``max_item_size``
+    characters are buffered or the stream ends, raise PriceListError naming the item.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, started, number = '', 0, False, 0
+    while True:
+        chunk = stream.read(buffer_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer) and buffer[position] == '[':
+                position += 1
+                started = True
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                obj, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk and not buffer[position:].strip():
+                    return
+                if not chunk or len(buffer) - position > max_item_size:
+                    raise PriceListError(f'Invalid JSON in item {number + 1} of the price list')
+                break
+            started = True
+            position = end
+            number += 1
+            if not isinstance(obj, dict):
+                raise PriceListError(f'Item {number} of the price list is not an object')
+            yield obj
+        if not chunk:
+            return
+
+
+def _text(row, key):
+    value = row.get(key)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise PriceListError(f"'{key}' must be text, not {type(value).__name__}")
+    return value.strip()
+
+
+def _decimal(row, key):
+    """The field as a finite decimal to hundredths; JSON price lists may give numbers."""
+    value = row.get(key)
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise TypeError(key)
+    value = Decimal(str(value).strip()).quantize(Decimal('0.01'))
+    if not value.is_finite():
+        raise InvalidOperation(key)
+    return value
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    rejected: int = 0
+    elapsed: float = 0.0
+    rejects: list = field(default_factory=list)  # (row number, reason), first max_samples only
+    diffs: list = field(default_factory=list)  # (ingredient, old price, new price), first max_samples only
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+class PriceListImporter:
+    """Upserts a supplier's price list into SupplierStock, one transaction per chunk.
+
+    Ingredients are matched by case-insensitive name against an index loaded once, and the
+    supplier's current stock rows are loaded once, so each chunk costs a bulk insert and a
+    bulk update regardless of its size.
+    """
+
+    def __init__(self, supplier, chunk_size=2000, dry_run=False, max_samples=50):
+        self.supplier = supplier
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.max_samples = max_samples
+        self.ingredients = {name.casefold(): (pk, name) for name, pk in Ingredient.objects.values_list('name', 'pk')}
+        self.existing = {
+            (stock.supplier_id, stock.ingredient_id): stock
+            for stock in SupplierStock.objects.filter(supplier=supplier).only('pk', 'supplier_id', 'ingredient_id', 'quantity', 'unit', 'price')
+        }  # One row per supplier and ingredient, see unique_supplier_ingredient
+        self.units = get_unit_table()
+
+    def run(self, rows, progress=None):
+        """Import the rows, calling ``progress(report)`` after each chunk when given."""
+        report = ImportReport()
+        started = time.perf_counter()
+        chunk = {}
+        for number, row in enumerate(rows, start=1):
+            report.rows += 1
+            try:
+                ingredient_id, name, values = self.parse(row)
+            except PriceListError as exc:
+                report.rejected += 1
+                if len(report.rejects) < self.max_samples:
+                    report.rejects.append((number, str(exc)))
+                continue
+            chunk[ingredient_id] = (name, values)
+            if len(chunk) >= self.chunk_size:
+                self.apply(chunk, report)
+                chunk = {}
+                if progress is not None:
+                    progress(report)
+        if chunk:
+            self.apply(chunk, report)
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def parse(self, row):
+        name = _text(row, 'ingredient')
+        match = self.ingredients.get(name.casefold())
+        if match is None:
+            raise PriceListError(f"Unknown ingredient '{name}'")
+        ingredient_id, name = match
+        try:
+            quantity, price = _decimal(row, 'quantity'), _decimal(row, 'price')
+        except (InvalidOperation, TypeError):
+            raise PriceListError(f"Invalid quantity or price for '{name}'")
+        if not (0 <= quantity < MAX_VALUE and 0 <= price < MAX_VALUE):
+            raise PriceListError(f"Quantity or price out of range for '{name}'")
+        unit = _text(row, 'unit')
+        try:
+            self.units.resolve(ingredient_id, unit)
+        except UnitConversionError:
+            raise PriceListError(f"Unknown unit '{unit}' for '{name}'")
+        return ingredient_id, name, {'quantity': quantity, 'unit': unit, 'price': price}
+
+    def apply(self, chunk, report):
+        to_create, to_update, repriced = [], [], []
+        for ingredient_id, (name, values) in chunk.items():
+            stock = self.existing.get((self.supplier.pk, ingredient_id))
+            if stock is None:
+                stock = SupplierStock(supplier=self.supplier, ingredient_id=ingredient_id, ingredient_name=name, **values)
+                to_create.append(stock)
+                continue
+            if all(getattr(stock, key) == value for key, value in values.items()):
+                report.unchanged += 1
+                continue
+            if stock.price != values['price'] or stock.unit != values['unit']:
+                repriced.append(stock)
+            if stock.price != values['price'] and len(report.diffs) < self.max_samples:
+                report.diffs.append((name, stock.price, values['price']))
+            for key, value in values.items():
+                setattr(stock, key, value)
+            to_update.append(stock)
+        report.created += len(to_create)
+        report.updated += len(to_update)
+        for stock in to_create:
+            self.existing[(stock.supplier_id, stock.ingredient_id)] = stock
+        if self.dry_run:
+            return
+        with transaction.atomic():
+            SupplierStock.objects.bulk_create(to_create, batch_size=500)
+            SupplierStock.objects.bulk_update(to_update, ['quantity', 'unit', 'price'], batch_size=500)
+            record_price_changes(
+                (stock.ingredient_id, self.supplier.pk, stock.unit, stock.price) for stock in to_create + repriced
+            )
+            ingredient_ids = [stock.ingredient_id for stock in to_create + to_update]
+            refresh_best_prices(ingredient_ids)
+            invalidate_ingredients(ingredient_ids)
+        bump_version('supplier_stock')
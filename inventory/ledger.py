@@ -0,0 +1,137 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from recipes.units import get_unit_table
+from tochinalli_project.cache_versions import bump_version
+from .models import EstablishmentStock, StockMovement, StockSnapshot
+
+CENT = Decimal('0.01')
+OUTFLOWS = (StockMovement.CONSUMPTION, StockMovement.WASTE)
+
+
+def _apply(establishment_id, ingredient_id, kind, quantity, unit, note, created_at):
+    """Append a movement in the stock unit and increment the balance in the database."""
+    stock = EstablishmentStock.objects.filter(establishment_id=establishment_id, ingredient_id=ingredient_id)
+    stock_unit = stock.values_list('unit', flat=True).first()
+    if stock_unit is None:
+        stock_unit = EstablishmentStock.objects.get_or_create(
+            establishment_id=establishment_id, ingredient_id=ingredient_id, defaults={'quantity': Decimal(0), 'unit': unit},
+        )[0].unit
+    if stock_unit != unit:
+        quantity = get_unit_table().convert(ingredient_id, quantity, unit, stock_unit)
+    quantity = quantity.quantize(CENT)
+    movement = StockMovement.objects.create(
+        establishment_id=establishment_id, ingredient_id=ingredient_id, kind=kind, quantity=quantity, unit=stock_unit,
+        note=note, created_at=created_at or timezone.now(),
+    )
+    stock.update(quantity=F('quantity') + quantity)
+    return movement
+
+
+def record_movement(establishment_id, ingredient_id, kind, quantity, unit, note='', created_at=None):
+    """Record a receipt, consumption, waste or adjustment and apply it to the establishment's balance.
+
+    Consumption and waste are given as amounts taken out and stored negated. The balance is
+    changed with an in-database increment in the same transaction as the ledger row, so
+    concurrent movements on one ingredient never overwrite each other.
+    """
+    quantity = Decimal(quantity)
+    if kind in OUTFLOWS:
+        quantity = -abs(quantity)
+    elif kind == StockMovement.RECEIPT:
+        quantity = abs(quantity)
+    with transaction.atomic():
+        movement = _apply(establishment_id, ingredient_id, kind, quantity, unit, note, created_at)
+    bump_version('establishment_stock')
+    return movement
+
+
+def record_count(establishment_id, ingredient_id, counted, unit, note='Stock count'):
+    """Set the balance to a counted quantity through an adjustment for the difference.
+
+    A different unit becomes the new stock unit, converting the current balance.
+    """
+    with transaction.atomic():
+        stock = (
+            EstablishmentStock.objects.select_for_update()
+            .filter(establishment_id=establishment_id, ingredient_id=ingredient_id)
+            .first()
+        )
+        if stock is not None and stock.unit != unit:
+            current = get_unit_table().convert(ingredient_id, stock.quantity, stock.unit, unit).quantize(CENT)
+            EstablishmentStock.objects.filter(pk=stock.pk).update(quantity=current, unit=unit)
+        else:
+            current = stock.quantity if stock is not None else Decimal(0)
+        movement = _apply(establishment_id, ingredient_id, StockMovement.ADJUSTMENT, Decimal(counted) - current, unit, note, None)
+    bump_version('establishment_stock')
+    return movement
+
+
+def _watermark(when):
+    """Time of the latest compaction at or before ``when``, None before the first one."""
+    return StockSnapshot.objects.filter(taken_at__lte=when).order_by('-taken_at').values_list('taken_at', flat=True).first()
+
+
+def _balances(when, ingredient_ids=None, establishment_id=None):
+    """{(establishment_id, ingredient_id, unit): quantity} at ``when``."""
+    since = _watermark(when)
+    snapshots = StockSnapshot.objects.filter(taken_at=since) if since is not None else StockSnapshot.objects.none()
+    movements = StockMovement.objects.filter(created_at__lte=when)
+    if since is not None:
+        movements = movements.filter(created_at__gt=since)
+    if establishment_id is not None:
+        snapshots = snapshots.for_establishment(establishment_id)
+        movements = movements.for_establishment(establishment_id)
+    if ingredient_ids is not None:
+        ingredient_ids = list(ingredient_ids)
+        snapshots = snapshots.filter(ingredient_id__in=ingredient_ids)
+        movements = movements.filter(ingredient_id__in=ingredient_ids)
+    movements = movements.values('establishment_id', 'ingredient_id', 'unit').annotate(total=Sum('quantity')).order_by()
+    table = get_unit_table()
+    balances = defaultdict(Decimal)
+    for site, ingredient_id, quantity, unit in snapshots.values_list('establishment_id', 'ingredient_id', 'quantity', 'unit'):
+        balances[(site, ingredient_id, unit)] += quantity
+    for row in movements:
+        quantity, unit = table.try_normalize(row['ingredient_id'], row['total'], row['unit'])
+        balances[(row['establishment_id'], row['ingredient_id'], unit)] += quantity
+    return balances
+
+
+def stock_as_of(when, ingredient_ids=None, establishment_id=None):
+    """Balances at a point in time, as {(ingredient_id, base unit): quantity}.
+
+    Covers one establishment, or all of them added up when ``establishment_id`` is None.
+    Balances start from the latest compaction at or before ``when`` and add only the
+    movements after it; both are index ranges, so the cost is bounded by the snapshot
+    interval rather than by the length of the ledger.
+    """
+    totals = defaultdict(Decimal)
+    for (site, ingredient_id, unit), quantity in _balances(when, ingredient_ids, establishment_id).items():
+        totals[(ingredient_id, unit)] += quantity
+    return dict(totals)
+
+
+def compact_snapshots(until=None, lag=timedelta(minutes=1)):
+    """Snapshot every non-zero balance at ``until``, returns the number of rows written.
+
+    Each compaction carries the previous one forward with the movements since, so it costs
+    one pass over the stock plus the movements of the interval. Snapshots stop ``lag``
+    before now by default so movements still being committed are not left out of the
+    snapshot they belong to.
+    """
+    until = until or timezone.now() - lag
+    with transaction.atomic():
+        if StockSnapshot.objects.filter(taken_at=until).exists():
+            return 0
+        snapshots = [
+            StockSnapshot(establishment_id=site, ingredient_id=ingredient_id, taken_at=until, quantity=quantity, unit=unit)
+            for (site, ingredient_id, unit), quantity in _balances(until).items()
+            if quantity
+        ]
+        StockSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
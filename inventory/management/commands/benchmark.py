@@ -0,0 +1,136 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory import urls as inventory_urls
+from inventory.ledger import stock_as_of
+from inventory.models import ProductionPlan
+from inventory.planning import plan_requirements, plan_shortages
+from inventory.procurement import plan_procurement, refresh_best_prices
+from recipes import urls as recipes_urls
+from recipes.costing import compute_costs
+from recipes.models import Ingredient, Recipe
+from recipes.search import autocomplete, search
+from recipes.units import UnitTable
+from tochinalli_project.benchmarks import load_baseline, measure, regressions, save_baseline
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+SAMPLE_SIZE = 100
+
+
+def view_model(pattern):
+    view_class = getattr(pattern.callback, 'view_class', None)
+    model = getattr(view_class, 'model', None)
+    if model is None and getattr(view_class, 'queryset', None) is not None:
+        model = view_class.queryset.model
+    return model
+
+
+def url_targets(client):
+    """(name, callable) fetching every URL of the recipes and inventory apps with GET."""
+    targets = []
+    for module in (recipes_urls, inventory_urls):
+        for pattern in module.urlpatterns:
+            if not hasattr(getattr(pattern.callback, 'view_class', None), 'get'):
+                continue  # Actions such as selecting an establishment only accept POST
+            name = f'{module.app_name}:{pattern.name}'
+            kwargs = {}
+            if 'pk' in pattern.pattern.converters:
+                model = view_model(pattern)
+                pk = model.objects.order_by('pk').values_list('pk', flat=True).first() if model else None
+                if pk is None:
+                    continue
+                kwargs['pk'] = pk
+            targets.append((name, fetch(client, reverse(name, kwargs=kwargs))))
+    return targets
+
+
+def fetch(client, url):
+    def get():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'GET {url} returned {response.status_code}')
+        return b''.join(response.streaming_content) if response.streaming else response.content
+    return get
+
+
+def domain_targets():
+    """(name, callable) for the calculations behind the views, over a fixed sample of the catalog."""
+    recipe_ids = list(Recipe.objects.order_by('pk').values_list('pk', flat=True)[:SAMPLE_SIZE])
+    ingredient_ids = list(Ingredient.objects.order_by('pk').values_list('pk', flat=True)[:SAMPLE_SIZE])
+    targets = [
+        ('units.compile', UnitTable.compile),
+        ('costing.compute_costs', lambda: compute_costs(recipe_ids)),
+        ('procurement.refresh_best_prices', lambda: refresh_best_prices(ingredient_ids)),
+        ('ledger.stock_as_of', lambda: stock_as_of(timezone.now(), ingredient_ids)),
+        ('search.search', lambda: search('fresh tomato')),
+        ('search.autocomplete', lambda: autocomplete('to')),
+    ]
+    plan = ProductionPlan.objects.order_by('pk').first()
+    if plan is not None:
+        targets += [
+            ('planning.plan_requirements', lambda: plan_requirements(plan)),
+            ('procurement.plan_procurement', lambda: plan_procurement(
+                (requirement.ingredient_id, requirement.shortage, requirement.unit) for requirement in plan_shortages(plan)
+            )),
+        ]
+    return targets
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure latency percentiles, query counts and peak memory for every recipes and inventory URL '
+        'and the main domain calculations, and compare them with a saved baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', help='Only run benchmarks whose name contains this text')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--save', action='store_true', help='Save these results as the new baseline')
+        parser.add_argument('--check', action='store_true', help='Exit with an error on any regression')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative growth of latency and memory')
+
+    def handle(self, *args, **options):
+        # Views require a login; the benchmark user has no usable password.
+        user, created = User.objects.get_or_create(username='benchmark')
+        if created:
+            user.set_unusable_password()
+            user.save()
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*',) and not host.startswith('.')), 'localhost')
+        client = Client(SERVER_NAME=host)
+        client.force_login(user)
+
+        targets = url_targets(client) + domain_targets()
+        if options['only']:
+            targets = [(name, func) for name, func in targets if options['only'] in name]
+        baseline = load_baseline(options['baseline'])
+        previous = (baseline or {}).get('results', {})
+        results = []
+        self.stdout.write(f"{'benchmark':<48} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'peak KB':>9}  vs baseline p50")
+        for name, func in targets:
+            result = measure(name, func, options['iterations'], options['warmup'])
+            results.append(result)
+            row = result.as_dict()
+            before = previous.get(name)
+            change = f"{(row['p50_ms'] / before['p50_ms'] - 1) * 100:+.0f}%" if before and before['p50_ms'] else '-'
+            self.stdout.write(
+                f"{name:<48} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} "
+                f"{row['queries']:>8} {row['peak_kb']:>9.1f}  {change}"
+            )
+
+        found = regressions(results, baseline, options['tolerance'])
+        for name, metric, before, now in found:
+            self.stdout.write(self.style.WARNING(f'Regression in {name}: {metric} {before} -> {now}'))
+        if options['save']:
+            Path(options['baseline']).parent.mkdir(parents=True, exist_ok=True)
+            save_baseline(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+        if found and options['check']:
+            raise CommandError(f'{len(found)} regressions against {options["baseline"]}')
@@ -0,0 +1,101 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from inventory.models import (
+    Establishment, EstablishmentStock, IngredientBestPrice, ProductionPlan, PurchaseOrder, StockMovement, StockSnapshot, Supplier,
+    SupplierStock,
+)
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+# SQLite reports "SCAN table" and PostgreSQL "Seq Scan on table" when a whole table is read.
+FULL_SCAN = re.compile(r'\bSCAN (\w+)$|Seq Scan on (\w+)', re.MULTILINE)
+# Walking a whole index is a full scan too, unless a LIMIT stops it after one page.
+INDEX_SCAN = re.compile(r'\bSCAN (\w+) USING (?:COVERING )?INDEX')
+# Sorting the rows after reading them, the index does not give the requested order.
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR ORDER BY|\bSort Key:')
+SAMPLE_IDS = [1, 2, 3]
+
+
+def next_page(queryset, field, value):
+    """A page after a keyset cursor, filtered the way tochinalli_project.pagination does."""
+    return queryset.filter(**{f'{field}__gte': value}).filter(
+        Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': 1}),
+    ).order_by(field, 'pk')[:51]
+
+
+def hot_queries():
+    """(label, queryset) for the lookups the views, costing and planning run most."""
+    now = timezone.now()
+    since = now - timedelta(days=1)
+    return [
+        ('Cheapest offer for an ingredient', SupplierStock.objects.filter(ingredient_id=1).order_by('price')[:1]),
+        ('Offers for ingredients', SupplierStock.objects.filter(ingredient_id__in=SAMPLE_IDS, quantity__gt=0)),
+        ('Best price index', IngredientBestPrice.objects.filter(ingredient_id__in=SAMPLE_IDS)),
+        ('Supplier price list', SupplierStock.objects.filter(supplier_id=1)),
+        ('Supplier stock page', SupplierStock.objects.order_by('ingredient_name', 'pk')[:51]),
+        ('Supplier stock next page', next_page(SupplierStock.objects.all(), 'ingredient_name', 'M')),
+        ('Supplier stock next page by price', next_page(SupplierStock.objects.all(), 'price', 5)),
+        ('Supplier stock by price', SupplierStock.objects.order_by('price', 'pk')[:51]),
+        ('Recipe lines', RecipeIngredient.objects.filter(recipe_id__in=SAMPLE_IDS)),
+        ('Recipes using ingredients', RecipeIngredient.objects.filter(ingredient_id__in=SAMPLE_IDS).values('recipe_id')),
+        ('Recipes using produced ingredients', RecipeIngredient.objects.filter(ingredient__produced_by_id__in=SAMPLE_IDS)),
+        ('Sub-recipe producers', Ingredient.objects.filter(pk__in=SAMPLE_IDS, produced_by__isnull=False)),
+        ('Ingredients produced by recipes', Ingredient.objects.filter(produced_by_id__in=SAMPLE_IDS)),
+        ('Recipe list page', Recipe.objects.order_by('name', 'pk')[:51]),
+        ('Supplier list page', Supplier.objects.order_by('name', 'pk')[:51]),
+        ('Establishment list page', Establishment.objects.order_by('name', 'pk')[:51]),
+        ('Establishment stock page', EstablishmentStock.objects.filter(establishment_id=1).order_by('ingredient_name', 'pk')[:51]),
+        ('Establishment stock next page', next_page(EstablishmentStock.objects.filter(establishment_id=1), 'ingredient_name', 'M')),
+        ('Establishment stock for ingredients', EstablishmentStock.objects.filter(establishment_id=1, ingredient_id__in=SAMPLE_IDS)),
+        ('Establishment stock by quantity', EstablishmentStock.objects.filter(establishment_id=1).order_by('quantity', 'pk')[:51]),
+        ('Stock of an ingredient at every establishment', EstablishmentStock.objects.filter(ingredient_id=1)),
+        ('Movements of an ingredient', StockMovement.objects.filter(establishment_id=1, ingredient_id=1, created_at__lte=now)),
+        ('Latest stock snapshot', StockSnapshot.objects.filter(taken_at__lte=now).order_by('-taken_at').values('taken_at')[:1]),
+        ('Stock snapshot balances', StockSnapshot.objects.filter(taken_at=since, establishment_id=1, ingredient_id__in=SAMPLE_IDS)),
+        ('Movements since the snapshot', (
+            StockMovement.objects.filter(created_at__lte=now, created_at__gt=since)
+            .values('establishment_id', 'ingredient_id', 'unit').annotate(total=Sum('quantity')).order_by()
+        )),
+        ('Movements of a site since the snapshot', (
+            StockMovement.objects.filter(establishment_id=1, ingredient_id__in=SAMPLE_IDS, created_at__lte=now, created_at__gt=since)
+            .values('establishment_id', 'ingredient_id', 'unit').annotate(total=Sum('quantity')).order_by()
+        )),
+        ('Latest movements', StockMovement.objects.filter(establishment_id=1).order_by('-created_at', '-pk')[:51]),
+        ('Latest production plans', ProductionPlan.objects.filter(establishment_id=1).order_by('-date', '-pk')[:51]),
+        ('Latest purchase orders', PurchaseOrder.objects.order_by('-created_at', '-pk')[:51]),
+    ]
+
+
+def plan_problems(queryset, plan):
+    """Full scans, unbounded index scans and sorts in the plan of ``queryset``."""
+    problems = [f'full scan of {table}' for match in FULL_SCAN.findall(plan) for table in match if table]
+    if queryset.query.high_mark is None:
+        problems += [f'index scan of {table}' for table in INDEX_SCAN.findall(plan)]
+    if TEMP_SORT.search(plan):
+        problems.append('sort in a temporary B-tree')
+    return problems
+
+
+class Command(BaseCommand):
+    help = 'Print the query plan of every hot query and flag full table and index scans and sorts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Exit with an error if any hot query scans a whole table or index or sorts its rows.')
+
+    def handle(self, *args, **options):
+        scans = []
+        for label, queryset in hot_queries():
+            plan = queryset.explain()
+            problems = plan_problems(queryset, plan)
+            if problems:
+                scans.append(label)
+            status = self.style.ERROR(', '.join(problems)) if problems else self.style.SUCCESS('indexed')
+            self.stdout.write(f'{label}: {status}')
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
+        if scans and options['check']:
+            raise CommandError(f"Unindexed plans in: {', '.join(scans)}")
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.exports import EstablishmentStockDataset, SupplierStockDataset
+from recipes.exports import RecipeCostHistoryDataset, RecipeDataset
+from tochinalli_project.exports import FORMATS
+
+DATASETS = {dataset.name: dataset for dataset in (SupplierStockDataset, EstablishmentStockDataset, RecipeDataset, RecipeCostHistoryDataset)}
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a full dump of supplier stock, establishment stock, recipes or twelve months of recipe costs '
+        'as CSV or JSON Lines.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write, defaults to standard output')
+
+    def handle(self, *args, **options):
+        dataset = DATASETS[options['dataset']]()
+        started = time.perf_counter()
+        written = 0
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                for text in dataset.stream(options['format']):
+                    output.write(text)
+                    written += len(text)
+        else:
+            for text in dataset.stream(options['format']):
+                self.stdout.write(text, ending='')
+                written += len(text)
+        elapsed = time.perf_counter() - started
+        self.stderr.write(f"Exported {dataset.name} ({written} characters) in {elapsed:.2f}s")
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.forecasting import BLOCK_SIZE, HISTORY_DAYS, forecast_stock
+
+
+class Command(BaseCommand):
+    help = (
+        'Refit consumption forecasts, reorder points and suggested order quantities for all establishment stock. '
+        'Meant to run nightly.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=HISTORY_DAYS, help='Days of consumption history to fit')
+        parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help='Stock rows fitted together')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = forecast_stock(days=options['days'], block_size=options['block_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Forecast {written} stock rows in {elapsed:.2f}s"))
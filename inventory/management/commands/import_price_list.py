@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importers import PriceListError, PriceListImporter, iter_csv, iter_json
+from inventory.models import Supplier
+
+
+class Command(BaseCommand):
+    help = 'Import a supplier price list (CSV, JSON array or JSON Lines) into supplier stock.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('supplier', help='Supplier id or exact name')
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        supplier = self.get_supplier(options['supplier'])
+        path = Path(options['path'])
+        fmt = options['format'] or ('csv' if path.suffix.lower() == '.csv' else 'json')
+        importer = PriceListImporter(supplier, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+        try:
+            with path.open(encoding='utf-8-sig', newline='') as stream:
+                report = importer.run(iter_csv(stream) if fmt == 'csv' else iter_json(stream))
+        except (OSError, PriceListError) as exc:
+            raise CommandError(exc)
+
+        for number, reason in report.rejects:
+            self.stderr.write(f"Row {number}: {reason}")
+        for name, old, new in report.diffs:
+            self.stdout.write(f"{name}: {old} -> {new}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.rows} rows in {report.elapsed:.2f}s ({report.rows_per_second:.0f} rows/s): "
+            f"{report.created} created, {report.updated} updated, {report.unchanged} unchanged, "
+            f"{report.rejected} rejected{' (dry run)' if options['dry_run'] else ''}"
+        ))
+
+    def get_supplier(self, value):
+        suppliers = Supplier.objects.filter(pk=value) if value.isdigit() else Supplier.objects.filter(name=value)
+        supplier = suppliers.first()
+        if supplier is None:
+            raise CommandError(f"Supplier '{value}' does not exist")
+        return supplier
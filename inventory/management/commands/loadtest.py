@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import resolve, reverse
+
+from tochinalli_project.asgi import application
+from tochinalli_project.benchmarks import percentile
+
+DEFAULT_TARGETS = ['inventory:dashboard', 'inventory:establishment_stock_list', 'inventory:supplier_stock_list', 'recipes:recipe_list']
+
+
+async def asgi_get(path, host, cookie):
+    """Send one GET through the ASGI application, as an ASGI server would, and return the status code."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', host.encode()), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0), 'server': (host, 80),
+    }
+    body_sent = False
+    status = None
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client never disconnects; Django cancels this wait once the response is sent.
+        await asyncio.Future()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+def is_async_view(path):
+    view_class = getattr(resolve(path).func, 'view_class', None)
+    return bool(view_class and view_class.view_is_async)
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the ASGI application in process with concurrent clients and report throughput and latency '
+        'per URL, to compare how async and sync views scale.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', help=f'URL names, default: {" ".join(DEFAULT_TARGETS)}')
+        parser.add_argument('--clients', default='1,4,16', help='Comma separated numbers of concurrent clients')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per target and concurrency level')
+        parser.add_argument('--warmup', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['clients'].split(',')]
+        except ValueError:
+            raise CommandError('--clients must be a comma separated list of numbers')
+        # Views require a login; a load test user made for this run is removed afterwards.
+        user, created = User.objects.get_or_create(username='loadtest')
+        if created:
+            user.set_unusable_password()
+            user.save()
+        self.host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*',) and not host.startswith('.')), 'localhost')
+        login = Client(SERVER_NAME=self.host)
+        login.force_login(user)
+        self.cookie = '; '.join(f'{morsel.key}={morsel.coded_value}' for morsel in login.cookies.values())
+        try:
+            self.run_targets(options['targets'] or DEFAULT_TARGETS, levels, options['requests'], options['warmup'])
+        finally:
+            login.logout()
+            if created:
+                user.delete()
+
+    def run_targets(self, targets, levels, requests, warmup):
+        self.stdout.write(f"{'target':<40} {'view':>5} {'clients':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        for name in targets:
+            path = reverse(name)
+            kind = 'async' if is_async_view(path) else 'sync'
+            for clients in levels:
+                throughput, latencies = asyncio.run(self.run_level(path, clients, requests, warmup))
+                self.stdout.write(
+                    f"{name:<40} {kind:>5} {clients:>8} {throughput:>9.1f} "
+                    f"{percentile(latencies, 50) * 1000:>9.2f} {percentile(latencies, 95) * 1000:>9.2f}"
+                )
+
+    async def run_level(self, path, clients, requests, warmup):
+        """(requests per second, [seconds per request]) for ``clients`` concurrent clients sharing ``requests``."""
+        remaining = requests
+        latencies = []
+
+        async def client_loop():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                status = await asgi_get(path, self.host, self.cookie)
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    raise CommandError(f'GET {path} returned {status}')
+
+        for _ in range(warmup):
+            await asgi_get(path, self.host, self.cookie)
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(clients)))
+        return requests / (time.perf_counter() - started), latencies
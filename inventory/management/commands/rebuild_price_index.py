@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.procurement import refresh_best_prices
+from recipes.costing import invalidate_ingredients
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the best supplier price index for every ingredient, or only for the given ingredient ids.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ingredient_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        best = refresh_best_prices(options['ingredient_ids'] or None)
+        invalidate_ingredients({ingredient_id for ingredient_id, base_unit in best})
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Indexed {len(best)} best prices in {elapsed:.2f}s"))
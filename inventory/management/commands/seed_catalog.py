@@ -0,0 +1,198 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from inventory.models import Establishment, EstablishmentStock, ProductionPlan, ProductionPlanItem, Supplier, SupplierStock
+from inventory.price_history import record_price_changes
+from inventory.procurement import refresh_best_prices
+from recipes.bom import get_graph
+from recipes.models import Ingredient, IngredientUnit, Recipe, RecipeCost, RecipeIngredient
+from recipes.units import invalidate_unit_table
+from tochinalli_project.cache_versions import bump_version
+
+BATCH_SIZE = 2000
+QUALIFIERS = ['Organic', 'Fresh', 'Dried', 'Frozen', 'Smoked', 'Roasted', 'Ground', 'Whole', 'Fine', 'Aged', 'Wild', 'Baby']
+NOUNS = {
+    'mass': ['Flour', 'Sugar', 'Tomato', 'Onion', 'Beef', 'Chicken', 'Rice', 'Cheese', 'Butter', 'Potato', 'Carrot', 'Pepper', 'Salt', 'Almond', 'Chocolate'],
+    'volume': ['Milk', 'Cream', 'Olive Oil', 'Vinegar', 'Stock', 'Wine', 'Soy Sauce', 'Honey', 'Syrup', 'Juice'],
+    'count': ['Egg', 'Lemon', 'Lime', 'Avocado', 'Bun', 'Tortilla', 'Garlic Head', 'Apple'],
+}
+LINE_UNITS = {'mass': ['g', 'g', 'kg', 'oz'], 'volume': ['ml', 'l', 'cup', 'tbsp'], 'count': ['unit', 'unit', 'dozen']}
+STOCK_UNITS = {'mass': ['kg', 'g', 'lb'], 'volume': ['l', 'ml'], 'count': ['unit', 'dozen', 'case']}
+DISHES = ['Soup', 'Stew', 'Salad', 'Tart', 'Pie', 'Curry', 'Risotto', 'Sauce', 'Bread', 'Cake', 'Taco', 'Burger']
+
+
+def money(rng, low, high):
+    return Decimal(rng.uniform(low, high)).quantize(Decimal('0.01'))
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a reproducible synthetic catalog of ingredients, recipes and supplier stock.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ingredients', type=int, default=50000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--suppliers', type=int, default=500)
+        parser.add_argument('--stock', type=int, default=200000, help='Supplier stock rows, spread evenly across suppliers')
+        parser.add_argument('--establishments', type=int, default=1, help='Sites each stocking about 30%% of the ingredients')
+        parser.add_argument('--plans', type=int, default=20, help='Production plans of 10 recipes each')
+        parser.add_argument('--min-lines', type=int, default=5)
+        parser.add_argument('--max-lines', type=int, default=40)
+        parser.add_argument('--sub-recipes', type=float, default=0.02, help='Share of ingredients produced by a base recipe')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['min_lines'] > options['max_lines'] or options['max_lines'] > options['ingredients']:
+            raise CommandError('Need min-lines <= max-lines <= ingredients')
+        if options['establishments'] < 1:
+            raise CommandError('Need at least one establishment')
+        if options['stock'] > options['suppliers'] * options['ingredients']:
+            raise CommandError('Each supplier offers an ingredient at most once, so stock must not exceed suppliers * ingredients')
+        self.rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        with transaction.atomic():
+            ingredients = self.create_ingredients(options['ingredients'])
+            recipes = self.create_recipes(options['recipes'], ingredients, options)
+            self.create_sub_recipes(ingredients, recipes, options['sub_recipes'])
+            self.create_supplier_stock(options['suppliers'], options['stock'], ingredients)
+            establishments = self.create_establishments(options['establishments'])
+            self.create_establishment_stock(establishments, ingredients)
+            self.create_plans(options['plans'], establishments, recipes)
+        self.refresh_caches()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(ingredients)} ingredients, {len(recipes)} recipes, {options['suppliers']} suppliers "
+            f"and {options['stock']} supplier stock rows in {elapsed:.2f}s"
+        ))
+
+    def create_ingredients(self, count):
+        """[(ingredient, kind)] where kind is the dimension its recipes and suppliers use."""
+        offset = Ingredient.objects.count()
+        kinds = [self.rng.choice(['mass', 'mass', 'volume', 'count']) for _ in range(count)]
+        ingredients = Ingredient.objects.bulk_create(
+            [
+                Ingredient(
+                    name=f"{self.rng.choice(QUALIFIERS)} {self.rng.choice(NOUNS[kind])} {offset + i}",
+                    density=money(self.rng, 0.8, 1.3) if kind == 'volume' and self.rng.random() < 0.5 else None,
+                )
+                for i, kind in enumerate(kinds)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        units = []
+        for ingredient, kind in zip(ingredients, kinds):
+            if kind == 'count':
+                units.append(IngredientUnit(ingredient=ingredient, name='unit', quantity=self.rng.randint(20, 300), unit='g'))
+                units.append(IngredientUnit(ingredient=ingredient, name='case', quantity=self.rng.choice([12, 24, 48]), unit='unit'))
+        IngredientUnit.objects.bulk_create(units, batch_size=BATCH_SIZE)
+        return list(zip(ingredients, kinds))
+
+    def create_recipes(self, count, ingredients, options):
+        recipes = Recipe.objects.bulk_create(
+            [
+                Recipe(name=f"{self.rng.choice(QUALIFIERS)} {self.rng.choice(DISHES)} {i}", description='Synthetic recipe', instructions='Cook.')
+                for i in range(count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        lines = []
+        for recipe in recipes:
+            for ingredient, kind in self.rng.sample(ingredients, self.rng.randint(options['min_lines'], options['max_lines'])):
+                unit = self.rng.choice(LINE_UNITS[kind])
+                quantity = money(self.rng, 0.1, 2) if unit in ('kg', 'l', 'dozen', 'cup') else money(self.rng, 1, 500)
+                lines.append(RecipeIngredient(recipe=recipe, ingredient=ingredient, quantity=quantity, unit=unit))
+                if len(lines) >= BATCH_SIZE:
+                    RecipeIngredient.objects.bulk_create(lines)
+                    lines = []
+        RecipeIngredient.objects.bulk_create(lines)
+        return recipes
+
+    def create_sub_recipes(self, ingredients, recipes, share):
+        """Turn some ingredients into elaborated ones produced by recipes made only of commercial ingredients."""
+        produced = self.rng.sample(ingredients, int(len(ingredients) * share))
+        if not produced or not recipes:
+            return
+        produced_ids = {ingredient.pk for ingredient, kind in produced}
+        used = RecipeIngredient.objects.filter(ingredient_id__in=produced_ids).values_list('recipe_id', flat=True).distinct()
+        base = list(set(recipe.pk for recipe in recipes) - set(used))
+        if not base:
+            return
+        for ingredient, kind in produced:
+            ingredient.is_commercial = False
+            ingredient.produced_by_id = self.rng.choice(base)
+            ingredient.batch_yield = self.rng.randint(1, 20)
+            ingredient.batch_unit = {'mass': 'kg', 'volume': 'l', 'count': 'unit'}[kind]
+        Ingredient.objects.bulk_update(
+            [ingredient for ingredient, kind in produced], ['is_commercial', 'produced_by', 'batch_yield', 'batch_unit'], batch_size=BATCH_SIZE,
+        )
+
+    def create_supplier_stock(self, count, rows, ingredients):
+        offset = Supplier.objects.count()
+        suppliers = Supplier.objects.bulk_create(
+            [Supplier(name=f"Supplier {offset + i}", contact_info=f"orders{offset + i}@example.com") for i in range(count)],
+            batch_size=BATCH_SIZE,
+        )
+        commercial = [(ingredient, kind) for ingredient, kind in ingredients if ingredient.is_commercial]
+        stock = []
+        for i, supplier in enumerate(suppliers):
+            share = rows // count + (1 if i < rows % count else 0)
+            for ingredient, kind in self.rng.sample(commercial, min(share, len(commercial))):
+                unit = self.rng.choice(STOCK_UNITS[kind])
+                stock.append(SupplierStock(
+                    supplier=supplier, ingredient=ingredient, ingredient_name=ingredient.name, quantity=self.rng.randint(0, 500), unit=unit,
+                    price=money(self.rng, 0.5, 80) if unit != 'g' and unit != 'ml' else money(self.rng, 0.01, 0.2),
+                ))
+                if len(stock) >= BATCH_SIZE:
+                    self.save_supplier_stock(stock)
+                    stock = []
+        self.save_supplier_stock(stock)
+
+    def save_supplier_stock(self, stock):
+        SupplierStock.objects.bulk_create(stock)
+        record_price_changes((row.ingredient_id, row.supplier_id, row.unit, row.price) for row in stock)
+
+    def create_establishments(self, count):
+        offset = Establishment.objects.count()
+        return Establishment.objects.bulk_create([Establishment(name=f"Kitchen {offset + i}") for i in range(count)])
+
+    def create_establishment_stock(self, establishments, ingredients):
+        for establishment in establishments:
+            EstablishmentStock.objects.bulk_create(
+                [
+                    EstablishmentStock(
+                        establishment=establishment, ingredient=ingredient, ingredient_name=ingredient.name,
+                        quantity=self.rng.randint(0, 100), unit=STOCK_UNITS[kind][0],
+                    )
+                    for ingredient, kind in ingredients
+                    if self.rng.random() < 0.3
+                ],
+                batch_size=BATCH_SIZE,
+            )
+
+    def create_plans(self, count, establishments, recipes):
+        plans = ProductionPlan.objects.bulk_create(
+            [
+                ProductionPlan(establishment=establishments[i % len(establishments)], name=f"Service {i}", date=f"2026-01-{i % 28 + 1:02d}")
+                for i in range(count)
+            ]
+        )
+        ProductionPlanItem.objects.bulk_create(
+            [
+                ProductionPlanItem(plan=plan, recipe=recipe, portions=self.rng.randint(10, 200))
+                for plan in plans
+                for recipe in self.rng.sample(recipes, min(10, len(recipes)))
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+    def refresh_caches(self):
+        # Bulk inserts send no signals, so rebuild what the signal receivers would have kept current.
+        invalidate_unit_table()
+        get_graph().invalidate_all()
+        RecipeCost.objects.all().delete()
+        refresh_best_prices()
+        for resource in ('recipes', 'ingredients', 'suppliers', 'supplier_stock', 'establishment_stock'):
+            bump_version(resource)
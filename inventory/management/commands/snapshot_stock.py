@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from inventory.ledger import compact_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Snapshot establishment stock balances so point-in-time queries only add recent movements.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help='Snapshot time as an ISO datetime, defaults to a minute ago.')
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            until = parse_datetime(options['until'])
+            if until is None:
+                raise CommandError(f"Invalid datetime '{options['until']}'")
+            if timezone.is_naive(until):
+                until = timezone.make_aware(until)
+        started = time.perf_counter()
+        written = compact_snapshots(until)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} stock snapshots in {elapsed:.2f}s"))
@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database into a replica alias with the online backup API, '
+        'once or every few seconds, to try the read/write split locally.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='replica', help='Replica alias to refresh')
+        parser.add_argument('--every', type=float, help='Keep copying, waiting this many seconds between copies')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if alias not in settings.DATABASES or alias == DEFAULT_DB_ALIAS:
+            raise CommandError(f'"{alias}" is not a replica alias')
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[alias]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('sync_replica only copies between SQLite databases, use the database server replication otherwise')
+        if str(primary.settings_dict['NAME']) == str(replica.settings_dict['NAME']):
+            raise CommandError(f'"{alias}" is the primary database file, set TOCHINALLI_REPLICA_DB to a separate file')
+        while True:
+            started = time.perf_counter()
+            primary.ensure_connection()
+            # The replica connection is query only, so write through a plain connection of our own.
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f"Copied {primary.settings_dict['NAME']} to {replica.settings_dict['NAME']} in {time.perf_counter() - started:.2f}s")
+            if not options['every']:
+                break
+            time.sleep(options['every'])
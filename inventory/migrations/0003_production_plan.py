@@ -0,0 +1,75 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0002_establishmentstock_supplier_supplierstock_and_more"),
+        ("recipes", "0005_ingredient_units"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductionPlan",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("date", models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProductionPlanItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("portions", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "plan",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="inventory.productionplan",
+                    ),
+                ),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="plan_items",
+                        to="recipes.recipe",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="productionplan",
+            name="recipes",
+            field=models.ManyToManyField(
+                through="inventory.ProductionPlanItem", to="recipes.recipe"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="productionplanitem",
+            constraint=models.UniqueConstraint(
+                fields=("plan", "recipe"), name="unique_plan_recipe"
+            ),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0004_procurement"),
+        ("recipes", "0005_ingredient_units"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("receipt", "Receipt"),
+                            ("consumption", "Consumption"),
+                            ("waste", "Waste"),
+                            ("adjustment", "Adjustment"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("quantity", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("unit", models.CharField(max_length=50)),
+                ("note", models.CharField(blank=True, max_length=255)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_movements",
+                        to="recipes.ingredient",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["ingredient", "created_at"],
+                        name="movement_ingredient_time",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="StockSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("taken_at", models.DateTimeField()),
+                ("quantity", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("unit", models.CharField(max_length=50)),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_snapshots",
+                        to="recipes.ingredient",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("ingredient", "taken_at", "unit"),
+                        name="unique_stock_snapshot",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0005_stock_ledger"),
+        ("recipes", "0006_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="ingredientbestprice",
+            name="ingredient",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="best_prices",
+                to="recipes.ingredient",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="supplierstock",
+            name="ingredient",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="supplier_stock",
+                to="recipes.ingredient",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="supplierstock",
+            name="supplier",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock",
+                to="inventory.supplier",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="establishmentstock",
+            index=models.Index(
+                fields=["quantity", "id"], name="establishment_quantity_keyset"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(fields=["created_at", "id"], name="purchase_order_time"),
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["created_at", "id"], name="movement_time_keyset"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="supplier",
+            index=models.Index(fields=["name", "id"], name="supplier_name_keyset"),
+        ),
+        migrations.AddIndex(
+            model_name="supplierstock",
+            index=models.Index(
+                fields=["ingredient", "price"], name="stock_ingredient_price"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="supplierstock",
+            index=models.Index(
+                fields=["supplier", "ingredient"], name="stock_supplier_ingredient"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="supplierstock",
+            index=models.Index(fields=["price", "id"], name="stock_price_keyset"),
+        ),
+    ]
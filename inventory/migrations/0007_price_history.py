@@ -0,0 +1,87 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def record_current_prices(apps, schema_editor):
+    """Start the history with today's supplier prices."""
+    SupplierStock = apps.get_model("inventory", "SupplierStock")
+    PriceChange = apps.get_model("inventory", "PriceChange")
+    now = timezone.now()
+    batch = []
+    for ingredient_id, supplier_id, unit, price in SupplierStock.objects.values_list(
+        "ingredient_id", "supplier_id", "unit", "price"
+    ).iterator(chunk_size=2000):
+        batch.append(
+            PriceChange(
+                ingredient_id=ingredient_id,
+                supplier_id=supplier_id,
+                unit=unit,
+                price=price,
+                valid_from=now,
+            )
+        )
+        if len(batch) >= 2000:
+            PriceChange.objects.bulk_create(batch)
+            batch = []
+    PriceChange.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0006_hot_path_indexes"),
+        ("recipes", "0007_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PriceChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("unit", models.CharField(max_length=50)),
+                (
+                    "price",
+                    models.DecimalField(decimal_places=2, max_digits=10, null=True),
+                ),
+                ("valid_from", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="price_changes",
+                        to="recipes.ingredient",
+                    ),
+                ),
+                (
+                    "supplier",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="price_changes",
+                        to="inventory.supplier",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["ingredient", "supplier", "valid_from"],
+                        name="price_change_lookup",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(record_current_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0007_price_history"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="supplier",
+            name="lead_time_days",
+            field=models.PositiveSmallIntegerField(default=2),
+        ),
+        migrations.CreateModel(
+            name="StockForecast",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("unit", models.CharField(max_length=50)),
+                ("daily_demand", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "demand_deviation",
+                    models.DecimalField(decimal_places=2, max_digits=12),
+                ),
+                ("smoothing", models.DecimalField(decimal_places=2, max_digits=3)),
+                ("lead_time_days", models.PositiveSmallIntegerField()),
+                ("safety_stock", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("reorder_point", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "order_quantity",
+                    models.DecimalField(decimal_places=2, max_digits=12),
+                ),
+                ("computed_at", models.DateTimeField()),
+                (
+                    "stock",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="forecast",
+                        to="inventory.establishmentstock",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,205 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def assign_default_establishment(apps, schema_editor):
+    # Existing rows all belong to the single kitchen modelled until now.
+    Establishment = apps.get_model("inventory", "Establishment")
+    scoped = [
+        apps.get_model("inventory", name)
+        for name in (
+            "EstablishmentStock",
+            "StockMovement",
+            "StockSnapshot",
+            "ProductionPlan",
+        )
+    ]
+    if not any(model.objects.exists() for model in scoped):
+        return
+    establishment = Establishment.objects.create(name="Main kitchen")
+    for model in scoped:
+        model.objects.update(establishment=establishment)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0008_stock_forecast"),
+        ("recipes", "0007_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Establishment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("address", models.TextField(blank=True)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name="stocksnapshot",
+            name="unique_stock_snapshot",
+        ),
+        migrations.RemoveIndex(
+            model_name="establishmentstock",
+            name="establishment_quantity_keyset",
+        ),
+        migrations.RemoveIndex(
+            model_name="stockmovement",
+            name="movement_ingredient_time",
+        ),
+        migrations.RemoveIndex(
+            model_name="stockmovement",
+            name="movement_time_keyset",
+        ),
+        migrations.AlterField(
+            model_name="establishmentstock",
+            name="ingredient",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="establishment_stock",
+                to="recipes.ingredient",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="establishment",
+            index=models.Index(fields=["name", "id"], name="establishment_name_keyset"),
+        ),
+        migrations.AddField(
+            model_name="establishmentstock",
+            name="establishment",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock",
+                to="inventory.establishment",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productionplan",
+            name="establishment",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="production_plans",
+                to="inventory.establishment",
+            ),
+        ),
+        migrations.AddField(
+            model_name="stockmovement",
+            name="establishment",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock_movements",
+                to="inventory.establishment",
+            ),
+        ),
+        migrations.AddField(
+            model_name="stocksnapshot",
+            name="establishment",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock_snapshots",
+                to="inventory.establishment",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="establishmentstock",
+            index=models.Index(
+                fields=["establishment", "quantity", "id"],
+                name="establishment_quantity_keyset",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productionplan",
+            index=models.Index(
+                fields=["establishment", "date", "id"], name="plan_establishment_date"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["establishment", "ingredient", "created_at"],
+                name="movement_ingredient_time",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["establishment", "created_at", "id"],
+                name="movement_time_keyset",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="establishmentstock",
+            constraint=models.UniqueConstraint(
+                fields=("establishment", "ingredient"),
+                name="unique_establishment_ingredient",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="stocksnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("establishment", "ingredient", "taken_at", "unit"),
+                name="unique_stock_snapshot",
+            ),
+        ),
+        migrations.RunPython(assign_default_establishment, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="establishmentstock",
+            name="establishment",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock",
+                to="inventory.establishment",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="productionplan",
+            name="establishment",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="production_plans",
+                to="inventory.establishment",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="stockmovement",
+            name="establishment",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock_movements",
+                to="inventory.establishment",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="stocksnapshot",
+            name="establishment",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock_snapshots",
+                to="inventory.establishment",
+            ),
+        ),
+    ]
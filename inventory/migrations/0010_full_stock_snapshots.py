@@ -0,0 +1,62 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_partial_snapshots(apps, schema_editor):
+    # Earlier compactions only snapshot balances that moved, which no longer adds up to
+    # the whole stock. Movements are never deleted, so the next compaction rebuilds them.
+    apps.get_model("inventory", "StockSnapshot").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0009_establishments"),
+        ("recipes", "0008_recipe_portions"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_partial_snapshots, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name="stocksnapshot",
+            name="unique_stock_snapshot",
+        ),
+        migrations.AlterField(
+            model_name="stockmovement",
+            name="ingredient",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock_movements",
+                to="recipes.ingredient",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="stocksnapshot",
+            name="establishment",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock_snapshots",
+                to="inventory.establishment",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["ingredient", "created_at"], name="movement_ingredient_history"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(fields=["created_at"], name="movement_time"),
+        ),
+        migrations.AddConstraint(
+            model_name="stocksnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("taken_at", "establishment", "ingredient", "unit"),
+                name="unique_stock_snapshot",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0010_full_stock_snapshots"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="supplierstock",
+            index=models.Index(
+                fields=["ingredient", "id"], name="stock_ingredient_keyset"
+            ),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:34
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def merge_duplicate_offers(apps, schema_editor):
+    """Fold repeated offers of a supplier for an ingredient into its cheapest one.
+
+    Rows in the same unit are the same offer listed twice: the cheapest, the one purchasing
+    picked, is kept and best prices pointing at the others move to it, which has the same
+    unit and a price no higher. Offers in different units, such as two pack sizes, are left
+    for an operator to merge rather than guessed at.
+    """
+    SupplierStock = apps.get_model("inventory", "SupplierStock")
+    IngredientBestPrice = apps.get_model("inventory", "IngredientBestPrice")
+    PriceChange = apps.get_model("inventory", "PriceChange")
+    duplicates = list(
+        SupplierStock.objects.values("supplier_id", "ingredient_id")
+        .annotate(rows=Count("pk"))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    kept = []
+    for duplicate in duplicates:
+        first, *rest = SupplierStock.objects.filter(
+            supplier_id=duplicate["supplier_id"],
+            ingredient_id=duplicate["ingredient_id"],
+        ).order_by("price", "-pk")
+        units = {first.unit, *(stock.unit for stock in rest)}
+        if len(units) > 1:
+            raise RuntimeError(
+                f"Supplier {first.supplier_id} offers ingredient {first.ingredient_id} in "
+                f"{', '.join(sorted(units))}, merge these offers by hand first."
+            )
+        dropped = [stock.pk for stock in rest]
+        IngredientBestPrice.objects.filter(supplier_stock_id__in=dropped).update(
+            supplier_stock_id=first.pk
+        )
+        SupplierStock.objects.filter(pk__in=dropped).delete()
+        kept.append(first)
+    # The history interleaved the duplicates' prices, the kept one is in effect from now.
+    now = timezone.now()
+    PriceChange.objects.bulk_create(
+        [
+            PriceChange(
+                ingredient_id=stock.ingredient_id,
+                supplier_id=stock.supplier_id,
+                unit=stock.unit,
+                price=stock.price,
+                valid_from=now,
+            )
+            for stock in kept
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0011_stock_ingredient_keyset"),
+        ("recipes", "0008_recipe_portions"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_offers, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="supplierstock",
+            name="stock_supplier_ingredient",
+        ),
+        migrations.AddConstraint(
+            model_name="supplierstock",
+            constraint=models.UniqueConstraint(
+                fields=("supplier", "ingredient"), name="unique_supplier_ingredient"
+            ),
+        ),
+    ]
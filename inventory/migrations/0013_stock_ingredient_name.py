@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_ingredient_names(apps, schema_editor):
+    Ingredient = apps.get_model("recipes", "Ingredient")
+    names = Ingredient.objects.filter(pk=OuterRef("ingredient_id")).values("name")[:1]
+    for model_name in ("SupplierStock", "EstablishmentStock"):
+        apps.get_model("inventory", model_name).objects.update(
+            ingredient_name=Subquery(names)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0012_unique_supplier_ingredient"),
+        ("recipes", "0008_recipe_portions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="supplierstock",
+            name="ingredient_name",
+            field=models.CharField(default="", editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="establishmentstock",
+            name="ingredient_name",
+            field=models.CharField(default="", editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_ingredient_names, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="supplierstock",
+            name="stock_ingredient_keyset",
+        ),
+        migrations.AddIndex(
+            model_name="supplierstock",
+            index=models.Index(
+                fields=["ingredient_name", "id"], name="stock_ingredient_name"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="establishmentstock",
+            index=models.Index(
+                fields=["establishment", "ingredient_name", "id"],
+                name="establishment_ingredient_name",
+            ),
+        ),
+    ]
@@ -1,27 +1,231 @@
 from django.db import models
-from recipes.models import Ingredient
+from django.utils import timezone
+from recipes.models import Ingredient, Recipe
 
 class Supplier(models.Model):
     name = models.CharField(max_length=255)
     contact_info = models.TextField()
+    lead_time_days = models.PositiveSmallIntegerField(default=2) # Days from ordering to delivery
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'], name='supplier_name_keyset'),
+        ]
 
     def __str__(self):
         return self.name
 
 class SupplierStock(models.Model):
-    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='stock')
-    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='supplier_stock')
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, db_index=False, related_name='stock') # Indexed by unique_supplier_ingredient
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, db_index=False, related_name='supplier_stock') # Indexed by stock_ingredient_price
+    ingredient_name = models.CharField(max_length=255, editable=False) # Copy of ingredient.name kept by inventory.signals, so lists sort by name on an index
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
     unit = models.CharField(max_length=50)
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['ingredient', 'price'], name='stock_ingredient_price'),
+            models.Index(fields=['price', 'id'], name='stock_price_keyset'),
+            models.Index(fields=['ingredient_name', 'id'], name='stock_ingredient_name'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['supplier', 'ingredient'], name='unique_supplier_ingredient'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} {self.unit} of {self.ingredient.name} from {self.supplier.name}"
 
+class Establishment(models.Model):
+    name = models.CharField(max_length=255)
+    address = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'], name='establishment_name_keyset'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class EstablishmentQuerySet(models.QuerySet):
+    def for_establishment(self, establishment):
+        """Rows of one site. The indexes of scoped models lead with the establishment, so this is a range scan."""
+        return self.filter(establishment=establishment)
+
 class EstablishmentStock(models.Model):
-    ingredient = models.OneToOneField(Ingredient, on_delete=models.CASCADE, related_name='establishment_stock')
+    establishment = models.ForeignKey(Establishment, on_delete=models.CASCADE, db_index=False, related_name='stock') # Indexed by unique_establishment_ingredient
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='establishment_stock')
+    ingredient_name = models.CharField(max_length=255, editable=False) # Copy of ingredient.name kept by inventory.signals, so lists sort by name on an index
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    unit = models.CharField(max_length=50)
+
+    objects = EstablishmentQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['establishment', 'ingredient'], name='unique_establishment_ingredient'),
+        ]
+        indexes = [
+            models.Index(fields=['establishment', 'quantity', 'id'], name='establishment_quantity_keyset'),
+            models.Index(fields=['establishment', 'ingredient_name', 'id'], name='establishment_ingredient_name'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} {self.unit} of {self.ingredient.name} in stock at {self.establishment.name}"
+
+class StockForecast(models.Model):
+    """Nightly consumption forecast and reorder point of an establishment stock row, see inventory.forecasting."""
+    stock = models.OneToOneField(EstablishmentStock, on_delete=models.CASCADE, related_name='forecast')
+    unit = models.CharField(max_length=50) # The stock unit when forecast
+    daily_demand = models.DecimalField(max_digits=12, decimal_places=2) # Expected consumption per day
+    demand_deviation = models.DecimalField(max_digits=12, decimal_places=2) # Standard deviation of one day's forecast error
+    smoothing = models.DecimalField(max_digits=3, decimal_places=2) # Level smoothing factor that fitted the history best
+    lead_time_days = models.PositiveSmallIntegerField()
+    safety_stock = models.DecimalField(max_digits=12, decimal_places=2)
+    reorder_point = models.DecimalField(max_digits=12, decimal_places=2)
+    order_quantity = models.DecimalField(max_digits=12, decimal_places=2) # Suggested order, 0 while above the reorder point
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Reorder {self.stock.ingredient.name} at {self.reorder_point} {self.unit}"
+
+class StockMovement(models.Model):
+    RECEIPT = 'receipt'
+    CONSUMPTION = 'consumption'
+    WASTE = 'waste'
+    ADJUSTMENT = 'adjustment'
+    KIND_CHOICES = [(RECEIPT, 'Receipt'), (CONSUMPTION, 'Consumption'), (WASTE, 'Waste'), (ADJUSTMENT, 'Adjustment')]
+
+    establishment = models.ForeignKey(Establishment, on_delete=models.CASCADE, db_index=False, related_name='stock_movements') # Indexed by movement_ingredient_time
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, db_index=False, related_name='stock_movements') # Indexed by movement_ingredient_history
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2) # Signed change, in the establishment stock unit
+    unit = models.CharField(max_length=50)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = EstablishmentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['establishment', 'ingredient', 'created_at'], name='movement_ingredient_time'),
+            models.Index(fields=['establishment', 'created_at', 'id'], name='movement_time_keyset'),
+            models.Index(fields=['ingredient', 'created_at'], name='movement_ingredient_history'),
+            models.Index(fields=['created_at'], name='movement_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of {self.quantity} {self.unit} of {self.ingredient.name}"
+
+class StockSnapshot(models.Model):
+    """Every balance as of a compaction, see inventory.ledger.compact_snapshots."""
+    establishment = models.ForeignKey(Establishment, on_delete=models.CASCADE, related_name='stock_snapshots')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='stock_snapshots')
+    taken_at = models.DateTimeField() # Includes every movement created at or before this time
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    unit = models.CharField(max_length=50) # Base unit from the unit table, or the raw unit when it cannot be normalized
+
+    objects = EstablishmentQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['taken_at', 'establishment', 'ingredient', 'unit'], name='unique_stock_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} {self.unit} of {self.ingredient.name} at {self.taken_at}"
+
+class IngredientBestPrice(models.Model):
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, db_index=False, related_name='best_prices') # Indexed by unique_ingredient_best_price
+    base_unit = models.CharField(max_length=50) # Base unit from the unit table, or the raw unit when it cannot be normalized
+    supplier_stock = models.ForeignKey(SupplierStock, on_delete=models.CASCADE, related_name='+')
+    unit_price = models.DecimalField(max_digits=20, decimal_places=10) # Price per base unit
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ingredient', 'base_unit'], name='unique_ingredient_best_price'),
+        ]
+
+    def __str__(self):
+        return f"{self.ingredient.name}: {self.unit_price} per {self.base_unit}"
+
+class PriceChange(models.Model):
+    """Append-only history of supplier prices, one row each time a supplier's price or unit for an ingredient changes."""
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, db_index=False, related_name='price_changes') # Indexed by price_change_lookup
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='price_changes')
+    unit = models.CharField(max_length=50)
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True) # None once the supplier stops offering the ingredient
+    valid_from = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ingredient', 'supplier', 'valid_from'], name='price_change_lookup'),
+        ]
+
+    def __str__(self):
+        price = 'withdrawn' if self.price is None else f"{self.price} per {self.unit}"
+        return f"{self.ingredient.name} from {self.supplier.name}: {price} from {self.valid_from}"
+
+class ProductionPlan(models.Model):
+    establishment = models.ForeignKey(Establishment, on_delete=models.CASCADE, db_index=False, related_name='production_plans') # Indexed by plan_establishment_date
+    name = models.CharField(max_length=255)
+    date = models.DateField()
+    recipes = models.ManyToManyField(Recipe, through='ProductionPlanItem')
+
+    objects = EstablishmentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['establishment', 'date', 'id'], name='plan_establishment_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.date})"
+
+class ProductionPlanItem(models.Model):
+    plan = models.ForeignKey(ProductionPlan, on_delete=models.CASCADE, related_name='items')
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='plan_items')
+    portions = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['plan', 'recipe'], name='unique_plan_recipe'),
+        ]
+
+    def __str__(self):
+        return f"{self.portions} portions of {self.recipe.name} for {self.plan.name}"
+
+class PurchaseOrder(models.Model):
+    DRAFT = 'draft'
+    SENT = 'sent'
+    RECEIVED = 'received'
+    STATUS_CHOICES = [(DRAFT, 'Draft'), (SENT, 'Sent'), (RECEIVED, 'Received')]
+
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='purchase_orders')
+    plan = models.ForeignKey(ProductionPlan, on_delete=models.SET_NULL, null=True, blank=True, related_name='purchase_orders')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=DRAFT)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='purchase_order_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_status_display()} order #{self.pk} for {self.supplier.name}"
+
+class PurchaseOrderLine(models.Model):
+    order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name='lines')
+    supplier_stock = models.ForeignKey(SupplierStock, on_delete=models.SET_NULL, null=True, related_name='+')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='+')
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
     unit = models.CharField(max_length=50)
+    price = models.DecimalField(max_digits=10, decimal_places=2) # Supplier price per unit when drafted
+
+    @property
+    def total(self):
+        return self.quantity * self.price
 
     def __str__(self):
-        return f"{self.quantity} {self.unit} of {self.ingredient.name} in stock"
+        return f"{self.quantity} {self.unit} of {self.ingredient.name}"
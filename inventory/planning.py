@@ -0,0 +1,83 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db.models import F, Sum
+
+from recipes.models import RecipeIngredient
+from recipes.units import get_unit_table
+from .models import EstablishmentStock
+
+
+@dataclass
+class Requirement:
+    ingredient_id: int
+    ingredient: str
+    unit: str  # Base unit from the unit table, or the raw unit when it cannot be normalized
+    required: Decimal
+    on_hand: Decimal
+    comparable: bool = True  # False when stock is kept in a unit that cannot be compared
+
+    @property
+    def shortage(self):
+        return max(self.required - self.on_hand, Decimal(0))
+
+    def as_dict(self):
+        return {
+            'ingredient_id': self.ingredient_id,
+            'ingredient': self.ingredient,
+            'unit': self.unit,
+            'required': self.required,
+            'on_hand': self.on_hand,
+            'shortage': self.shortage,
+            'comparable': self.comparable,
+        }
+
+
+def plan_requirements(plan):
+    """Ingredient requirements of a production plan netted against establishment stock.
+
+    Lines are aggregated per ingredient and unit across every planned recipe in one grouped
+    query, then normalized through the unit table. Recipe quantities make the recipe's
+    portions, so each group is divided by them in Python: SQLite stores whole decimals as
+    integers and would truncate the quotient.
+    """
+    lines = (
+        RecipeIngredient.objects
+        .filter(recipe__plan_items__plan=plan)
+        .values('ingredient_id', 'ingredient__name', 'unit', 'recipe__portions')
+        .annotate(required=Sum(F('quantity') * F('recipe__plan_items__portions')))
+        .order_by()
+    )
+    table = get_unit_table()
+    totals, names = defaultdict(Decimal), {}
+    for line in lines:
+        required = Decimal(line['required']) / line['recipe__portions']
+        quantity, unit = table.try_normalize(line['ingredient_id'], required, line['unit'])
+        totals[(line['ingredient_id'], unit)] += quantity
+        names[line['ingredient_id']] = line['ingredient__name']
+
+    stock = (
+        EstablishmentStock.objects
+        .for_establishment(plan.establishment_id)
+        .filter(ingredient_id__in=names)
+        .values_list('ingredient_id', 'quantity', 'unit')
+    )
+    on_hand = {}
+    for ingredient_id, quantity, unit in table.normalize_many(stock):
+        on_hand[ingredient_id] = (quantity, unit)
+
+    requirements = []
+    for (ingredient_id, unit), required in totals.items():
+        stock_quantity, stock_unit = on_hand.get(ingredient_id, (Decimal(0), unit))
+        comparable = stock_unit == unit
+        requirements.append(Requirement(
+            ingredient_id, names[ingredient_id], unit, required,
+            stock_quantity if comparable else Decimal(0), comparable,
+        ))
+    requirements.sort(key=lambda requirement: requirement.ingredient)
+    return requirements
+
+
+def plan_shortages(plan):
+    return [requirement for requirement in plan_requirements(plan) if requirement.shortage > 0]
@@ -0,0 +1,105 @@
+import bisect
+import calendar
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from recipes.units import get_unit_table
+from .models import PriceChange
+
+
+def record_price_changes(changes, when=None):
+    """Append (ingredient_id, supplier_id, unit, price) rows to the history in one insert.
+
+    A price of None records that the supplier no longer offers the ingredient.
+    """
+    when = when or timezone.now()
+    return PriceChange.objects.bulk_create(
+        [
+            PriceChange(ingredient_id=ingredient_id, supplier_id=supplier_id, unit=unit, price=price, valid_from=when)
+            for ingredient_id, supplier_id, unit, price in changes
+        ],
+        batch_size=1000,
+    )
+
+
+def prices_as_of(when, ingredient_ids=None):
+    """{(ingredient_id, supplier_id): (unit, price)} in effect at ``when``, in one query.
+
+    The latest change per ingredient and supplier is picked with a window over the
+    price_change_lookup index; offers withdrawn by then are left out.
+    """
+    changes = PriceChange.objects.filter(valid_from__lte=when)
+    if ingredient_ids is not None:
+        changes = changes.filter(ingredient_id__in=list(ingredient_ids))
+    latest = changes.annotate(
+        position=Window(RowNumber(), partition_by=[F('ingredient_id'), F('supplier_id')], order_by=[F('valid_from').desc(), F('pk').desc()]),
+    ).filter(position=1)
+    # Withdrawn offers are dropped here: filtering them in SQL would happen before the window picks the latest change.
+    return {
+        (ingredient_id, supplier_id): (unit, price)
+        for ingredient_id, supplier_id, unit, price in latest.values_list('ingredient_id', 'supplier_id', 'unit', 'price').iterator(chunk_size=5000)
+        if price is not None
+    }
+
+
+def best_unit_prices_over_time(dates, ingredient_ids=None):
+    """Cheapest price per ingredient base unit at each date, as {date: {(ingredient_id, base unit): price}}.
+
+    One ordered pass over the history up to the last date serves every date, so the
+    cost of a report does not grow with the number of dates in queries.
+    """
+    dates = sorted(dates)
+    series = {when: {} for when in dates}
+    if not dates:
+        return series
+    changes = PriceChange.objects.filter(valid_from__lte=dates[-1])
+    if ingredient_ids is not None:
+        changes = changes.filter(ingredient_id__in=list(ingredient_ids))
+    rows = changes.order_by('ingredient_id', 'supplier_id', 'valid_from', 'pk').values_list(
+        'ingredient_id', 'supplier_id', 'unit', 'price', 'valid_from',
+    ).iterator(chunk_size=5000)
+    table = get_unit_table()
+    offer, history = None, []
+    for ingredient_id, supplier_id, unit, price, valid_from in rows:
+        if (ingredient_id, supplier_id) != offer:
+            _apply_offer(series, dates, offer, history, table)
+            offer, history = (ingredient_id, supplier_id), []
+        history.append((valid_from, unit, price))
+    _apply_offer(series, dates, offer, history, table)
+    return series
+
+
+def _apply_offer(series, dates, offer, history, table):
+    if offer is None:
+        return
+    ingredient_id = offer[0]
+    starts = [valid_from for valid_from, unit, price in history]
+    for when in dates:
+        index = bisect.bisect_right(starts, when) - 1
+        if index < 0:
+            continue
+        valid_from, unit, price = history[index]
+        if price is None:
+            continue
+        size, base_unit = table.try_normalize(ingredient_id, Decimal(1), unit)
+        unit_price = price / size
+        best = series[when]
+        key = (ingredient_id, base_unit)
+        if key not in best or unit_price < best[key]:
+            best[key] = unit_price
+
+
+def month_ends(months, until=None):
+    """The last instant of each of the ``months`` months before the one containing ``until``, oldest first."""
+    until = timezone.localtime(until or timezone.now())
+    year, month = until.year, until.month
+    ends = []
+    for _ in range(months):
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+        last_day = calendar.monthrange(year, month)[1]
+        ends.append(timezone.make_aware(datetime.combine(datetime(year, month, last_day), time.max)))
+    return ends[::-1]
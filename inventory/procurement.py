@@ -0,0 +1,159 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_CEILING
+
+from django.db import transaction
+
+from recipes.units import get_unit_table
+from .models import IngredientBestPrice, PurchaseOrder, PurchaseOrderLine, SupplierStock
+
+
+def refresh_best_prices(ingredient_ids=None):
+    """Rebuild the best-price index for the given ingredients, or for all of them."""
+    offers = SupplierStock.objects.values_list('pk', 'ingredient_id', 'quantity', 'unit', 'price')
+    existing = IngredientBestPrice.objects.all()
+    if ingredient_ids is not None:
+        ingredient_ids = list(ingredient_ids)
+        offers = offers.filter(ingredient_id__in=ingredient_ids)
+        existing = existing.filter(ingredient_id__in=ingredient_ids)
+    table = get_unit_table()
+    best = {}
+    for pk, ingredient_id, quantity, unit, price in offers.iterator(chunk_size=5000):
+        size, base_unit = table.try_normalize(ingredient_id, Decimal(1), unit)
+        unit_price = price / size
+        key = (ingredient_id, base_unit)
+        if key not in best or unit_price < best[key].unit_price:
+            best[key] = IngredientBestPrice(
+                ingredient_id=ingredient_id, base_unit=base_unit, supplier_stock_id=pk, unit_price=unit_price,
+            )
+    with transaction.atomic():
+        existing.delete()
+        IngredientBestPrice.objects.bulk_create(best.values(), batch_size=1000)
+    return best
+
+
+@dataclass
+class Offer:
+    supplier_stock_id: int
+    supplier_id: int
+    supplier: str
+    ingredient_id: int
+    ingredient: str
+    unit: str
+    price: Decimal
+    size: Decimal  # Base units in one supplier unit
+    available: Decimal  # Supplier units on offer
+
+    @property
+    def unit_price(self):
+        return self.price / self.size
+
+
+@dataclass
+class Allocation:
+    offer: Offer
+    quantity: Decimal  # Supplier units to order
+
+    @property
+    def cost(self):
+        return self.quantity * self.offer.price
+
+
+@dataclass
+class ProcurementPlan:
+    allocations: dict = field(default_factory=dict)  # supplier_id -> [Allocation]
+    unfilled: list = field(default_factory=list)  # (ingredient_id, base quantity, base unit)
+
+    @property
+    def total(self):
+        return sum(allocation.cost for allocations in self.allocations.values() for allocation in allocations)
+
+
+def load_offers(ingredient_ids):
+    """Every supplier offer for the ingredients in one query, cheapest per base unit first."""
+    table = get_unit_table()
+    offers = defaultdict(list)
+    rows = SupplierStock.objects.filter(ingredient_id__in=ingredient_ids, quantity__gt=0).values_list(
+        'pk', 'supplier_id', 'supplier__name', 'ingredient_id', 'ingredient__name', 'quantity', 'unit', 'price',
+    )
+    for pk, supplier_id, supplier, ingredient_id, ingredient, quantity, unit, price in rows:
+        size, base_unit = table.try_normalize(ingredient_id, Decimal(1), unit)
+        offers[(ingredient_id, base_unit)].append(
+            Offer(pk, supplier_id, supplier, ingredient_id, ingredient, unit, price, size, quantity)
+        )
+    for candidates in offers.values():
+        candidates.sort(key=lambda offer: (offer.unit_price, offer.supplier_stock_id))
+    return offers
+
+
+def load_best_offers(ingredient_ids):
+    """The indexed cheapest offer per (ingredient, base unit) for the ingredients in one query."""
+    table = get_unit_table()
+    offers = {}
+    rows = IngredientBestPrice.objects.filter(ingredient_id__in=ingredient_ids).values_list(
+        'base_unit', 'supplier_stock_id', 'supplier_stock__supplier_id', 'supplier_stock__supplier__name',
+        'ingredient_id', 'ingredient__name', 'supplier_stock__quantity', 'supplier_stock__unit', 'supplier_stock__price',
+    )
+    for base_unit, pk, supplier_id, supplier, ingredient_id, ingredient, quantity, unit, price in rows:
+        size, _ = table.try_normalize(ingredient_id, Decimal(1), unit)
+        offers[(ingredient_id, base_unit)] = Offer(pk, supplier_id, supplier, ingredient_id, ingredient, unit, price, size, quantity)
+    return offers
+
+
+def plan_procurement(shortages):
+    """Cheapest allocation of (ingredient_id, quantity, unit) shortages across supplier offers.
+
+    Offers are taken cheapest per base unit first, ordering whole supplier units and never
+    more than an offer has available. With linear prices this greedy fill is optimal up to
+    that rounding. The cheapest offer comes from the ``IngredientBestPrice`` index; the
+    other offers are only loaded for ingredients it cannot cover. Whatever no offer can
+    cover is reported as unfilled.
+    """
+    table = get_unit_table()
+    needed = defaultdict(Decimal)
+    for ingredient_id, quantity, unit in shortages:
+        base_quantity, base_unit = table.try_normalize(ingredient_id, quantity, unit)
+        needed[(ingredient_id, base_unit)] += base_quantity
+    best = load_best_offers({ingredient_id for ingredient_id, base_unit in needed})
+    # Only ingredients whose cheapest offer cannot cover the shortage need the other offers.
+    short = {
+        key[0] for key, remaining in needed.items()
+        if key in best and best[key].available * best[key].size < remaining
+    }
+    offers = load_offers(short) if short else {}
+    plan = ProcurementPlan()
+
+    for key, remaining in needed.items():
+        candidates = offers.get(key) or ([best[key]] if key in best else [])
+        for offer in candidates:
+            if remaining <= 0:
+                break
+            units = min((remaining / offer.size).to_integral_value(rounding=ROUND_CEILING), offer.available)
+            if units <= 0:
+                continue
+            plan.allocations.setdefault(offer.supplier_id, []).append(Allocation(offer, units))
+            remaining -= units * offer.size
+        if remaining > 0:
+            plan.unfilled.append((key[0], remaining, key[1]))
+    return plan
+
+
+def create_purchase_orders(procurement, plan=None):
+    """Save a procurement plan as one draft purchase order per supplier."""
+    with transaction.atomic():
+        orders = PurchaseOrder.objects.bulk_create(
+            PurchaseOrder(supplier_id=supplier_id, plan=plan) for supplier_id in procurement.allocations
+        )
+        PurchaseOrderLine.objects.bulk_create(
+            PurchaseOrderLine(
+                order=order,
+                supplier_stock_id=allocation.offer.supplier_stock_id,
+                ingredient_id=allocation.offer.ingredient_id,
+                quantity=allocation.quantity,
+                unit=allocation.offer.unit,
+                price=allocation.offer.price,
+            )
+            for order, allocations in zip(orders, procurement.allocations.values())
+            for allocation in allocations
+        )
+    return orders
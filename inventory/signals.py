@@ -0,0 +1,91 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, IngredientUnit
+from tochinalli_project.cache_versions import bump_version
+from .models import Supplier, SupplierStock, EstablishmentStock
+from .price_history import record_price_changes
+from .procurement import refresh_best_prices
+
+
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+def bump_supplier_version(sender, instance, **kwargs):
+    bump_version('suppliers')
+
+
+@receiver(pre_save, sender=SupplierStock)
+@receiver(pre_save, sender=EstablishmentStock)
+def copy_ingredient_name(sender, instance, **kwargs):
+    instance.ingredient_name = instance.ingredient.name
+
+
+@receiver(pre_save, sender=SupplierStock)
+def remember_supplier_stock_offer(sender, instance, **kwargs):
+    instance._previous_offer = None
+    if instance.pk:
+        instance._previous_offer = (
+            sender.objects.filter(pk=instance.pk).values_list('ingredient_id', 'supplier_id', 'unit', 'price').first()
+        )
+    instance._previous_ingredient_id = instance._previous_offer[0] if instance._previous_offer else None
+
+
+@receiver(post_save, sender=SupplierStock)
+def record_supplier_price(sender, instance, **kwargs):
+    offer = (instance.ingredient_id, instance.supplier_id, instance.unit, instance.price)
+    previous = getattr(instance, '_previous_offer', None)
+    if previous is not None and previous[:2] != offer[:2]:
+        # Moved to another ingredient or supplier: the old offer ends here.
+        changes = [previous[:3] + (None,), offer]
+    elif previous is None or previous[2:] != offer[2:]:
+        changes = [offer]
+    else:
+        return
+    record_price_changes(changes)
+
+
+@receiver(post_delete, sender=SupplierStock)
+def record_withdrawn_price(sender, instance, origin=None, **kwargs):
+    # Deleting the supplier or the ingredient deletes its price history too, so there is nothing to record.
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is None or origin_model is SupplierStock:
+        record_price_changes([(instance.ingredient_id, instance.supplier_id, instance.unit, None)])
+
+
+@receiver(post_save, sender=SupplierStock)
+@receiver(post_delete, sender=SupplierStock)
+def update_supplier_stock_indexes(sender, instance, **kwargs):
+    ingredient_ids = {instance.ingredient_id, getattr(instance, '_previous_ingredient_id', None)}
+    ingredient_ids.discard(None)
+    refresh_best_prices(ingredient_ids)
+    bump_version('supplier_stock')
+
+
+@receiver(post_save, sender=IngredientUnit)
+@receiver(post_delete, sender=IngredientUnit)
+def refresh_best_prices_for_unit(sender, instance, **kwargs):
+    refresh_best_prices([instance.ingredient_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_best_prices_for_density(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_composition', None)
+    if not created and previous is not None and previous[-1] != instance.density:
+        refresh_best_prices([instance.pk])
+
+
+@receiver(post_save, sender=Ingredient)
+def copy_renamed_ingredient_name(sender, instance, created, **kwargs):
+    # The copies are updated in bulk, which sends no signals, so their caches are bumped here.
+    if created:
+        return
+    for model, version in ((SupplierStock, 'supplier_stock'), (EstablishmentStock, 'establishment_stock')):
+        if model.objects.filter(ingredient=instance).exclude(ingredient_name=instance.name).update(ingredient_name=instance.name):
+            bump_version(version)
+
+
+@receiver(post_save, sender=EstablishmentStock)
+@receiver(post_delete, sender=EstablishmentStock)
+def bump_establishment_stock_version(sender, instance, **kwargs):
+    bump_version('establishment_stock')
@@ -0,0 +1,32 @@
+import io
+from dataclasses import asdict
+
+from jobs.queue import PermanentError, job_files, set_progress, task
+from .forecasting import forecast_stock
+from .importers import PriceListError, PriceListImporter, iter_csv, iter_json
+from .models import Supplier
+
+
+@task('inventory.import_price_list')
+def import_price_list(supplier_id, path, dry_run=False):
+    """Import a price list saved in the job files, deleting it once imported."""
+    storage = job_files()
+    supplier = Supplier.objects.get(pk=supplier_id)
+    size = storage.size(path)
+    with storage.open(path, 'rb') as upload:
+        upload = upload.file
+        stream = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+        rows = iter_csv(stream) if path.lower().endswith('.csv') else iter_json(stream)
+        try:
+            report = PriceListImporter(supplier, dry_run=dry_run).run(
+                rows, progress=lambda report: set_progress(upload.tell() / size if size else None, f'{report.rows} rows'),
+            )
+        except PriceListError as exc:
+            raise PermanentError(str(exc)) from exc
+    storage.delete(path)
+    return asdict(report)
+
+
+@task('inventory.forecast_stock')
+def refit_forecasts():
+    return {'forecasts': forecast_stock()}
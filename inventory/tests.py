@@ -1,8 +1,35 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import threading
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import Supplier, SupplierStock, EstablishmentStock
-from recipes.models import Ingredient
+from django.contrib.sessions.models import Session
+from .models import Supplier, SupplierStock, Establishment, EstablishmentStock, ProductionPlan, ProductionPlanItem, IngredientBestPrice, PurchaseOrder, PurchaseOrderLine, StockMovement, StockSnapshot, PriceChange, StockForecast
+from recipes.models import Ingredient, IngredientUnit, Recipe, RecipeIngredient
+from recipes.costing import reprice_recipes
+from recipes.units import get_unit_table
+from tochinalli_project.pagination import encode_cursor
+from .importers import PriceListError, PriceListImporter, iter_csv, iter_json
+from .exports import SupplierStockDataset
+from .planning import plan_requirements, plan_shortages
+from .procurement import plan_procurement
+from .ledger import compact_snapshots, record_movement, stock_as_of
+from .forecasting import DEFAULT_LEAD_TIME_DAYS, fit_smoothing, forecast_stock
+from .price_history import month_ends, prices_as_of, record_price_changes
+from .dashboard import dashboard
+from .management.commands.explain_queries import plan_problems
 
 class InventoryViewsTestCase(TestCase):
     def setUp(self):
@@ -17,7 +44,9 @@ class InventoryViewsTestCase(TestCase):
             unit='kg',
             price=5.00
         )
+        self.kitchen = Establishment.objects.create(name='Kitchen')
         self.establishment_stock = EstablishmentStock.objects.create(
+            establishment=self.kitchen,
             ingredient=self.ingredient,
             quantity=5,
             unit='kg'
@@ -31,7 +60,8 @@ class InventoryViewsTestCase(TestCase):
     def test_supplier_create_view(self):
         response = self.client.post(reverse('inventory:supplier_create'), {
             'name': 'New Supplier',
-            'contact_info': 'New Contact'
+            'contact_info': 'New Contact',
+            'lead_time_days': 3,
         })
         self.assertEqual(response.status_code, 302)
         self.assertTrue(Supplier.objects.filter(name='New Supplier').exists())
@@ -41,7 +71,750 @@ class InventoryViewsTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, self.ingredient.name)
 
+    def test_one_offer_per_supplier_and_ingredient(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SupplierStock.objects.create(supplier=self.supplier, ingredient=self.ingredient, quantity=1, unit='kg', price=6)
+
+    def test_supplier_stock_api(self):
+        url = reverse('inventory_api:supplier_stock_list')
+        response = self.client.get(url)
+        self.assertEqual(response.json()[0]['price'], '5.00')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.supplier_stock.price = 4
+        self.supplier_stock.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
     def test_establishment_stock_list_view(self):
         response = self.client.get(reverse('inventory:establishment_stock_list'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, self.ingredient.name)
+
+class InventoryQueryBudgetTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        suppliers = [Supplier.objects.create(name=f'Supplier {i}', contact_info='Contact') for i in range(3)]
+        kitchen = Establishment.objects.create(name='Kitchen')
+        for i in range(20):
+            ingredient = Ingredient.objects.create(name=f'Ingredient {i}')
+            EstablishmentStock.objects.create(establishment=kitchen, ingredient=ingredient, quantity=i, unit='kg')
+            for supplier in suppliers:
+                SupplierStock.objects.create(supplier=supplier, ingredient=ingredient, quantity=10, unit='kg', price=i)
+
+    def test_supplier_list_query_budget(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('inventory:supplier_list'))
+        self.assertContains(response, 'Supplier 2')
+
+    def test_supplier_stock_list_query_budget(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('inventory:supplier_stock_list'))
+        self.assertContains(response, 'Ingredient 19 from Supplier 2')
+
+    def test_establishment_stock_list_query_budget(self):
+        with self.assertNumQueries(4):  # Session, user, establishment, page
+            response = self.client.get(reverse('inventory:establishment_stock_list'))
+        self.assertContains(response, 'Ingredient 19')
+
+    def test_stock_forms_do_not_list_ingredients(self):
+        stock = SupplierStock.objects.get(supplier__name='Supplier 0', ingredient__name='Ingredient 7')
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('inventory:supplier_stock_update', args=[stock.pk]))
+        self.assertContains(response, 'value="Ingredient 7"')
+        self.assertNotContains(response, 'Ingredient 8')
+        for name, queries in (('supplier_stock_create', 2), ('establishment_stock_create', 3), ('stock_movement_create', 3)):
+            with self.assertNumQueries(queries):
+                response = self.client.get(reverse(f'inventory:{name}'))
+            self.assertContains(response, 'recipes/autocomplete.js')
+            self.assertNotContains(response, 'Ingredient 0')
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='Test Contact')
+        for i in range(120):
+            ingredient = Ingredient.objects.create(name=f'Ingredient {i:03}')
+            SupplierStock.objects.create(supplier=self.supplier, ingredient=ingredient, quantity=1, unit='kg', price=i % 7)
+
+    def collect_pages(self, params):
+        url, seen = reverse('inventory:supplier_stock_list'), []
+        response = self.client.get(url, params)
+        while True:
+            seen.extend(item.pk for item in response.context['supplier_stock'])
+            if not response.context['next_page_url']:
+                return seen
+            response = self.client.get(url + response.context['next_page_url'])
+
+    def test_pages_cover_every_row_once(self):
+        seen = self.collect_pages({'sort': '-price'})
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(set(seen), set(SupplierStock.objects.values_list('pk', flat=True)))
+        prices = [SupplierStock.objects.get(pk=pk).price for pk in seen]
+        self.assertEqual(prices, sorted(prices, reverse=True))
+
+    def test_ingredient_sort_follows_renames(self):
+        ingredient = Ingredient.objects.get(name='Ingredient 117')
+        kitchen = Establishment.objects.create(name='Kitchen')
+        EstablishmentStock.objects.create(establishment=kitchen, ingredient=ingredient, quantity=1, unit='kg')
+        ingredient.name = 'Aniseed'
+        ingredient.save()
+        self.assertEqual(EstablishmentStock.objects.get().ingredient_name, 'Aniseed')
+        seen = self.collect_pages({'sort': 'ingredient'})
+        names = [SupplierStock.objects.get(pk=pk).ingredient.name for pk in seen]
+        self.assertEqual(names[0], 'Aniseed')
+        self.assertEqual(names, sorted(names))
+
+    def test_foreign_cursors_show_the_first_page(self):
+        url = reverse('inventory:supplier_stock_list')
+        first = [item.pk for item in self.client.get(url, {'sort': 'price'}).context['supplier_stock']]
+        for values in (5, {}, [], ['abc', 1], ['1.00'], ['1.00', 'x'], [None, 1], ['1.00', 2, 3]):
+            response = self.client.get(url, {'sort': 'price', 'cursor': encode_cursor(values)})
+            self.assertEqual([item.pk for item in response.context['supplier_stock']], first, values)
+        self.assertEqual(self.client.get(url, {'cursor': '%%%'}).status_code, 200)
+
+    def test_filter_parameters(self):
+        response = self.client.get(reverse('inventory:supplier_stock_list'), {'ingredient': 'Ingredient 11'})
+        self.assertEqual([item.ingredient.name for item in response.context['supplier_stock']], ['Ingredient 110', 'Ingredient 111', 'Ingredient 112', 'Ingredient 113', 'Ingredient 114', 'Ingredient 115', 'Ingredient 116', 'Ingredient 117', 'Ingredient 118', 'Ingredient 119'])
+
+    def test_stream_renders_every_row(self):
+        response = self.client.get(reverse('inventory:supplier_stock_list'), {'stream': '1'})
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.count('<li>'), 120)
+        self.assertIn('</html>', content)
+
+class QueryPlanTestCase(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = io.StringIO()
+        call_command('explain_queries', '--check', stdout=out)
+        self.assertNotIn('full scan', out.getvalue())
+
+    def test_sorted_and_unbounded_index_scans_are_flagged(self):
+        by_name = SupplierStock.objects.order_by('ingredient__name', 'pk')[:51]
+        self.assertIn('sort in a temporary B-tree', plan_problems(by_name, by_name.explain()))
+        every_offer = SupplierStock.objects.order_by('ingredient_id', 'pk')
+        self.assertIn('index scan of inventory_supplierstock', plan_problems(every_offer, every_offer.explain()))
+        first_page = every_offer[:51]
+        self.assertEqual(plan_problems(first_page, first_page.explain()), [])
+
+class SeedAndBenchmarkTestCase(TestCase):
+    def test_seed_catalog(self):
+        call_command('seed_catalog', ingredients=200, recipes=30, suppliers=4, stock=300, plans=2, stdout=io.StringIO())
+        self.assertEqual(Ingredient.objects.count(), 200)
+        self.assertEqual(SupplierStock.objects.count(), 300)
+        lines = RecipeIngredient.objects.filter(recipe__in=Recipe.objects.all()).count()
+        self.assertTrue(30 * 5 <= lines <= 30 * 40)
+        self.assertTrue(Ingredient.objects.filter(produced_by__isnull=False).exists())
+        self.assertTrue(IngredientBestPrice.objects.exists())
+
+    def test_benchmark_saves_and_compares_baseline(self):
+        call_command('seed_catalog', ingredients=50, recipes=5, suppliers=2, stock=40, plans=1, stdout=io.StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = f'{directory}/baseline.json'
+            options = {'iterations': 2, 'warmup': 0, 'only': 'recipe', 'baseline': baseline}
+            call_command('benchmark', save=True, stdout=io.StringIO(), **options)
+            with open(baseline) as saved:
+                results = json.load(saved)['results']
+            self.assertEqual(results['recipes:recipe_list']['queries'], 0)  # Warm fragment cache
+            out = io.StringIO()
+            call_command('benchmark', check=True, tolerance=float('inf'), stdout=out, **options)  # Two runs only time noise, compare queries
+            self.assertIn('recipes:recipe_detail', out.getvalue())
+
+class PriceListImportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='Test Contact')
+        self.ingredients = [Ingredient.objects.create(name=f'Ingredient {i}') for i in range(30)]
+        self.stock = SupplierStock.objects.create(
+            supplier=self.supplier, ingredient=self.ingredients[0], quantity=10, unit='kg', price=Decimal('5.00')
+        )
+
+    def price_list(self):
+        lines = ['ingredient,quantity,unit,price', 'ingredient 0,10,kg,4.50', 'Unknown,1,kg,1.00', 'Ingredient 1,1,bushel,1.00']
+        lines += [f'Ingredient {i},{i},kg,{i}.25' for i in range(2, 30)]
+        return '\n'.join(lines)
+
+    def test_import_creates_updates_and_rejects(self):
+        report = PriceListImporter(self.supplier, chunk_size=10).run(iter_csv(io.StringIO(self.price_list())))
+        self.assertEqual((report.rows, report.created, report.updated, report.rejected), (31, 28, 1, 2))
+        self.assertEqual(report.diffs, [('Ingredient 0', Decimal('5.00'), Decimal('4.50'))])
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.price, Decimal('4.50'))
+        self.assertEqual(SupplierStock.objects.get(ingredient=self.ingredients[29]).price, Decimal('29.25'))
+        self.assertEqual(PriceChange.objects.filter(ingredient=self.ingredients[0]).latest('pk').price, Decimal('4.50'))
+        self.assertEqual(PriceChange.objects.count(), 1 + 28 + 1)
+
+    def test_import_queries_per_chunk_are_constant(self):
+        importer = PriceListImporter(self.supplier, chunk_size=100)
+        with self.assertNumQueries(11):
+            importer.run(iter_csv(io.StringIO(self.price_list())))
+
+    def test_dry_run_writes_nothing(self):
+        report = PriceListImporter(self.supplier, dry_run=True).run(iter_csv(io.StringIO(self.price_list())))
+        self.assertEqual(report.created, 28)
+        self.assertEqual(SupplierStock.objects.count(), 1)
+
+    def test_non_finite_and_non_text_fields_are_rejected(self):
+        rows = [
+            {'ingredient': 'Ingredient 1', 'quantity': 1, 'unit': 'kg', 'price': 'NaN'},
+            {'ingredient': 'Ingredient 2', 'quantity': 'Infinity', 'unit': 'kg', 'price': 1},
+            {'ingredient': 5, 'quantity': 1, 'unit': 'kg', 'price': 1},
+            {'ingredient': 'Ingredient 3', 'quantity': 1, 'unit': 3, 'price': 1},
+            {'ingredient': 'Ingredient 4', 'quantity': [1], 'unit': 'kg', 'price': 1},
+            {'ingredient': 'Ingredient 5', 'quantity': 2, 'unit': 'kg', 'price': 1.5},
+        ]
+        upload = SimpleUploadedFile('prices.json', json.dumps(rows).encode())
+        response = self.client.post(reverse('inventory:price_list_import'), {'supplier': self.supplier.pk, 'price_list': upload})
+        self.assertContains(response, '1 created, 0 updated')
+        self.assertContains(response, "Row 1: Invalid quantity or price for &#x27;Ingredient 1&#x27;")
+        self.assertContains(response, "Row 2: Invalid quantity or price for &#x27;Ingredient 2&#x27;")
+        self.assertContains(response, "Row 3: &#x27;ingredient&#x27; must be text, not int")
+        self.assertContains(response, "Row 4: &#x27;unit&#x27; must be text, not int")
+        self.assertContains(response, "Row 5: Invalid quantity or price for &#x27;Ingredient 4&#x27;")
+        self.assertEqual(SupplierStock.objects.get(ingredient=self.ingredients[5]).price, Decimal('1.50'))
+
+    def test_iter_json_streams_arrays_and_lines(self):
+        rows = [{'ingredient': f'Ingredient {i}', 'quantity': 1, 'unit': 'kg', 'price': '1.5'} for i in range(30)]
+        self.assertEqual(list(iter_json(io.StringIO(json.dumps(rows)), buffer_size=16)), rows)
+        lines = '\n'.join(json.dumps(row) for row in rows)
+        self.assertEqual(list(iter_json(io.StringIO(lines), buffer_size=16)), rows)
+
+    def test_iter_json_rejects_scalars_and_invalid_items(self):
+        with self.assertRaisesMessage(PriceListError, 'Item 2 of the price list is not an object'):
+            list(iter_json(io.StringIO('[{"ingredient": "Flour"}, "Sugar"]')))
+        with self.assertRaisesMessage(PriceListError, 'Invalid JSON in item 2'):
+            list(iter_json(io.StringIO('{"ingredient": "Flour"}\n{"ingredient": "Sugar",'), buffer_size=16))
+        # Without the bound an unterminated item would buffer the rest of the stream.
+        endless = io.StringIO('[{"ingredient": "' + 'x' * 1000)
+        with self.assertRaisesMessage(PriceListError, 'Invalid JSON in item 1'):
+            next(iter_json(endless, buffer_size=16, max_item_size=100))
+        self.assertLess(endless.tell(), 200)
+
+    def test_upload_view(self):
+        upload = SimpleUploadedFile('prices.csv', self.price_list().encode())
+        response = self.client.post(reverse('inventory:price_list_import'), {'supplier': self.supplier.pk, 'price_list': upload})
+        self.assertContains(response, '28 created, 1 updated')
+        self.assertContains(response, 'Row 2: Unknown ingredient')
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as handle:
+            handle.write(self.price_list())
+            handle.flush()
+            out = io.StringIO()
+            call_command('import_price_list', self.supplier.name, handle.name, stdout=out, stderr=io.StringIO())
+        self.assertIn('28 created, 1 updated, 0 unchanged, 2 rejected', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        supplier = Supplier.objects.create(name='Test Supplier', contact_info='Test Contact')
+        ingredients = Ingredient.objects.bulk_create(Ingredient(name=f'Ingredient {i}') for i in range(5000))
+        SupplierStock.objects.bulk_create(
+            SupplierStock(supplier=supplier, ingredient=ingredient, quantity=1, unit='kg', price=Decimal('2.50'))
+            for ingredient in ingredients
+        )
+        kitchen = Establishment.objects.create(name='Kitchen')
+        EstablishmentStock.objects.create(establishment=kitchen, ingredient=ingredients[0], quantity=3, unit='kg')
+
+    def test_supplier_stock_csv_export(self):
+        response = self.client.get(reverse('inventory:supplier_stock_export'), {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,supplier_id,supplier,ingredient_id,ingredient,quantity,unit,price')
+        self.assertEqual(len(lines), 5001)
+
+    def test_establishment_stock_jsonl_export(self):
+        response = self.client.get(reverse('inventory:establishment_stock_export'), {'format': 'jsonl'})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(records[0]['ingredient'], 'Ingredient 0')
+        self.assertEqual(records[0]['quantity'], '3.00')
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse('inventory:supplier_stock_export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def export_peak_memory(self):
+        tracemalloc.start()
+        written = sum(len(text) for text in SupplierStockDataset().stream('jsonl'))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return written, peak
+
+    def test_export_queries_batches_and_memory(self):
+        with self.assertNumQueries(1):
+            batches = list(SupplierStockDataset().stream('jsonl', batch=500))
+        self.assertEqual(len(batches), 10)
+        self.assertEqual(sum(text.count('\n') for text in batches), 5000)
+
+        written, peak = self.export_peak_memory()
+        supplier = Supplier.objects.create(name='Second Supplier', contact_info='Contact')
+        SupplierStock.objects.bulk_create(
+            SupplierStock(supplier=supplier, ingredient=ingredient, quantity=1, unit='kg', price=Decimal('2.50'))
+            for ingredient in Ingredient.objects.all()
+        )
+        doubled_written, doubled_peak = self.export_peak_memory()
+        self.assertGreater(doubled_written, 1.9 * written)
+        self.assertLess(doubled_peak, 1.25 * peak)
+
+class ProductionPlanTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        self.flour = Ingredient.objects.create(name='Flour')
+        self.egg = Ingredient.objects.create(name='Egg')
+        self.salt = Ingredient.objects.create(name='Salt')
+        IngredientUnit.objects.create(ingredient=self.egg, name='unit', quantity=50, unit='g')
+        self.kitchen = Establishment.objects.create(name='Kitchen')
+        EstablishmentStock.objects.create(establishment=self.kitchen, ingredient=self.flour, quantity=Decimal('10'), unit='kg')
+        EstablishmentStock.objects.create(establishment=self.kitchen, ingredient=self.egg, quantity=Decimal('1'), unit='kg')
+        EstablishmentStock.objects.create(establishment=self.kitchen, ingredient=self.salt, quantity=Decimal('1'), unit='l')
+        self.bread = Recipe.objects.create(name='Bread', description='', instructions='')
+        self.cake = Recipe.objects.create(name='Cake', description='', instructions='')
+        RecipeIngredient.objects.create(recipe=self.bread, ingredient=self.flour, quantity=Decimal('100'), unit='g')
+        RecipeIngredient.objects.create(recipe=self.bread, ingredient=self.salt, quantity=Decimal('2'), unit='g')
+        RecipeIngredient.objects.create(recipe=self.cake, ingredient=self.flour, quantity=Decimal('0.05'), unit='kg')
+        RecipeIngredient.objects.create(recipe=self.cake, ingredient=self.egg, quantity=Decimal('1'), unit='unit')
+        self.plan = ProductionPlan.objects.create(establishment=self.kitchen, name='Monday', date='2026-10-19')
+        ProductionPlanItem.objects.create(plan=self.plan, recipe=self.bread, portions=120)
+        ProductionPlanItem.objects.create(plan=self.plan, recipe=self.cake, portions=40)
+        get_unit_table()
+
+    def test_requirements_are_aggregated_and_netted(self):
+        with self.assertNumQueries(2):
+            requirements = {requirement.ingredient: requirement for requirement in plan_requirements(self.plan)}
+        self.assertEqual(requirements['Flour'].required, Decimal('14000'))
+        self.assertEqual(requirements['Flour'].shortage, Decimal('4000'))
+        self.assertEqual(requirements['Egg'].required, Decimal('2000'))
+        self.assertEqual(requirements['Egg'].shortage, Decimal('1000'))
+        self.assertFalse(requirements['Salt'].comparable)
+        self.assertEqual([shortage.ingredient for shortage in plan_shortages(self.plan)], ['Egg', 'Flour', 'Salt'])
+
+    def test_requirements_follow_recipe_portions(self):
+        Recipe.objects.filter(pk=self.bread.pk).update(portions=4)
+        requirements = {requirement.ingredient: requirement for requirement in plan_requirements(self.plan)}
+        self.assertEqual(requirements['Flour'].required, Decimal('5000'))  # 120 / 4 * 100 g + 40 * 50 g
+
+    def test_uneven_portions_are_not_truncated(self):
+        Recipe.objects.filter(pk=self.bread.pk).update(portions=3)
+        ProductionPlanItem.objects.filter(plan=self.plan, recipe=self.bread).update(portions=100)
+        requirements = {requirement.ingredient: requirement for requirement in plan_requirements(self.plan)}
+        self.assertEqual(requirements['Flour'].required.quantize(Decimal('0.01')), Decimal('5333.33'))  # 100 / 3 * 100 g + 2000 g
+        ProductionPlanItem.objects.filter(plan=self.plan, recipe=self.bread).update(portions=1)
+        requirements = {requirement.ingredient: requirement for requirement in plan_requirements(self.plan)}
+        self.assertEqual(requirements['Salt'].required.quantize(Decimal('0.01')), Decimal('0.67'))
+
+    def test_requirements_json(self):
+        response = self.client.get(reverse('inventory:production_plan_requirements', args=[self.plan.pk]))
+        shortages = {row['ingredient']: row for row in response.json()['shortages']}
+        self.assertEqual(Decimal(shortages['Flour']['shortage']), 4000)
+
+    def test_create_plan_with_items(self):
+        response = self.client.post(reverse('inventory:production_plan_create'), {
+            'name': 'Tuesday',
+            'date': '2026-10-20',
+            'items-TOTAL_FORMS': '1',
+            'items-INITIAL_FORMS': '0',
+            'items-MIN_NUM_FORMS': '0',
+            'items-MAX_NUM_FORMS': '1000',
+            'items-0-recipe': self.bread.pk,
+            'items-0-portions': '30',
+        })
+        plan = ProductionPlan.objects.get(name='Tuesday')
+        self.assertRedirects(response, reverse('inventory:production_plan_detail', args=[plan.pk]))
+        response = self.client.get(reverse('inventory:production_plan_detail', args=[plan.pk]))
+        self.assertContains(response, 'Flour')
+
+class ProcurementTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        self.flour = Ingredient.objects.create(name='Flour')
+        self.egg = Ingredient.objects.create(name='Egg')
+        IngredientUnit.objects.create(ingredient=self.egg, name='unit', quantity=50, unit='g')
+        self.market = Supplier.objects.create(name='Market', contact_info='')
+        self.mill = Supplier.objects.create(name='Mill', contact_info='')
+        self.market_flour = SupplierStock.objects.create(supplier=self.market, ingredient=self.flour, quantity=Decimal('5'), unit='kg', price=Decimal('10.00'))
+        self.mill_flour = SupplierStock.objects.create(supplier=self.mill, ingredient=self.flour, quantity=Decimal('1'), unit='2 kg bag', price=Decimal('16.00'))
+        IngredientUnit.objects.create(ingredient=self.flour, name='2 kg bag', quantity=2, unit='kg')
+        SupplierStock.objects.create(supplier=self.market, ingredient=self.egg, quantity=Decimal('1'), unit='dozen', price=Decimal('3.00'))
+        recipe = Recipe.objects.create(name='Bread', description='', instructions='')
+        RecipeIngredient.objects.create(recipe=recipe, ingredient=self.flour, quantity=Decimal('100'), unit='g')
+        RecipeIngredient.objects.create(recipe=recipe, ingredient=self.egg, quantity=Decimal('1'), unit='unit')
+        kitchen = Establishment.objects.create(name='Kitchen')
+        self.plan = ProductionPlan.objects.create(establishment=kitchen, name='Monday', date='2026-10-19')
+        ProductionPlanItem.objects.create(plan=self.plan, recipe=recipe, portions=40)
+        get_unit_table()
+
+    def test_best_price_index_follows_supplier_stock(self):
+        best = IngredientBestPrice.objects.get(ingredient=self.flour)
+        self.assertEqual((best.supplier_stock_id, best.base_unit, best.unit_price), (self.mill_flour.pk, 'g', Decimal('0.008')))
+        self.mill_flour.delete()
+        best = IngredientBestPrice.objects.get(ingredient=self.flour)
+        self.assertEqual((best.supplier_stock_id, best.unit_price), (self.market_flour.pk, Decimal('0.01')))
+
+    def test_cheapest_offer_from_best_price_index(self):
+        with self.assertNumQueries(1):
+            procurement = plan_procurement([(self.flour.pk, Decimal('1500'), 'g')])
+        self.assertEqual([(allocation.offer.supplier_stock_id, allocation.quantity) for allocation in procurement.allocations[self.mill.pk]], [(self.mill_flour.pk, 1)])
+        self.assertEqual(procurement.unfilled, [])
+
+    def test_greedy_allocation_across_suppliers(self):
+        with self.assertNumQueries(2):
+            procurement = plan_procurement([(self.flour.pk, Decimal('4'), 'kg'), (self.egg.pk, Decimal('20'), 'unit')])
+        mill = [(allocation.offer.ingredient, allocation.quantity) for allocation in procurement.allocations[self.mill.pk]]
+        market = [(allocation.offer.ingredient, allocation.quantity) for allocation in procurement.allocations[self.market.pk]]
+        self.assertEqual(mill, [('Flour', 1)])
+        self.assertEqual(market, [('Flour', 2), ('Egg', 1)])
+        self.assertEqual(procurement.total, Decimal('39.00'))
+        self.assertEqual(procurement.unfilled, [(self.egg.pk, Decimal('400'), 'g')])
+
+    def test_draft_purchase_orders_from_plan(self):
+        response = self.client.get(reverse('inventory:production_plan_procurement', args=[self.plan.pk]))
+        self.assertContains(response, 'Mill')
+        self.assertContains(response, 'Egg: 1400.00 g')
+        response = self.client.post(reverse('inventory:production_plan_procurement', args=[self.plan.pk]))
+        self.assertRedirects(response, reverse('inventory:purchase_order_list'))
+        orders = {order.supplier.name: order for order in PurchaseOrder.objects.filter(plan=self.plan)}
+        self.assertEqual(set(orders), {'Market', 'Mill'})
+        self.assertEqual(
+            sorted((line.ingredient.name, line.quantity, line.unit) for line in orders['Market'].lines.all()),
+            [('Egg', Decimal('1.00'), 'dozen'), ('Flour', Decimal('2.00'), 'kg')],
+        )
+        response = self.client.get(reverse('inventory:purchase_order_detail', args=[orders['Mill'].pk]))
+        self.assertContains(response, '2 kg bag of Flour')
+
+class StockLedgerTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        self.flour = Ingredient.objects.create(name='Flour')
+        self.kitchen = Establishment.objects.create(name='Kitchen')
+        self.stock = EstablishmentStock.objects.create(establishment=self.kitchen, ingredient=self.flour, quantity=Decimal('10'), unit='kg')
+        get_unit_table()
+
+    def test_movements_increment_balance_in_stock_unit(self):
+        record_movement(self.kitchen.pk, self.flour.pk, StockMovement.RECEIPT, Decimal('5'), 'kg')
+        movement = record_movement(self.kitchen.pk, self.flour.pk, StockMovement.CONSUMPTION, Decimal('1500'), 'g')
+        record_movement(self.kitchen.pk, self.flour.pk, StockMovement.WASTE, Decimal('0.5'), 'kg')
+        self.assertEqual((movement.quantity, movement.unit), (Decimal('-1.50'), 'kg'))
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.quantity, Decimal('13.00'))
+
+    def test_stock_count_records_the_difference(self):
+        response = self.client.post(reverse('inventory:establishment_stock_update', args=[self.stock.pk]), {
+            'ingredient': self.flour.pk, 'quantity': '8000', 'unit': 'g',
+        })
+        self.assertRedirects(response, reverse('inventory:establishment_stock_list'))
+        self.stock.refresh_from_db()
+        self.assertEqual((self.stock.quantity, self.stock.unit), (Decimal('8000.00'), 'g'))
+        movement = StockMovement.objects.get()
+        self.assertEqual((movement.kind, movement.quantity), (StockMovement.ADJUSTMENT, Decimal('-2000.00')))
+
+    def test_stock_count_keeps_the_ingredient(self):
+        salt = Ingredient.objects.create(name='Salt')
+        url = reverse('inventory:establishment_stock_update', args=[self.stock.pk])
+        self.assertContains(self.client.get(url), 'value="Flour"')
+        response = self.client.post(url, {'ingredient': salt.pk, 'ingredient_label': 'Salt', 'quantity': '7', 'unit': 'kg'})
+        self.assertRedirects(response, reverse('inventory:establishment_stock_list'))
+        self.stock.refresh_from_db()
+        self.assertEqual((self.stock.ingredient, self.stock.quantity), (self.flour, Decimal('7.00')))
+        self.assertFalse(EstablishmentStock.objects.filter(ingredient=salt).exists())
+        response = self.client.post(url, {'quantity': '7', 'unit': 'furlong'})
+        self.assertContains(response, 'value="Flour"')
+
+    def test_record_movement_view(self):
+        response = self.client.post(reverse('inventory:stock_movement_create'), {
+            'ingredient': self.flour.pk, 'kind': 'consumption', 'quantity': '2', 'unit': 'kg', 'note': 'Lunch',
+        })
+        self.assertRedirects(response, reverse('inventory:stock_movement_list'))
+        self.assertContains(self.client.get(reverse('inventory:stock_movement_list')), 'Lunch')
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.quantity, Decimal('8.00'))
+
+    def test_stock_as_of_uses_latest_snapshot(self):
+        start = timezone.now() - timedelta(days=3)
+        for day in range(3):
+            record_movement(self.kitchen.pk, self.flour.pk, StockMovement.RECEIPT, Decimal('4'), 'kg', created_at=start + timedelta(days=day))
+        record_movement(self.kitchen.pk, self.flour.pk, StockMovement.CONSUMPTION, Decimal('1'), 'kg', created_at=start + timedelta(days=1, hours=1))
+        self.assertEqual(compact_snapshots(start + timedelta(days=1, hours=12)), 1)
+        self.assertEqual(compact_snapshots(start + timedelta(days=1, hours=12)), 0)
+        with CaptureQueriesContext(connection) as queries:
+            balances = stock_as_of(start + timedelta(days=2, hours=1))
+        self.assertEqual(balances, {(self.flour.pk, 'g'): Decimal('11000')})
+        # Watermark, snapshot rows and only the movements after the compaction.
+        self.assertEqual(len(queries), 3)
+        self.assertIn('"inventory_stockmovement"."created_at" >', queries[2]['sql'])
+        self.assertEqual(StockMovement.objects.count(), 4)
+        self.assertEqual(stock_as_of(start + timedelta(days=1, hours=13)), {(self.flour.pk, 'g'): Decimal('7000')})
+        self.assertEqual(StockSnapshot.objects.get().quantity, Decimal('7000'))
+
+    def test_compaction_carries_unmoved_balances_forward(self):
+        salt = Ingredient.objects.create(name='Salt')
+        start = timezone.now() - timedelta(days=3)
+        record_movement(self.kitchen.pk, self.flour.pk, StockMovement.RECEIPT, Decimal('2'), 'kg', created_at=start)
+        record_movement(self.kitchen.pk, salt.pk, StockMovement.RECEIPT, Decimal('1'), 'kg', created_at=start)
+        self.assertEqual(compact_snapshots(start + timedelta(days=1)), 2)
+        record_movement(self.kitchen.pk, self.flour.pk, StockMovement.CONSUMPTION, Decimal('1'), 'kg', created_at=start + timedelta(days=1, hours=1))
+        self.assertEqual(compact_snapshots(start + timedelta(days=2)), 2)
+        self.assertEqual(
+            stock_as_of(start + timedelta(days=2, hours=1)), {(self.flour.pk, 'g'): Decimal('1000'), (salt.pk, 'g'): Decimal('1000')},
+        )
+        self.assertEqual(stock_as_of(start + timedelta(days=1), [salt.pk]), {(salt.pk, 'g'): Decimal('1000')})
+
+class PriceHistoryTestCase(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='Test Contact')
+        self.flour = Ingredient.objects.create(name='Flour')
+        self.salt = Ingredient.objects.create(name='Salt')
+        self.stock = SupplierStock.objects.create(
+            supplier=self.supplier, ingredient=self.flour, quantity=10, unit='kg', price=Decimal('1.50')
+        )
+
+    def history(self):
+        return list(PriceChange.objects.order_by('pk').values_list('ingredient_id', 'unit', 'price'))
+
+    def test_saving_stock_appends_changes(self):
+        self.stock.quantity = 20
+        self.stock.save()  # Same offer, nothing recorded
+        self.stock.price = Decimal('1.75')
+        self.stock.save()
+        self.stock.unit = 'lb'
+        self.stock.save()
+        self.stock.ingredient = self.salt
+        self.stock.save()
+        self.stock.delete()
+        self.assertEqual(self.history(), [
+            (self.flour.pk, 'kg', Decimal('1.50')),
+            (self.flour.pk, 'kg', Decimal('1.75')),
+            (self.flour.pk, 'lb', Decimal('1.75')),
+            (self.flour.pk, 'lb', None),
+            (self.salt.pk, 'lb', Decimal('1.75')),
+            (self.salt.pk, 'lb', None),
+        ])
+
+    def test_deleting_supplier_removes_its_history(self):
+        self.supplier.delete()
+        self.assertFalse(PriceChange.objects.exists())
+
+    def test_prices_as_of_in_one_query(self):
+        other = Supplier.objects.create(name='Other Supplier', contact_info='Other Contact')
+        start = timezone.now() - timedelta(days=30)
+        PriceChange.objects.update(valid_from=start)
+        record_price_changes([(self.flour.pk, self.supplier.pk, 'kg', Decimal('2.00'))], when=start + timedelta(days=10))
+        record_price_changes([(self.flour.pk, other.pk, 'kg', Decimal('1.80'))], when=start + timedelta(days=5))
+        record_price_changes([(self.flour.pk, other.pk, 'kg', None)], when=start + timedelta(days=20))
+        with self.assertNumQueries(1):
+            prices = prices_as_of(start + timedelta(days=15))
+        self.assertEqual(prices, {
+            (self.flour.pk, self.supplier.pk): ('kg', Decimal('2.00')),
+            (self.flour.pk, other.pk): ('kg', Decimal('1.80')),
+        })
+        self.assertEqual(prices_as_of(start + timedelta(days=1), [self.flour.pk]), {(self.flour.pk, self.supplier.pk): ('kg', Decimal('1.50'))})
+        self.assertEqual(prices_as_of(start + timedelta(days=25)), {(self.flour.pk, self.supplier.pk): ('kg', Decimal('2.00'))})
+        self.assertEqual(prices_as_of(start - timedelta(days=1)), {})
+
+    def test_month_ends(self):
+        ends = month_ends(3, until=timezone.make_aware(datetime(2024, 3, 15)))
+        self.assertEqual([(end.year, end.month, end.day) for end in ends], [(2023, 12, 31), (2024, 1, 31), (2024, 2, 29)])
+
+class StockForecastTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        self.flour = Ingredient.objects.create(name='Flour')
+        self.salt = Ingredient.objects.create(name='Salt')
+        supplier = Supplier.objects.create(name='Test Supplier', contact_info='Test Contact', lead_time_days=4)
+        SupplierStock.objects.create(supplier=supplier, ingredient=self.flour, quantity=50, unit='kg', price=Decimal('1.50'))
+        self.kitchen = Establishment.objects.create(name='Kitchen')
+        self.flour_stock = EstablishmentStock.objects.create(establishment=self.kitchen, ingredient=self.flour, quantity=Decimal('5'), unit='kg')
+        self.salt_stock = EstablishmentStock.objects.create(establishment=self.kitchen, ingredient=self.salt, quantity=Decimal('100'), unit='kg')
+        get_unit_table()
+
+    def consume(self, ingredient, days, quantity, unit='kg', skip=0):
+        today = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+        StockMovement.objects.bulk_create([
+            StockMovement(establishment=self.kitchen, ingredient=ingredient, kind=StockMovement.CONSUMPTION, quantity=-quantity, unit=unit, created_at=today - timedelta(days=day))
+            for day in range(1 + skip, days + 1)
+        ])
+
+    def test_fit_smoothing_learns_each_series(self):
+        weekly = np.tile([10.0, 0, 0, 0, 0, 0, 0], 8)
+        level, seasonal, alpha, deviation = fit_smoothing(np.stack([weekly, np.full(56, 2.0)]))
+        np.testing.assert_allclose(level + seasonal[:, 0], [10, 2], atol=0.01)
+        np.testing.assert_allclose(level + seasonal[:, 1], [0, 2], atol=0.01)
+        np.testing.assert_allclose(deviation, [0, 0], atol=0.01)
+
+    def test_forecast_reorder_point_and_order_quantity(self):
+        self.consume(self.flour, 60, Decimal('3'), skip=1)
+        self.consume(self.flour, 1, Decimal('3000'), unit='g')  # Recorded before the stock unit changed
+        self.consume(self.salt, 60, Decimal('1'))
+        with self.assertNumQueries(5):
+            self.assertEqual(forecast_stock(days=60), 2)
+        flour = StockForecast.objects.get(stock=self.flour_stock)
+        self.assertEqual((flour.daily_demand, flour.demand_deviation, flour.lead_time_days), (Decimal('3.00'), Decimal('0.00'), 4))
+        self.assertEqual((flour.reorder_point, flour.order_quantity), (Decimal('12.00'), Decimal('28.00')))
+        salt = StockForecast.objects.get(stock=self.salt_stock)
+        self.assertEqual(salt.lead_time_days, DEFAULT_LEAD_TIME_DAYS)
+        self.assertEqual((salt.reorder_point, salt.order_quantity), (Decimal('2.00'), Decimal('0.00')))
+
+        self.consume(self.flour, 60, Decimal('1'))
+        forecast_stock(days=60)
+        self.assertEqual(StockForecast.objects.get(stock=self.flour_stock).daily_demand, Decimal('4.00'))
+
+    def test_stock_list_shows_forecast(self):
+        self.consume(self.flour, 30, Decimal('3'))
+        call_command('forecast_stock', days=30, stdout=io.StringIO())
+        response = self.client.get(reverse('inventory:establishment_stock_list'))
+        self.assertContains(response, 'reorder at 12.00 kg, <strong>order 28.00 kg</strong>')
+        self.assertContains(response, 'reorder at 0.00 kg)')
+
+class EstablishmentTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        self.flour = Ingredient.objects.create(name='Flour')
+        self.salt = Ingredient.objects.create(name='Salt')
+        self.kitchen = Establishment.objects.create(name='Kitchen')
+        self.bakery = Establishment.objects.create(name='Bakery')
+        self.kitchen_flour = EstablishmentStock.objects.create(establishment=self.kitchen, ingredient=self.flour, quantity=Decimal('10'), unit='kg')
+        self.bakery_flour = EstablishmentStock.objects.create(establishment=self.bakery, ingredient=self.flour, quantity=Decimal('25'), unit='kg')
+        EstablishmentStock.objects.create(establishment=self.bakery, ingredient=self.salt, quantity=Decimal('2'), unit='kg')
+        get_unit_table()
+
+    def select(self, establishment):
+        response = self.client.post(reverse('inventory:establishment_select', args=[establishment.pk]))
+        self.assertRedirects(response, reverse('inventory:establishment_stock_list'))
+
+    def test_pages_are_scoped_to_the_selected_establishment(self):
+        response = self.client.get(reverse('inventory:establishment_stock_list'))
+        self.assertContains(response, 'Stock at Kitchen')
+        self.assertContains(response, 'Flour: 10.00 kg')
+        self.assertNotContains(response, 'Salt')
+        self.select(self.bakery)
+        response = self.client.get(reverse('inventory:establishment_stock_list'))
+        self.assertContains(response, 'Flour: 25.00 kg')
+        self.assertContains(response, 'Salt')
+        response = self.client.get(reverse('inventory:establishment_stock_update', args=[self.kitchen_flour.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_movements_and_plans_belong_to_one_establishment(self):
+        self.select(self.bakery)
+        self.client.post(reverse('inventory:stock_movement_create'), {
+            'ingredient': self.flour.pk, 'kind': 'consumption', 'quantity': '5', 'unit': 'kg', 'note': 'Baguettes',
+        })
+        self.bakery_flour.refresh_from_db()
+        self.kitchen_flour.refresh_from_db()
+        self.assertEqual((self.bakery_flour.quantity, self.kitchen_flour.quantity), (Decimal('20.00'), Decimal('10.00')))
+        self.assertEqual(StockMovement.objects.get().establishment, self.bakery)
+        self.assertEqual(stock_as_of(timezone.now(), establishment_id=self.bakery.pk)[(self.flour.pk, 'g')], Decimal('-5000'))
+        plan = ProductionPlan.objects.create(establishment=self.kitchen, name='Monday', date='2026-10-19')
+        self.assertEqual(self.client.get(reverse('inventory:production_plan_detail', args=[plan.pk])).status_code, 404)
+        self.assertNotContains(self.client.get(reverse('inventory:production_plan_list')), 'Monday')
+
+    def test_same_ingredient_once_per_establishment(self):
+        self.select(self.bakery)
+        response = self.client.post(reverse('inventory:establishment_stock_create'), {
+            'ingredient': self.salt.pk, 'quantity': '1', 'unit': 'kg',
+        })
+        self.assertContains(response, 'Salt is already stocked here')
+        self.select(self.kitchen)
+        response = self.client.post(reverse('inventory:establishment_stock_create'), {
+            'ingredient': self.salt.pk, 'quantity': '1', 'unit': 'kg',
+        })
+        self.assertRedirects(response, reverse('inventory:establishment_stock_list'))
+        stock = EstablishmentStock.objects.get(establishment=self.kitchen, ingredient=self.salt)
+        self.assertEqual(stock.quantity, Decimal('1.00'))
+        self.assertEqual(StockMovement.objects.get().establishment, self.kitchen)
+
+    def test_consolidated_stock_is_aggregated_in_one_query(self):
+        with self.assertNumQueries(4):  # Session, user, count, page
+            response = self.client.get(reverse('inventory:consolidated_stock'))
+        self.assertContains(response, 'Flour: 35.00 kg across 2 establishments')
+        self.assertContains(response, 'Salt: 2.00 kg across 1 establishment')
+        response = self.client.get(reverse('inventory:consolidated_stock'), {'ingredient': 'sa'})
+        self.assertNotContains(response, 'Flour')
+
+    def test_without_establishments_the_first_one_is_created(self):
+        Establishment.objects.all().delete()
+        response = self.client.get(reverse('inventory:establishment_stock_list'))
+        self.assertRedirects(response, reverse('inventory:establishment_create'))
+        response = self.client.post(reverse('inventory:establishment_create'), {'name': 'Canteen', 'address': ''})
+        self.assertRedirects(response, reverse('inventory:establishment_list'))
+        self.assertContains(self.client.get(reverse('inventory:establishment_stock_list')), 'Stock at Canteen')
+
+class StockLedgerConcurrencyTestCase(TransactionTestCase):
+    def test_concurrent_consumption_loses_no_updates(self):
+        flour = Ingredient.objects.create(name='Flour')
+        kitchen = Establishment.objects.create(name='Kitchen')
+        EstablishmentStock.objects.create(establishment=kitchen, ingredient=flour, quantity=Decimal('1000'), unit='kg')
+        errors = []
+
+        def consume():
+            try:
+                for _ in range(25):
+                    record_movement(kitchen.pk, flour.pk, StockMovement.CONSUMPTION, Decimal('1'), 'kg')
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=consume) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(EstablishmentStock.objects.get(ingredient=flour).quantity, Decimal('800'))
+        self.assertEqual(StockMovement.objects.filter(ingredient=flour).count(), 200)
+
+class DashboardTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        flour = Ingredient.objects.create(name='Flour')
+        salt = Ingredient.objects.create(name='Salt')
+        mill = Supplier.objects.create(name='Mill', contact_info='')
+        market = Supplier.objects.create(name='Market', contact_info='')
+        stock = SupplierStock.objects.create(supplier=mill, ingredient=flour, quantity=50, unit='kg', price=Decimal('1.50'))
+        kitchen = Establishment.objects.create(name='Kitchen')
+        EstablishmentStock.objects.create(establishment=kitchen, ingredient=flour, quantity=Decimal('2000'), unit='g')
+        EstablishmentStock.objects.create(establishment=kitchen, ingredient=salt, quantity=Decimal('3'), unit='kg')
+        sent = PurchaseOrder.objects.create(supplier=mill, status=PurchaseOrder.SENT)
+        PurchaseOrderLine.objects.create(order=sent, supplier_stock=stock, ingredient=flour, quantity=10, unit='kg', price=Decimal('1.50'))
+        draft = PurchaseOrder.objects.create(supplier=market, status=PurchaseOrder.DRAFT)
+        PurchaseOrderLine.objects.create(order=draft, ingredient=salt, quantity=2, unit='kg', price=Decimal('4.00'))
+        self.bread = Recipe.objects.create(name='Bread', description='', instructions='')
+        RecipeIngredient.objects.create(recipe=self.bread, ingredient=flour, quantity=Decimal('4'), unit='kg')
+        reprice_recipes()
+
+    async def test_aggregates(self):
+        data = await dashboard()
+        self.assertEqual((data['stock_value'], data['unpriced_stock'], data['low_stock']), (Decimal('3.00'), 1, 1))
+        self.assertEqual(
+            [(row['supplier'], row['spend'], row['drafted']) for row in data['supplier_spend']],
+            [('Mill', Decimal('15.00'), 0), ('Market', 0, Decimal('8.00'))],
+        )
+        self.assertEqual([(row['recipe'], row['total']) for row in data['expensive_recipes']], [('Bread', Decimal('6.00'))])
+
+    async def test_view_requires_login(self):
+        url = reverse('inventory:dashboard')
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(url)
+        self.assertContains(response, '$3.00')
+        response = await self.async_client.get(url, {'format': 'json'})
+        self.assertEqual(json.loads(response.content)['low_stock'], 1)
+
+class LoadTestCommandTestCase(TransactionTestCase):
+    # The ASGI handler queries from its own thread, which cannot see a TestCase transaction.
+    def test_load_test_command(self):
+        out = io.StringIO()
+        call_command('loadtest', 'inventory:dashboard', 'inventory:supplier_list', clients='1,2', requests=4, warmup=0, stdout=out)
+        self.assertRegex(out.getvalue(), r'inventory:dashboard\s+async\s+2\s+[\d.]+')
+        self.assertRegex(out.getvalue(), r'inventory:supplier_list\s+sync\s+1\s+[\d.]+')
+        self.assertFalse(User.objects.filter(username='loadtest').exists())
+        self.assertFalse(Session.objects.exists())
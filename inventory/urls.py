@@ -1,4 +1,6 @@
 from django.urls import path
+from tochinalli_project.exports import ExportView
+from .exports import SupplierStockDataset, EstablishmentStockDataset
 from .views import (
     SupplierListView,
     SupplierCreateView,
@@ -6,14 +8,33 @@ from .views import (
     SupplierStockListView,
     SupplierStockCreateView,
     SupplierStockUpdateView,
+    PriceListImportView,
+    EstablishmentListView,
+    EstablishmentCreateView,
+    EstablishmentUpdateView,
+    EstablishmentSelectView,
     EstablishmentStockListView,
     EstablishmentStockCreateView,
     EstablishmentStockUpdateView,
+    ConsolidatedStockView,
+    StockMovementListView,
+    StockMovementCreateView,
+    ProductionPlanListView,
+    ProductionPlanCreateView,
+    ProductionPlanUpdateView,
+    ProductionPlanDetailView,
+    ProductionPlanRequirementsView,
+    ProductionPlanProcurementView,
+    PurchaseOrderListView,
+    PurchaseOrderDetailView,
+    InventoryDashboardView,
 )
 
 app_name = 'inventory'
 
 urlpatterns = [
+    path('dashboard/', InventoryDashboardView.as_view(), name='dashboard'),
+
     path('suppliers/', SupplierListView.as_view(), name='supplier_list'),
     path('suppliers/new/', SupplierCreateView.as_view(), name='supplier_create'),
     path('suppliers/<int:pk>/edit/', SupplierUpdateView.as_view(), name='supplier_update'),
@@ -21,8 +42,30 @@ urlpatterns = [
     path('supplier-stock/', SupplierStockListView.as_view(), name='supplier_stock_list'),
     path('supplier-stock/new/', SupplierStockCreateView.as_view(), name='supplier_stock_create'),
     path('supplier-stock/<int:pk>/edit/', SupplierStockUpdateView.as_view(), name='supplier_stock_update'),
+    path('supplier-stock/import/', PriceListImportView.as_view(), name='price_list_import'),
+    path('supplier-stock/export/', ExportView.as_view(dataset_class=SupplierStockDataset), name='supplier_stock_export'),
+
+    path('establishments/', EstablishmentListView.as_view(), name='establishment_list'),
+    path('establishments/new/', EstablishmentCreateView.as_view(), name='establishment_create'),
+    path('establishments/<int:pk>/edit/', EstablishmentUpdateView.as_view(), name='establishment_update'),
+    path('establishments/<int:pk>/select/', EstablishmentSelectView.as_view(), name='establishment_select'),
 
     path('establishment-stock/', EstablishmentStockListView.as_view(), name='establishment_stock_list'),
     path('establishment-stock/new/', EstablishmentStockCreateView.as_view(), name='establishment_stock_create'),
     path('establishment-stock/<int:pk>/edit/', EstablishmentStockUpdateView.as_view(), name='establishment_stock_update'),
+    path('establishment-stock/all/', ConsolidatedStockView.as_view(), name='consolidated_stock'),
+    path('establishment-stock/export/', ExportView.as_view(dataset_class=EstablishmentStockDataset), name='establishment_stock_export'),
+
+    path('stock-movements/', StockMovementListView.as_view(), name='stock_movement_list'),
+    path('stock-movements/new/', StockMovementCreateView.as_view(), name='stock_movement_create'),
+
+    path('production-plans/', ProductionPlanListView.as_view(), name='production_plan_list'),
+    path('production-plans/new/', ProductionPlanCreateView.as_view(), name='production_plan_create'),
+    path('production-plans/<int:pk>/', ProductionPlanDetailView.as_view(), name='production_plan_detail'),
+    path('production-plans/<int:pk>/edit/', ProductionPlanUpdateView.as_view(), name='production_plan_update'),
+    path('production-plans/<int:pk>/requirements.json', ProductionPlanRequirementsView.as_view(), name='production_plan_requirements'),
+    path('production-plans/<int:pk>/procurement/', ProductionPlanProcurementView.as_view(), name='production_plan_procurement'),
+
+    path('purchase-orders/', PurchaseOrderListView.as_view(), name='purchase_order_list'),
+    path('purchase-orders/<int:pk>/', PurchaseOrderDetailView.as_view(), name='purchase_order_detail'),
 ]
@@ -1,14 +1,66 @@
-from django.urls import reverse_lazy
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView
+import io
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponseRedirect, JsonResponse
+from django.shortcuts import render
+from django.urls import reverse, reverse_lazy
+from django.views import View
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView, FormView
+from django.views.generic.detail import SingleObjectMixin
 from django.contrib.auth.mixins import LoginRequiredMixin
-from .models import Supplier, SupplierStock, EstablishmentStock
-from .forms import SupplierForm, SupplierStockForm, EstablishmentStockForm
+from .models import Supplier, SupplierStock, Establishment, EstablishmentStock, StockMovement, ProductionPlan, PurchaseOrder
+from .forms import SupplierForm, SupplierStockForm, EstablishmentForm, EstablishmentStockForm, StockMovementForm, PriceListImportForm, ProductionPlanForm, PlanItemFormSet
+from .dashboard import dashboard
+from .ledger import record_count, record_movement
+from .planning import plan_requirements, plan_shortages
+from .procurement import create_purchase_orders, plan_procurement
+from .importers import PriceListError, PriceListImporter, iter_csv, iter_json
+from jobs.queue import enqueue, job_files
+from recipes.units import UnitConversionError
+from tochinalli_project.pagination import KeysetPaginationMixin
+
+ESTABLISHMENT_SESSION_KEY = 'establishment'
+
+class EstablishmentMixin:
+    """Scopes a view to the establishment selected in the session, the first one by default."""
+
+    def dispatch(self, request, *args, **kwargs):
+        self.establishment = self.get_establishment()
+        if self.establishment is None:
+            return HttpResponseRedirect(reverse('inventory:establishment_create'))
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_establishment(self):
+        establishments = Establishment.objects.order_by('pk')
+        selected = self.request.session.get(ESTABLISHMENT_SESSION_KEY)
+        establishment = establishments.filter(pk=selected).first() if selected is not None else None
+        return establishment or establishments.first()
+
+    def get_queryset(self):
+        return super().get_queryset().for_establishment(self.establishment)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        if 'instance' in kwargs and kwargs['instance'] is None:
+            kwargs['instance'] = self.model(establishment=self.establishment)
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        data = super().get_context_data(**kwargs)
+        data['establishment'] = self.establishment
+        return data
 
 # Supplier Views
-class SupplierListView(LoginRequiredMixin, ListView):
+class SupplierListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Supplier
     template_name = 'inventory/supplier_list.html'
+    row_template_name = 'inventory/includes/supplier_row.html'
     context_object_name = 'suppliers'
+    sort_fields = {'name': 'name'}
+    default_sort = 'name'
+    filter_fields = {'q': 'name__istartswith'}
 
 class SupplierCreateView(LoginRequiredMixin, CreateView):
     model = Supplier
@@ -23,10 +75,15 @@ class SupplierUpdateView(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy('inventory:supplier_list')
 
 # SupplierStock Views
-class SupplierStockListView(LoginRequiredMixin, ListView):
+class SupplierStockListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = SupplierStock
+    queryset = SupplierStock.objects.select_related('ingredient', 'supplier')
     template_name = 'inventory/supplier_stock_list.html'
+    row_template_name = 'inventory/includes/supplier_stock_row.html'
     context_object_name = 'supplier_stock'
+    sort_fields = {'ingredient': 'ingredient_name', 'price': 'price'}
+    default_sort = 'ingredient'
+    filter_fields = {'ingredient': 'ingredient__name__istartswith', 'supplier': 'supplier__name__istartswith'}
 
 class SupplierStockCreateView(LoginRequiredMixin, CreateView):
     model = SupplierStock
@@ -40,20 +97,260 @@ class SupplierStockUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'inventory/supplier_stock_form.html'
     success_url = reverse_lazy('inventory:supplier_stock_list')
 
+class PriceListImportView(LoginRequiredMixin, FormView):
+    form_class = PriceListImportForm
+    template_name = 'inventory/price_list_import.html'
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['price_list']
+        if form.cleaned_data['background']:
+            job = enqueue(
+                'inventory.import_price_list', supplier_id=form.cleaned_data['supplier'].pk,
+                path=job_files().save(f'price_lists/{upload.name}', upload), dry_run=form.cleaned_data['dry_run'],
+            )
+            return self.render_to_response(self.get_context_data(form=form, job=job))
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        rows = iter_csv(stream) if upload.name.lower().endswith('.csv') else iter_json(stream)
+        importer = PriceListImporter(form.cleaned_data['supplier'], dry_run=form.cleaned_data['dry_run'])
+        try:
+            report = importer.run(rows)
+        except PriceListError as exc:
+            form.add_error('price_list', str(exc))
+            return self.form_invalid(form)
+        return self.render_to_response(self.get_context_data(form=form, report=report))
+
+# Establishment Views
+class EstablishmentListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    model = Establishment
+    template_name = 'inventory/establishment_list.html'
+    row_template_name = 'inventory/includes/establishment_row.html'
+    context_object_name = 'establishments'
+    sort_fields = {'name': 'name'}
+    default_sort = 'name'
+    filter_fields = {'q': 'name__istartswith'}
+
+class EstablishmentCreateView(LoginRequiredMixin, CreateView):
+    model = Establishment
+    form_class = EstablishmentForm
+    template_name = 'inventory/establishment_form.html'
+    success_url = reverse_lazy('inventory:establishment_list')
+
+class EstablishmentUpdateView(LoginRequiredMixin, UpdateView):
+    model = Establishment
+    form_class = EstablishmentForm
+    template_name = 'inventory/establishment_form.html'
+    success_url = reverse_lazy('inventory:establishment_list')
+
+class EstablishmentSelectView(LoginRequiredMixin, SingleObjectMixin, View):
+    """Makes an establishment the one stock, movement and plan pages work on for this session."""
+    model = Establishment
+
+    def post(self, request, *args, **kwargs):
+        request.session[ESTABLISHMENT_SESSION_KEY] = self.get_object().pk
+        return HttpResponseRedirect(reverse('inventory:establishment_stock_list'))
+
 # EstablishmentStock Views
-class EstablishmentStockListView(LoginRequiredMixin, ListView):
+class EstablishmentStockListView(LoginRequiredMixin, EstablishmentMixin, KeysetPaginationMixin, ListView):
     model = EstablishmentStock
+    queryset = EstablishmentStock.objects.select_related('ingredient', 'forecast')
     template_name = 'inventory/establishment_stock_list.html'
+    row_template_name = 'inventory/includes/establishment_stock_row.html'
     context_object_name = 'establishment_stock'
+    sort_fields = {'ingredient': 'ingredient_name', 'quantity': 'quantity'}
+    default_sort = 'ingredient'
+    filter_fields = {'ingredient': 'ingredient__name__istartswith'}
 
-class EstablishmentStockCreateView(LoginRequiredMixin, CreateView):
+class EstablishmentStockCreateView(LoginRequiredMixin, EstablishmentMixin, CreateView):
     model = EstablishmentStock
     form_class = EstablishmentStockForm
     template_name = 'inventory/establishment_stock_form.html'
     success_url = reverse_lazy('inventory:establishment_stock_list')
 
-class EstablishmentStockUpdateView(LoginRequiredMixin, UpdateView):
+    def form_valid(self, form):
+        # The opening quantity goes through the ledger so movements add up to the balance.
+        with transaction.atomic():
+            self.object = form.save(commit=False)
+            opening = self.object.quantity
+            self.object.quantity = 0
+            self.object.save()
+            record_movement(
+                self.object.establishment_id, self.object.ingredient_id, StockMovement.ADJUSTMENT, opening, self.object.unit,
+                note='Opening balance',
+            )
+        return HttpResponseRedirect(self.get_success_url())
+
+class EstablishmentStockUpdateView(LoginRequiredMixin, EstablishmentMixin, UpdateView):
     model = EstablishmentStock
     form_class = EstablishmentStockForm
     template_name = 'inventory/establishment_stock_form.html'
     success_url = reverse_lazy('inventory:establishment_stock_list')
+
+    def form_valid(self, form):
+        # Saving a quantity is a stock count: the ledger records the difference from the
+        # current balance instead of overwriting movements made since the form was loaded.
+        try:
+            record_count(self.object.establishment_id, self.object.ingredient_id, form.cleaned_data['quantity'], form.cleaned_data['unit'])
+        except UnitConversionError as exc:
+            form.add_error('unit', str(exc))
+            return self.form_invalid(form)
+        return HttpResponseRedirect(self.get_success_url())
+
+class ConsolidatedStockView(LoginRequiredMixin, ListView):
+    """Stock of every establishment added up per ingredient and unit, aggregated by the database."""
+    template_name = 'inventory/consolidated_stock.html'
+    context_object_name = 'totals'
+    paginate_by = 50
+
+    def get_queryset(self):
+        stock = EstablishmentStock.objects.all()
+        ingredient = self.request.GET.get('ingredient')
+        if ingredient:
+            stock = stock.filter(ingredient__name__istartswith=ingredient)
+        return (
+            stock.values('ingredient_id', 'ingredient__name', 'unit')
+            .annotate(total=Sum('quantity'), establishments=Count('establishment_id'), order_quantity=Sum('forecast__order_quantity'))
+            .order_by('ingredient__name', 'ingredient_id', 'unit')
+        )
+
+# StockMovement Views
+class StockMovementListView(LoginRequiredMixin, EstablishmentMixin, KeysetPaginationMixin, ListView):
+    model = StockMovement
+    queryset = StockMovement.objects.select_related('ingredient')
+    template_name = 'inventory/stock_movement_list.html'
+    row_template_name = 'inventory/includes/stock_movement_row.html'
+    context_object_name = 'movements'
+    sort_fields = {'created': 'created_at'}
+    default_sort = '-created'
+    filter_fields = {'ingredient': 'ingredient__name__istartswith', 'kind': 'kind'}
+
+class StockMovementCreateView(LoginRequiredMixin, EstablishmentMixin, FormView):
+    form_class = StockMovementForm
+    template_name = 'inventory/stock_movement_form.html'
+    success_url = reverse_lazy('inventory:stock_movement_list')
+
+    def form_valid(self, form):
+        data = form.cleaned_data
+        try:
+            record_movement(self.establishment.pk, data['ingredient'].pk, data['kind'], data['quantity'], data['unit'], note=data['note'])
+        except UnitConversionError as exc:
+            form.add_error('unit', str(exc))
+            return self.form_invalid(form)
+        return super().form_valid(form)
+
+# ProductionPlan Views
+class ProductionPlanListView(LoginRequiredMixin, EstablishmentMixin, ListView):
+    model = ProductionPlan
+    queryset = ProductionPlan.objects.order_by('-date', '-pk')
+    template_name = 'inventory/production_plan_list.html'
+    context_object_name = 'plans'
+    paginate_by = 50
+
+class ProductionPlanFormMixin:
+    model = ProductionPlan
+    form_class = ProductionPlanForm
+    template_name = 'inventory/production_plan_form.html'
+
+    def get_success_url(self):
+        return reverse('inventory:production_plan_detail', args=[self.object.pk])
+
+    def get_context_data(self, **kwargs):
+        data = super().get_context_data(**kwargs)
+        if self.request.POST:
+            data['item_formset'] = PlanItemFormSet(self.request.POST, instance=self.object, prefix='items')
+        else:
+            data['item_formset'] = PlanItemFormSet(instance=self.object, prefix='items')
+        return data
+
+    def form_valid(self, form):
+        item_formset = PlanItemFormSet(self.request.POST, instance=form.instance, prefix='items')
+        if not item_formset.is_valid():
+            return self.render_to_response(self.get_context_data(form=form))
+        with transaction.atomic():
+            self.object = form.save()
+            item_formset.instance = self.object
+            item_formset.save()
+        return HttpResponseRedirect(self.get_success_url())
+
+class ProductionPlanCreateView(LoginRequiredMixin, EstablishmentMixin, ProductionPlanFormMixin, CreateView):
+    pass
+
+class ProductionPlanUpdateView(LoginRequiredMixin, EstablishmentMixin, ProductionPlanFormMixin, UpdateView):
+    pass
+
+class ProductionPlanDetailView(LoginRequiredMixin, EstablishmentMixin, DetailView):
+    model = ProductionPlan
+    template_name = 'inventory/production_plan_detail.html'
+    context_object_name = 'plan'
+
+    def get_context_data(self, **kwargs):
+        data = super().get_context_data(**kwargs)
+        data['items'] = self.object.items.select_related('recipe')
+        data['requirements'] = plan_requirements(self.object)
+        data['shortages'] = [requirement for requirement in data['requirements'] if requirement.shortage > 0]
+        return data
+
+class ProductionPlanRequirementsView(LoginRequiredMixin, EstablishmentMixin, DetailView):
+    model = ProductionPlan
+
+    def render_to_response(self, context, **response_kwargs):
+        requirements = plan_requirements(self.object)
+        return JsonResponse({
+            'plan': {'id': self.object.pk, 'name': self.object.name, 'date': self.object.date},
+            'requirements': [requirement.as_dict() for requirement in requirements],
+            'shortages': [requirement.as_dict() for requirement in requirements if requirement.shortage > 0],
+        })
+
+class ProductionPlanProcurementView(LoginRequiredMixin, EstablishmentMixin, DetailView):
+    model = ProductionPlan
+    template_name = 'inventory/production_plan_procurement.html'
+    context_object_name = 'plan'
+
+    def get_procurement(self):
+        self.shortages = plan_shortages(self.object)
+        return plan_procurement((requirement.ingredient_id, requirement.shortage, requirement.unit) for requirement in self.shortages)
+
+    def get_context_data(self, **kwargs):
+        data = super().get_context_data(**kwargs)
+        data['procurement'] = procurement = self.get_procurement()
+        names = {requirement.ingredient_id: requirement.ingredient for requirement in self.shortages}
+        data['unfilled'] = [(names[ingredient_id], quantity, unit) for ingredient_id, quantity, unit in procurement.unfilled]
+        return data
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        create_purchase_orders(self.get_procurement(), plan=self.object)
+        return HttpResponseRedirect(reverse('inventory:purchase_order_list'))
+
+# PurchaseOrder Views
+class PurchaseOrderListView(LoginRequiredMixin, ListView):
+    model = PurchaseOrder
+    queryset = PurchaseOrder.objects.select_related('supplier', 'plan').order_by('-created_at', '-pk')
+    template_name = 'inventory/purchase_order_list.html'
+    context_object_name = 'orders'
+    paginate_by = 50
+
+class PurchaseOrderDetailView(LoginRequiredMixin, DetailView):
+    model = PurchaseOrder
+    queryset = PurchaseOrder.objects.select_related('supplier', 'plan')
+    template_name = 'inventory/purchase_order_detail.html'
+    context_object_name = 'order'
+
+    def get_context_data(self, **kwargs):
+        data = super().get_context_data(**kwargs)
+        data['lines'] = self.object.lines.select_related('ingredient')
+        return data
+
+# Dashboard Views
+class InventoryDashboardView(View):
+    """Async view, its aggregates run concurrently when served over ASGI."""
+    template_name = 'inventory/dashboard.html'
+
+    async def get(self, request, *args, **kwargs):
+        # LoginRequiredMixin reads request.user synchronously, which the async ORM forbids.
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        data = await dashboard()
+        if request.GET.get('format') == 'json':
+            return JsonResponse(data)
+        return render(request, self.template_name, data)
@@ -0,0 +1,54 @@
+import multiprocessing
+import os
+import socket
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import claim_jobs, execute_job, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs on a pool of threads, or of processes for CPU bound work.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--processes', action='store_true', help='Use worker processes instead of threads')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between checks for new jobs')
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is due')
+        parser.add_argument('--stale-after', type=int, default=3600, help='Seconds after which a running job is presumed lost')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        requeued = requeue_stale_jobs(timedelta(seconds=options['stale_after']))
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+        if options['processes']:
+            # Fresh interpreters rather than forks, so no process inherits an open database connection.
+            connections.close_all()
+            pool = ProcessPoolExecutor(options['workers'], mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
+        else:
+            pool = ThreadPoolExecutor(options['workers'], thread_name_prefix='job')
+        started = time.perf_counter()
+        statuses, running = Counter(), set()
+        with pool:
+            while True:
+                free = options['workers'] - len(running)
+                if free:
+                    running.update(pool.submit(execute_job, job_id) for job_id in claim_jobs(worker, free))
+                if not running:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                done, running = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    statuses[future.result()] += 1
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{count} {status}' for status, count in sorted(statuses.items())) or 'no jobs'
+        self.stdout.write(self.style.SUCCESS(f'Ran {sum(statuses.values())} jobs in {elapsed:.2f}s: {summary}'))
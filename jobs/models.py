@@ -0,0 +1,55 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100) # Registered task name, see jobs.queue.task
+    arguments = models.JSONField(default=dict, encoder=DjangoJSONEncoder) # Keyword arguments of the task
+    key = models.CharField(max_length=64) # Hash of name and arguments shared by identical jobs
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now) # Pushed back between retries
+    progress = models.FloatField(null=True, blank=True) # Fraction done, as reported by the task
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True) # Traceback of the last failed attempt
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Enqueuing a job identical to a pending one returns the pending one.
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status='pending'), name='unique_pending_job'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id'], name='job_queue'),
+        ]
+
+    def as_dict(self):
+        return {
+            'id': self.pk,
+            'name': self.name,
+            'arguments': self.arguments,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'progress': self.progress,
+            'message': self.message,
+            'result': self.result,
+            'error': self.error.strip().splitlines()[-1] if self.error else '',
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+    def __str__(self):
+        return f"{self.get_status_display()} job #{self.pk} {self.name}"
@@ -0,0 +1,157 @@
+import contextvars
+import hashlib
+import json
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+class PermanentError(Exception):
+    """Raised by a task to fail its job without using the remaining attempts."""
+
+
+@dataclass
+class Task:
+    name: str
+    func: object
+    max_attempts: int
+    retry_delay: float  # Seconds before the first retry, doubled on each further one
+
+
+TASKS = {}
+
+
+def task(name, max_attempts=3, retry_delay=30):
+    """Register a function as a task; it is called with the job's keyword arguments and returns its result."""
+    def register(func):
+        TASKS[name] = Task(name, func, max_attempts, retry_delay)
+        return func
+    return register
+
+
+def job_key(name, arguments):
+    payload = json.dumps([name, arguments], sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def job_files():
+    """Storage for files a job works on, such as uploads handed over to the worker."""
+    return FileSystemStorage(location=settings.JOB_FILES_ROOT)
+
+
+def enqueue(name, run_after=None, **arguments):
+    """Queue a task, or return the identical job already pending.
+
+    "Reprice recipe 42" queued ten times before a worker gets to it is one job, enforced
+    by a unique constraint over the pending jobs' keys.
+    """
+    if name not in TASKS:
+        raise ValueError(f"Unknown task '{name}'")
+    key = job_key(name, arguments)
+    while True:
+        try:
+            with transaction.atomic():
+                return Job.objects.create(
+                    name=name, arguments=arguments, key=key, max_attempts=TASKS[name].max_attempts,
+                    run_after=run_after or timezone.now(),
+                )
+        except IntegrityError:
+            job = Job.objects.filter(key=key, status=Job.PENDING).first()
+            if job is not None:  # Otherwise a worker claimed it in between, try again
+                return job
+
+
+def claim_jobs(worker, limit=1):
+    """Mark up to ``limit`` due jobs as running for ``worker``, returns their ids.
+
+    SQLite transactions take the write lock when they start, and other databases skip
+    rows another worker has locked, so no job is claimed twice.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.PENDING, run_after__lte=now)
+            .order_by('run_after', 'id')
+            .values_list('pk', flat=True)[:limit]
+        )
+        Job.objects.filter(pk__in=ids).update(
+            status=Job.RUNNING, worker=worker, attempts=F('attempts') + 1, started_at=now, progress=None, message='',
+        )
+    return ids
+
+
+def set_progress(fraction=None, message=''):
+    """Report the progress of the job running in this thread or process, if any."""
+    job_id = _current_job.get()
+    if job_id is not None:
+        if fraction is not None:
+            fraction = min(max(fraction, 0.0), 1.0)
+        Job.objects.filter(pk=job_id).update(progress=fraction, message=message[:255])
+
+
+def _retry_or_fail(job, error, permanent):
+    now = timezone.now()
+    task = TASKS.get(job.name)
+    if not permanent and task is not None and job.attempts < job.max_attempts:
+        delay = timedelta(seconds=task.retry_delay * 2 ** (job.attempts - 1))
+        try:
+            with transaction.atomic():
+                Job.objects.filter(pk=job.pk).update(status=Job.PENDING, run_after=now + delay, error=error, worker='')
+            return Job.PENDING
+        except IntegrityError:
+            # An identical job was queued meanwhile and will do the work.
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, error=error, finished_at=now, message='Superseded by an identical pending job',
+            )
+            return Job.FAILED
+    Job.objects.filter(pk=job.pk).update(status=Job.FAILED, error=error, finished_at=now)
+    return Job.FAILED
+
+
+def run_job(job_id):
+    """Run a claimed job, then record its result or schedule a retry. Returns the new status."""
+    job = Job.objects.get(pk=job_id)
+    token = _current_job.set(job.pk)
+    try:
+        if job.name not in TASKS:
+            raise PermanentError(f"Unknown task '{job.name}'")
+        result = TASKS[job.name].func(**job.arguments)
+    except Exception as exc:
+        return _retry_or_fail(job, traceback.format_exc(), isinstance(exc, PermanentError))
+    finally:
+        _current_job.reset(token)
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.SUCCEEDED, result=result, progress=1.0, error='', finished_at=timezone.now(),
+    )
+    return Job.SUCCEEDED
+
+
+def execute_job(job_id):
+    """Entry point of pool threads and processes, which manage their own database connections."""
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def requeue_stale_jobs(older_than):
+    """Return jobs left running by a worker that died to the queue, or fail them when out of attempts."""
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=timezone.now() - older_than)
+    count = 0
+    for job in stale.only('pk', 'name', 'attempts', 'max_attempts'):
+        _retry_or_fail(job, 'Worker stopped while running the job', permanent=False)
+        count += 1
+    return count
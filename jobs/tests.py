@@ -0,0 +1,141 @@
+import io
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from inventory.models import Supplier, SupplierStock
+from recipes.models import Ingredient, Recipe, RecipeCost
+from .models import Job
+from .queue import PermanentError, claim_jobs, enqueue, requeue_stale_jobs, run_job, set_progress, task
+
+calls = []
+
+
+@task('tests.record', retry_delay=60)
+def record(value, fail=0):
+    calls.append(value)
+    set_progress(0.5, 'halfway')
+    if len([call for call in calls if call == value]) <= fail:
+        raise RuntimeError(f'Attempt {len(calls)} failed')
+    return {'value': value}
+
+
+@task('tests.reject')
+def reject():
+    raise PermanentError('Bad input')
+
+
+class JobQueueTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def run_next(self):
+        job_ids = claim_jobs('test')
+        self.assertEqual(len(job_ids), 1)
+        run_job(job_ids[0])
+        return Job.objects.get(pk=job_ids[0])
+
+    def test_identical_pending_jobs_are_merged(self):
+        jobs = [enqueue('recipes.reprice', recipe_ids=[42]) for _ in range(10)]
+        self.assertEqual({job.pk for job in jobs}, {jobs[0].pk})
+        self.assertNotEqual(enqueue('recipes.reprice', recipe_ids=[43]).pk, jobs[0].pk)
+        claim_jobs('test', limit=10)
+        self.assertNotEqual(enqueue('recipes.reprice', recipe_ids=[42]).pk, jobs[0].pk)  # The first one already started
+        self.assertEqual(Job.objects.count(), 3)
+
+    def test_unknown_task(self):
+        with self.assertRaises(ValueError):
+            enqueue('tests.missing')
+
+    def test_successful_job_stores_result(self):
+        enqueue('tests.record', value='a')
+        job = self.run_next()
+        self.assertEqual((job.status, job.attempts, job.result, job.progress), (Job.SUCCEEDED, 1, {'value': 'a'}, 1.0))
+        self.assertEqual(job.message, 'halfway')
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = enqueue('tests.record', value='b', fail=5)
+        self.assertEqual(job.max_attempts, 3)
+        for attempt, delay in ((1, 60), (2, 120)):
+            job = self.run_next()
+            self.assertEqual((job.status, job.attempts), (Job.PENDING, attempt))
+            self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=delay - 5))
+            self.assertEqual(claim_jobs('test'), [])  # Not due yet
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = self.run_next()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+        self.assertIn('RuntimeError: Attempt 3 failed', job.error)
+
+    def test_retry_succeeds(self):
+        enqueue('tests.record', value='c', fail=1)
+        self.run_next()
+        Job.objects.update(run_after=timezone.now())
+        self.assertEqual(self.run_next().status, Job.SUCCEEDED)
+
+    def test_permanent_error_is_not_retried(self):
+        enqueue('tests.reject')
+        job = self.run_next()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = enqueue('tests.record', value='d')
+        claim_jobs('test')
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(requeue_stale_jobs(timedelta(hours=1)), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.PENDING)
+
+    def test_status_view(self):
+        job = enqueue('tests.record', value='e')
+        url = reverse('jobs:job_status', args=[job.pk])
+        self.assertEqual(self.client.get(url).status_code, 302)
+        User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        data = self.client.get(url).json()
+        self.assertEqual((data['status'], data['arguments'], data['progress']), ('pending', {'value': 'e'}, None))
+        self.run_next()
+        data = self.client.get(url).json()
+        self.assertEqual((data['status'], data['result'], data['progress']), ('succeeded', {'value': 'e'}, 1.0))
+
+    def test_reprice_task(self):
+        recipe = Recipe.objects.create(name='Bread', description='Bread', instructions='Bake')
+        enqueue('recipes.reprice', recipe_ids=[recipe.pk])
+        job = self.run_next()
+        self.assertEqual(job.result, {'repriced': 1, 'unpriced': 0})
+        self.assertTrue(RecipeCost.objects.filter(recipe=recipe).exists())
+
+    def test_background_price_list_import(self):
+        User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        supplier = Supplier.objects.create(name='Test Supplier', contact_info='Test Contact')
+        flour = Ingredient.objects.create(name='Flour')
+        upload = SimpleUploadedFile('prices.csv', b'ingredient,quantity,unit,price\nFlour,10,kg,2.50\nUnknown,1,kg,1.00\n')
+        with tempfile.TemporaryDirectory() as root, override_settings(JOB_FILES_ROOT=root):
+            response = self.client.post(reverse('inventory:price_list_import'), {
+                'supplier': supplier.pk, 'price_list': upload, 'background': 'on',
+            })
+            job = Job.objects.get()
+            self.assertContains(response, f'Queued as job #{job.pk}')
+            self.assertFalse(SupplierStock.objects.exists())
+            job = self.run_next()
+        self.assertEqual((job.status, job.result['created'], job.result['rejected']), (Job.SUCCEEDED, 1, 1))
+        self.assertEqual(SupplierStock.objects.get().ingredient, flour)
+
+class WorkerTestCase(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_burst_worker_runs_every_due_job(self):
+        for value in range(6):
+            enqueue('tests.record', value=value)
+        enqueue('tests.record', value='later', run_after=timezone.now() + timedelta(hours=1))
+        out = io.StringIO()
+        call_command('run_jobs', workers=3, burst=True, poll=0.05, stdout=out)
+        self.assertIn('Ran 6 jobs', out.getvalue())
+        self.assertEqual(sorted(calls), list(range(6)))
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 6)
+        self.assertEqual(Job.objects.get(status=Job.PENDING).arguments, {'value': 'later'})
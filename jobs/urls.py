@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import JobStatusView
+
+app_name = 'jobs'
+
+urlpatterns = [
+    path('<int:pk>/', JobStatusView.as_view(), name='job_status'),
+]
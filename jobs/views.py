@@ -0,0 +1,13 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views import View
+from .models import Job
+
+# Job Views
+class JobStatusView(LoginRequiredMixin, View):
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs):
+        job = get_object_or_404(Job, pk=kwargs['pk'])
+        return JsonResponse(job.as_dict())
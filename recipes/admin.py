@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import Recipe, Ingredient, RecipeIngredient
+from .models import Recipe, Ingredient, IngredientUnit, RecipeIngredient
 
 admin.site.register(Recipe)
 admin.site.register(Ingredient)
+admin.site.register(IngredientUnit)
 admin.site.register(RecipeIngredient)
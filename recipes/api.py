@@ -0,0 +1,67 @@
+from decimal import Decimal, InvalidOperation
+
+from django.http import Http404, JsonResponse
+from django.views import View
+
+from tochinalli_project.api import CachedJSONView
+from .models import Recipe, Ingredient, RecipeIngredient
+from .scaling import ScalingError, scale_recipes
+
+
+class RecipeListAPIView(CachedJSONView):
+    def get_version_keys(self, **kwargs):
+        return [('recipes',)]
+
+    def get_payload(self, **kwargs):
+        return list(Recipe.objects.order_by('pk').values('id', 'name', 'description'))
+
+
+class RecipeDetailAPIView(CachedJSONView):
+    def get_version_keys(self, pk, **kwargs):
+        return [('recipe', pk), ('ingredients',)]
+
+    def get_payload(self, pk, **kwargs):
+        recipe = Recipe.objects.filter(pk=pk).values(
+            'id', 'name', 'description', 'instructions', 'portions', 'yield_quantity', 'yield_unit',
+        ).first()
+        if recipe is None:
+            raise Http404('No recipe matches the given query.')
+        recipe['lines'] = list(
+            RecipeIngredient.objects.filter(recipe_id=pk).order_by('pk').values(
+                'ingredient_id', 'ingredient__name', 'quantity', 'unit',
+            )
+        )
+        for line in recipe['lines']:
+            line['ingredient'] = line.pop('ingredient__name')
+        return recipe
+
+
+class RecipeScaleAPIView(View):
+    """Scaled lines of many recipes at once, ``?recipe=12&portions=40&recipe=13&portions=8``."""
+    http_method_names = ['get', 'head', 'options']
+
+    def get(self, request, *args, **kwargs):
+        recipe_ids, portions = request.GET.getlist('recipe'), request.GET.getlist('portions')
+        if not recipe_ids or len(recipe_ids) != len(portions):
+            return JsonResponse({'error': 'Give one portions value for every recipe.'}, status=400)
+        try:
+            targets = [(int(recipe_id), Decimal(count)) for recipe_id, count in zip(recipe_ids, portions)]
+            if not all(count.is_finite() for recipe_id, count in targets):
+                raise ValueError
+        except (ValueError, InvalidOperation):
+            return JsonResponse({'error': 'Recipes must be ids and portions numbers.'}, status=400)
+        try:
+            recipes, totals = scale_recipes(targets)
+        except ScalingError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+        except ArithmeticError:
+            return JsonResponse({'error': 'Portions are too large to scale these recipes.'}, status=400)
+        return JsonResponse({'recipes': recipes, 'totals': totals})
+
+
+class IngredientListAPIView(CachedJSONView):
+    def get_version_keys(self, **kwargs):
+        return [('ingredients',)]
+
+    def get_payload(self, **kwargs):
+        return list(Ingredient.objects.order_by('pk').values('id', 'name', 'is_commercial', 'produced_by_id'))
@@ -0,0 +1,11 @@
+from django.urls import path
+from .api import RecipeListAPIView, RecipeDetailAPIView, RecipeScaleAPIView, IngredientListAPIView
+
+app_name = 'recipes_api'
+
+urlpatterns = [
+    path('recipes/', RecipeListAPIView.as_view(), name='recipe_list'),
+    path('recipes/<int:pk>/', RecipeDetailAPIView.as_view(), name='recipe_detail'),
+    path('recipes/scale/', RecipeScaleAPIView.as_view(), name='recipe_scale'),
+    path('ingredients/', IngredientListAPIView.as_view(), name='ingredient_list'),
+]
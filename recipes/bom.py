@@ -0,0 +1,194 @@
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from .models import Ingredient, RecipeIngredient
+from .units import get_unit_table
+
+VERSION_KEY = 'recipes:bom:version'
+
+
+class RecipeCycleError(ValueError):
+    pass
+
+
+class RecipeGraph:
+    """Per-process DAG of recipes and the sub-recipes behind their elaborated ingredients.
+
+    Lines are loaded a level at a time, so exploding a menu costs one query per level of
+    nesting rather than one per recipe, and are normalized to base units as they load.
+    Explosions are memoized and dropped incrementally when a recipe's lines change; writes
+    from other processes are picked up through a version counter in the cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = None
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._lines = {}  # recipe_id -> [(ingredient_id, quantity, unit, sub_recipe_id, batches)]
+            self._parents = defaultdict(set)  # recipe_id -> recipes using what it produces
+            self._exploded = {}  # recipe_id -> {(ingredient_id, unit): quantity}
+            self._complete = False
+
+    def _sync(self):
+        version = cache.get(VERSION_KEY)
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+    def _add_rows(self, rows):
+        table = get_unit_table()
+        children = set()
+        for recipe_id, ingredient_id, quantity, unit, produced_by_id, batch_yield, batch_unit in rows:
+            base_quantity, base_unit = table.try_normalize(ingredient_id, quantity, unit)
+            batches = None
+            if produced_by_id is not None:
+                yield_quantity, yield_unit = table.try_normalize(ingredient_id, batch_yield, batch_unit or unit)
+                if yield_unit == base_unit:
+                    batches = base_quantity / yield_quantity
+                self._parents[produced_by_id].add(recipe_id)
+                children.add(produced_by_id)
+            self._lines.setdefault(recipe_id, []).append(
+                (ingredient_id, base_quantity, base_unit, produced_by_id, batches)
+            )
+        return children
+
+    def _rows(self, recipe_ids=None):
+        lines = RecipeIngredient.objects.all()
+        if recipe_ids is not None:
+            lines = lines.filter(recipe_id__in=recipe_ids)
+        return lines.values_list(
+            'recipe_id', 'ingredient_id', 'quantity', 'unit',
+            'ingredient__produced_by_id', 'ingredient__batch_yield', 'ingredient__batch_unit',
+        ).iterator(chunk_size=5000)
+
+    def load(self, recipe_ids):
+        with self._lock:
+            self._sync()
+            frontier = {recipe_id for recipe_id in recipe_ids if recipe_id not in self._lines}
+            while frontier:
+                for recipe_id in frontier:
+                    self._lines[recipe_id] = []
+                children = self._add_rows(self._rows(frontier))
+                frontier = {recipe_id for recipe_id in children if recipe_id not in self._lines}
+
+    def load_all(self, recipe_ids):
+        with self._lock:
+            self._sync()
+            if self._complete:
+                return
+            self.clear()
+            for recipe_id in recipe_ids:
+                self._lines[recipe_id] = []
+            self._add_rows(self._rows())
+            self._complete = True
+
+    def explode(self, recipe_id):
+        """Commercial ingredient quantities for one batch, as {(ingredient_id, base unit): quantity}.
+
+        Lines in units that cannot be normalized keep their raw unit.
+        """
+        with self._lock:
+            self.load([recipe_id])
+            return self._explode(recipe_id, ())
+
+    def _explode(self, recipe_id, path):
+        if recipe_id in self._exploded:
+            return self._exploded[recipe_id]
+        if recipe_id in path:
+            raise RecipeCycleError(f"Recipe {recipe_id} uses itself through a sub-recipe")
+        if recipe_id not in self._lines:
+            self.load([recipe_id])
+        path = path + (recipe_id,)
+        totals = defaultdict(Decimal)
+        for ingredient_id, quantity, unit, sub_recipe_id, batches in self._lines[recipe_id]:
+            if sub_recipe_id is None or batches is None:
+                totals[(ingredient_id, unit)] += quantity
+                continue
+            for key, sub_quantity in self._explode(sub_recipe_id, path).items():
+                totals[key] += sub_quantity * batches
+        self._exploded[recipe_id] = dict(totals)
+        return self._exploded[recipe_id]
+
+    def reaches(self, source_id, target_ids):
+        """Whether source_id is, or transitively uses, any of target_ids."""
+        with self._lock:
+            self.load([source_id])
+            seen, stack = set(), [source_id]
+            while stack:
+                recipe_id = stack.pop()
+                if recipe_id in target_ids:
+                    return True
+                if recipe_id in seen:
+                    continue
+                seen.add(recipe_id)
+                if recipe_id not in self._lines:
+                    self.load([recipe_id])
+                for line in self._lines[recipe_id]:
+                    if line[3] is not None:
+                        stack.append(line[3])
+            return False
+
+    def would_cycle(self, recipe_id, ingredient_ids):
+        """Whether giving recipe_id lines with ingredient_ids would make it use itself."""
+        producers = Ingredient.objects.filter(pk__in=ingredient_ids, produced_by__isnull=False)
+        sub_recipe_ids = set(producers.values_list('produced_by_id', flat=True))
+        with self._lock:
+            self.load(sub_recipe_ids)
+            return any(self.reaches(sub_recipe_id, {recipe_id}) for sub_recipe_id in sub_recipe_ids)
+
+    def invalidate_recipe(self, recipe_id):
+        with self._lock:
+            for line in self._lines.pop(recipe_id, ()):
+                if line[3] is not None:
+                    self._parents[line[3]].discard(recipe_id)
+            self._complete = False
+            seen, stack = set(), [recipe_id]
+            while stack:
+                current = stack.pop()
+                if current not in seen:
+                    seen.add(current)
+                    self._exploded.pop(current, None)
+                    stack.extend(self._parents.get(current, ()))
+            self._version = bump_version()
+
+    def invalidate_all(self):
+        with self._lock:
+            self.clear()
+            self._version = bump_version()
+
+
+def bump_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+        return 1
+
+
+def ancestor_recipe_ids(recipe_ids):
+    """recipe_ids plus every recipe that uses them through elaborated ingredients, one query per level."""
+    found = set(recipe_ids)
+    frontier = set(found)
+    while frontier:
+        users = RecipeIngredient.objects.filter(ingredient__produced_by_id__in=frontier)
+        frontier = set(users.values_list('recipe_id', flat=True)) - found
+        found |= frontier
+    return found
+
+
+def recipes_using_ingredients(ingredient_ids):
+    direct = RecipeIngredient.objects.filter(ingredient_id__in=ingredient_ids)
+    return ancestor_recipe_ids(direct.values_list('recipe_id', flat=True))
+
+
+_graph = RecipeGraph()
+
+
+def get_graph():
+    return _graph
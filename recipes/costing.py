@@ -0,0 +1,118 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.models import IngredientBestPrice
+from inventory.price_history import best_unit_prices_over_time
+from tochinalli_project.cache_versions import bump_versions
+from .bom import ancestor_recipe_ids, get_graph, recipes_using_ingredients
+from .models import Recipe, RecipeCost
+
+CENT = Decimal('0.01')
+# Above this many ingredients the price history is read whole rather than filtered with a huge IN list.
+HISTORY_FILTER_LIMIT = 5000
+
+
+def ingredient_prices(ingredient_ids=None):
+    """Cheapest supplier price per ingredient base unit, as {(ingredient_id, base unit): price}."""
+    best = IngredientBestPrice.objects.values_list('ingredient_id', 'base_unit', 'unit_price')
+    if ingredient_ids is not None:
+        best = best.filter(ingredient_id__in=ingredient_ids)
+    return {(ingredient_id, base_unit): price for ingredient_id, base_unit, price in best.iterator(chunk_size=5000)}
+
+
+def compute_costs(recipe_ids=None):
+    """Price recipes from their exploded bill of materials, returns {recipe_id: (total, unpriced_lines)}.
+
+    Elaborated ingredients are priced through the sub-recipes that produce them.
+    """
+    graph = get_graph()
+    if recipe_ids is None:
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        graph.load_all(recipe_ids)
+        exploded = {recipe_id: graph.explode(recipe_id) for recipe_id in recipe_ids}
+        prices = ingredient_prices()
+    else:
+        recipe_ids = list(recipe_ids)
+        graph.load(recipe_ids)
+        exploded = {recipe_id: graph.explode(recipe_id) for recipe_id in recipe_ids}
+        prices = ingredient_prices({ingredient_id for lines in exploded.values() for ingredient_id, unit in lines})
+
+    return {recipe_id: price_lines(lines, prices) for recipe_id, lines in exploded.items()}
+
+
+def price_lines(lines, prices):
+    """(total, unpriced lines) of exploded {(ingredient_id, base unit): quantity} lines."""
+    total, unpriced = Decimal(0), 0
+    for key, quantity in lines.items():
+        price = prices.get(key)
+        if price is None:
+            unpriced += 1
+        else:
+            total += quantity * price
+    return total.quantize(CENT, rounding=ROUND_HALF_UP), unpriced
+
+
+def cost_history(dates, recipe_ids=None):
+    """Reprice recipes at each date from the supplier price history, as {recipe_id: [(total, unpriced lines)]}.
+
+    Recipes keep their current composition, only prices move. The bill of materials is
+    exploded once and the history read in one pass, so the queries do not depend on the
+    number of recipes or dates.
+    """
+    dates = sorted(dates)
+    graph = get_graph()
+    if recipe_ids is None:
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        graph.load_all(recipe_ids)
+    else:
+        recipe_ids = list(recipe_ids)
+        graph.load(recipe_ids)
+    exploded = {recipe_id: graph.explode(recipe_id) for recipe_id in recipe_ids}
+    ingredient_ids = {ingredient_id for lines in exploded.values() for ingredient_id, unit in lines}
+    series = best_unit_prices_over_time(dates, ingredient_ids if len(ingredient_ids) < HISTORY_FILTER_LIMIT else None)
+    return {recipe_id: [price_lines(lines, series[when]) for when in dates] for recipe_id, lines in exploded.items()}
+
+
+def reprice_recipes(recipe_ids=None):
+    """Recompute and store the cost rollup, returns {recipe_id: RecipeCost}."""
+    now = timezone.now()
+    costs = [
+        RecipeCost(recipe_id=recipe_id, total=total, unpriced_lines=unpriced, computed_at=now)
+        for recipe_id, (total, unpriced) in compute_costs(recipe_ids).items()
+    ]
+    with transaction.atomic():
+        RecipeCost.objects.bulk_create(
+            costs,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['recipe'],
+            update_fields=['total', 'unpriced_lines', 'computed_at'],
+        )
+    return {cost.recipe_id: cost for cost in costs}
+
+
+def get_recipe_costs(recipe_ids):
+    """Cached costs for the given recipes, repricing only those missing from the rollup."""
+    recipe_ids = list(recipe_ids)
+    costs = {cost.recipe_id: cost for cost in RecipeCost.objects.filter(recipe_id__in=recipe_ids)}
+    missing = [recipe_id for recipe_id in recipe_ids if recipe_id not in costs]
+    if missing:
+        costs.update(reprice_recipes(missing))
+    return costs
+
+
+def forget_costs(recipe_ids):
+    """Drop stored costs and bump the versions of the pages that show them."""
+    recipe_ids = list(recipe_ids)
+    RecipeCost.objects.filter(recipe_id__in=recipe_ids).delete()
+    bump_versions([('recipe', recipe_id) for recipe_id in recipe_ids] + [('recipes',)])
+
+
+def invalidate_recipes(recipe_ids):
+    forget_costs(ancestor_recipe_ids(recipe_ids))
+
+
+def invalidate_ingredients(ingredient_ids):
+    forget_costs(recipes_using_ingredients(ingredient_ids))
@@ -0,0 +1,76 @@
+from django.utils import timezone
+
+from inventory.price_history import month_ends
+from tochinalli_project.exports import CHUNK_SIZE, Dataset
+from .costing import cost_history
+from .models import Recipe, RecipeIngredient
+
+
+class RecipeDataset(Dataset):
+    """Recipes with their lines: one CSV row per line, one JSON record per recipe."""
+    name = 'recipes'
+    columns = ('recipe_id', 'recipe', 'ingredient_id', 'ingredient', 'quantity', 'unit')
+    recipe_fields = ('id', 'name', 'description', 'instructions')
+    line_fields = ('ingredient_id', 'ingredient', 'quantity', 'unit')
+
+    def recipes_with_lines(self):
+        # Two ordered cursors merged by recipe id, so recipes without lines are kept
+        # and neither table is materialized.
+        recipes = Recipe.objects.order_by('pk').values_list(*self.recipe_fields).iterator(chunk_size=CHUNK_SIZE)
+        lines = RecipeIngredient.objects.order_by('recipe_id', 'pk').values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name', 'quantity', 'unit',
+        ).iterator(chunk_size=CHUNK_SIZE)
+        line = next(lines, None)
+        for recipe in recipes:
+            recipe_lines = []
+            while line is not None and line[0] <= recipe[0]:
+                if line[0] == recipe[0]:
+                    recipe_lines.append(line[1:])
+                line = next(lines, None)
+            yield recipe, recipe_lines
+
+    def rows(self):
+        for recipe, lines in self.recipes_with_lines():
+            if not lines:
+                yield (recipe[0], recipe[1], None, None, None, None)
+            for line in lines:
+                yield (recipe[0], recipe[1]) + line
+
+    def records(self):
+        for recipe, lines in self.recipes_with_lines():
+            record = dict(zip(self.recipe_fields, recipe))
+            record['lines'] = [dict(zip(self.line_fields, line)) for line in lines]
+            yield record
+
+
+class RecipeCostHistoryDataset(Dataset):
+    """Every recipe repriced at each of the last month-ends: one cost column per month."""
+    name = 'recipe_cost_history'
+    max_months = 60
+
+    def __init__(self, months=12):
+        if not 1 <= months <= self.max_months:
+            raise ValueError(f'months must be between 1 and {self.max_months}')
+        self.dates = month_ends(months)
+        self.months = [timezone.localtime(when).strftime('%Y-%m') for when in self.dates]
+        self.columns = ('recipe_id', 'recipe', *self.months)
+
+    def recipes_with_costs(self):
+        history = cost_history(self.dates)
+        for recipe_id, name in Recipe.objects.order_by('pk').values_list('pk', 'name').iterator(chunk_size=CHUNK_SIZE):
+            yield recipe_id, name, history.get(recipe_id, [])
+
+    def rows(self):
+        for recipe_id, name, costs in self.recipes_with_costs():
+            yield (recipe_id, name, *(total for total, unpriced in costs))
+
+    def records(self):
+        for recipe_id, name, costs in self.recipes_with_costs():
+            yield {
+                'recipe_id': recipe_id,
+                'recipe': name,
+                'costs': [
+                    {'month': month, 'total': total, 'unpriced_lines': unpriced}
+                    for month, (total, unpriced) in zip(self.months, costs)
+                ],
+            }
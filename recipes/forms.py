@@ -1,20 +1,154 @@
 from django import forms
+from django.urls import reverse
+from django.utils.functional import cached_property
 from .models import Recipe, RecipeIngredient, Ingredient
+from .bom import get_graph
+from .units import UnitConversionError, get_unit_table
+
+class UnitValidationMixin:
+    def clean(self):
+        cleaned_data = super().clean()
+        ingredient, unit = cleaned_data.get('ingredient'), cleaned_data.get('unit')
+        if ingredient and unit:
+            try:
+                get_unit_table().resolve(ingredient.pk, unit)
+            except UnitConversionError:
+                self.add_error('unit', f'Unknown unit "{unit}" for {ingredient.name}.')
+        return cleaned_data
+
+class AutocompleteInput(forms.Widget):
+    """Hidden primary key plus a text box suggesting matches from a search endpoint as the user types.
+
+    Unlike Select it never iterates the field's choices, so rendering does not depend on
+    the size of the catalog. The field's queryset is only hit to validate a submitted key.
+    """
+    template_name = 'recipes/widgets/autocomplete.html'
+    label_suffix = '_label'
+
+    class Media:
+        js = ['recipes/autocomplete.js']
+
+    def __init__(self, url, kind=None, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+        self.kind = kind
+        self.label = ''  # Text shown for the current value, set by the form
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget'].update({
+            'url': reverse(self.url), 'kind': self.kind, 'label_name': name + self.label_suffix, 'label': self.label,
+        })
+        return context
+
+    def value_from_datadict(self, data, files, name):
+        # Keep the typed text so a form redisplayed with errors shows it again without a lookup.
+        # Disabled inputs are not posted, so their label is left as the form set it.
+        if name + self.label_suffix in data:
+            self.label = data[name + self.label_suffix]
+        return data.get(name)
+
+class IngredientAutocompleteMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.fields['ingredient']
+        widget = field.widget = AutocompleteInput('recipes:autocomplete', kind='ingredient')
+        widget.is_required = field.required
+        ingredient_id = self.initial.get('ingredient')
+        if self.is_bound or ingredient_id is None:
+            return
+        if getattr(self.instance, 'ingredient_id', None) == ingredient_id:
+            widget.label = self.instance.ingredient.name
+        else:
+            widget.label = Ingredient.objects.filter(pk=ingredient_id).values_list('name', flat=True).first() or ''
+
+class PrefetchedModelChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField resolving submitted keys from objects its formset fetched in bulk.
+
+    Keys missing from ``prefetched`` are looked up in the queryset as usual.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prefetched = {}
+
+    def to_python(self, value):
+        try:
+            return self.prefetched[int(value)]
+        except (KeyError, TypeError, ValueError):
+            return super().to_python(value)
 
 class RecipeForm(forms.ModelForm):
     class Meta:
         model = Recipe
-        fields = ['name', 'description', 'instructions']
+        fields = ['name', 'description', 'instructions', 'portions', 'yield_quantity', 'yield_unit']
 
-class RecipeIngredientForm(forms.ModelForm):
+class RecipeIngredientForm(IngredientAutocompleteMixin, UnitValidationMixin, forms.ModelForm):
     class Meta:
         model = RecipeIngredient
         fields = ['ingredient', 'quantity', 'unit']
+        field_classes = {'ingredient': PrefetchedModelChoiceField}
+
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        # The form field has already fetched the ingredient, the model's own existence check would fetch it again.
+        exclude.add('ingredient')
+        return exclude
+
+class BaseIngredientFormSet(forms.BaseInlineFormSet):
+    def __init__(self, *args, **kwargs):
+        # The autocomplete widgets show the current ingredient names.
+        kwargs.setdefault('queryset', RecipeIngredient.objects.select_related('ingredient'))
+        super().__init__(*args, **kwargs)
+        self.submitted_ingredients = {}
+        if self.is_bound:
+            # One query for every submitted ingredient instead of one per line.
+            keys = [self.data.get(f'{self.add_prefix(i)}-ingredient') for i in range(self.total_form_count())]
+            self.submitted_ingredients = Ingredient.objects.in_bulk([int(key) for key in keys if key and key.isdigit()])
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        form.fields['ingredient'].prefetched = self.submitted_ingredients
+        return form
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        # Resolve the submitted line ids from the lines the formset already loaded.
+        name = self._pk_field.name
+        field = form.fields[name]
+        form.fields[name] = PrefetchedModelChoiceField(field.queryset, initial=field.initial, required=False, widget=field.widget)
+        form.fields[name].prefetched = self.existing_lines
+
+    @cached_property
+    def existing_lines(self):
+        return {line.pk: line for line in self.get_queryset()}
+
+    def cleaned_lines(self):
+        """(ingredient_id, quantity, unit) of every line that is kept, for save_recipe_lines."""
+        return [
+            (form.cleaned_data['ingredient'].pk, form.cleaned_data['quantity'], form.cleaned_data['unit'])
+            for form in self.forms
+            if form.cleaned_data and not self._should_delete_form(form)
+        ]
+
+    def clean(self):
+        super().clean()
+        if any(self.errors):
+            return
+        # RecipeIngredientForm skips the model checks on ingredient, which include unique_recipe_ingredient.
+        ingredient_ids = [ingredient_id for ingredient_id, quantity, unit in self.cleaned_lines()]
+        if len(ingredient_ids) != len(set(ingredient_ids)):
+            raise forms.ValidationError('Each ingredient can only appear once in a recipe.')
+        if self.instance.pk is not None and get_graph().would_cycle(self.instance.pk, ingredient_ids):
+            raise forms.ValidationError(
+                'An elaborated ingredient in this recipe is made from this recipe, directly or through a sub-recipe.'
+            )
 
 IngredientFormSet = forms.inlineformset_factory(
     Recipe,
     RecipeIngredient,
     form=RecipeIngredientForm,
+    formset=BaseIngredientFormSet,
     extra=1,
     can_delete=True
 )
@@ -0,0 +1,74 @@
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import transaction
+
+from tochinalli_project.cache_versions import bump_version
+from . import costing
+from .bom import get_graph
+from .models import RecipeIngredient
+
+_saving = contextvars.ContextVar('saving_recipe_lines', default=False)
+
+
+@contextmanager
+def _saving_lines():
+    token = _saving.set(True)
+    try:
+        yield
+    finally:
+        _saving.reset(token)
+
+
+def saving_lines():
+    """Whether save_recipe_lines is writing; the RecipeIngredient receivers skip per-line work then."""
+    return _saving.get()
+
+
+@dataclass
+class LineChanges:
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+    @property
+    def changed(self):
+        return bool(self.created or self.updated or self.deleted)
+
+
+def save_recipe_lines(recipe, lines):
+    """Make the recipe's lines exactly ``lines``, an iterable of (ingredient_id, quantity, unit).
+
+    Lines are matched to the stored ones by ingredient, which is unique per recipe, and only
+    the differences are written: one bulk insert, one bulk update and one delete, whatever
+    the number of lines. Bulk writes send no signals and the RecipeIngredient receivers skip
+    the delete's, so the caches they maintain are invalidated once at the end.
+    """
+    wanted = {ingredient_id: (Decimal(quantity), unit) for ingredient_id, quantity, unit in lines}
+    changes = LineChanges()
+    with transaction.atomic(), _saving_lines():
+        existing = {line.ingredient_id: line for line in RecipeIngredient.objects.filter(recipe=recipe)}
+        to_create, to_update = [], []
+        for ingredient_id, (quantity, unit) in wanted.items():
+            line = existing.get(ingredient_id)
+            if line is None:
+                to_create.append(RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id, quantity=quantity, unit=unit))
+            elif (line.quantity, line.unit) != (quantity, unit):
+                line.quantity, line.unit = quantity, unit
+                to_update.append(line)
+            else:
+                changes.unchanged += 1
+        to_delete = [line.pk for ingredient_id, line in existing.items() if ingredient_id not in wanted]
+        if to_delete:
+            RecipeIngredient.objects.filter(pk__in=to_delete).delete()
+        RecipeIngredient.objects.bulk_create(to_create)
+        RecipeIngredient.objects.bulk_update(to_update, ['quantity', 'unit'])
+        changes.created, changes.updated, changes.deleted = len(to_create), len(to_update), len(to_delete)
+        if changes.changed:
+            costing.invalidate_recipes([recipe.pk])
+            get_graph().invalidate_recipe(recipe.pk)
+            bump_version('recipe', recipe.pk)
+    return changes
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.queue import enqueue
+from recipes.costing import reprice_recipes
+
+
+class Command(BaseCommand):
+    help = 'Recompute the cached cost rollup for every recipe, or only for the given recipe ids.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('recipe_ids', nargs='*', type=int)
+        parser.add_argument('--background', action='store_true', help='Queue a job for "manage.py run_jobs" instead')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            job = enqueue('recipes.reprice', recipe_ids=options['recipe_ids'] or None)
+            self.stdout.write(self.style.SUCCESS(f"Queued job #{job.pk}"))
+            return
+        started = time.perf_counter()
+        costs = reprice_recipes(options['recipe_ids'] or None)
+        elapsed = time.perf_counter() - started
+        unpriced = sum(1 for cost in costs.values() if cost.unpriced_lines)
+        self.stdout.write(self.style.SUCCESS(
+            f"Repriced {len(costs)} recipes in {elapsed:.2f}s ({unpriced} with unpriced lines)"
+        ))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "recipes",
+            "0002_remove_ingredient_quantity_remove_ingredient_recipe_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeCost",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="cost",
+                        serialize=False,
+                        to="recipes.recipe",
+                    ),
+                ),
+                ("total", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("unpriced_lines", models.PositiveIntegerField(default=0)),
+                ("computed_at", models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0003_recipecost"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="batch_unit",
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="batch_yield",
+            field=models.DecimalField(decimal_places=2, default=1, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="produced_by",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="produced_ingredients",
+                to="recipes.recipe",
+            ),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0004_ingredient_sub_recipe"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="density",
+            field=models.DecimalField(
+                blank=True, decimal_places=4, max_digits=10, null=True
+            ),
+        ),
+        migrations.CreateModel(
+            name="IngredientUnit",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50)),
+                ("quantity", models.DecimalField(decimal_places=3, max_digits=10)),
+                ("unit", models.CharField(max_length=50)),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="units",
+                        to="recipes.ingredient",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("ingredient", "name"),
+                        name="unique_ingredient_unit_name",
+                    )
+                ],
+            },
+        ),
+    ]
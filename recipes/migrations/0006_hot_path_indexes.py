@@ -0,0 +1,127 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:42
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+# Units and aliases as recipes.units defined them when this migration was written, so later
+# changes to the app's unit table do not change what it did.
+UNITS = {
+    "mg": ("mass", Decimal("0.001")),
+    "g": ("mass", Decimal("1")),
+    "kg": ("mass", Decimal("1000")),
+    "oz": ("mass", Decimal("28.349523125")),
+    "lb": ("mass", Decimal("453.59237")),
+    "ml": ("volume", Decimal("1")),
+    "cl": ("volume", Decimal("10")),
+    "dl": ("volume", Decimal("100")),
+    "l": ("volume", Decimal("1000")),
+    "tsp": ("volume", Decimal("5")),
+    "tbsp": ("volume", Decimal("15")),
+    "cup": ("volume", Decimal("240")),
+    "fl oz": ("volume", Decimal("29.5735295625")),
+    "pt": ("volume", Decimal("473.176473")),
+    "qt": ("volume", Decimal("946.352946")),
+    "gal": ("volume", Decimal("3785.411784")),
+    "unit": ("count", Decimal("1")),
+    "dozen": ("count", Decimal("12")),
+}
+
+ALIASES = {
+    "gr": "g", "gram": "g", "grams": "g", "gramo": "g", "gramos": "g",
+    "kilo": "kg", "kilos": "kg", "kilogram": "kg", "kilograms": "kg", "kilogramo": "kg", "kilogramos": "kg",
+    "milligram": "mg", "milligrams": "mg", "ounce": "oz", "ounces": "oz",
+    "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "millilitre": "ml", "milliliter": "ml", "millilitres": "ml", "milliliters": "ml", "mililitro": "ml", "mililitros": "ml",
+    "litre": "l", "liter": "l", "litres": "l", "liters": "l", "lt": "l", "litro": "l", "litros": "l",
+    "teaspoon": "tsp", "teaspoons": "tsp", "tablespoon": "tbsp", "tablespoons": "tbsp", "cups": "cup", "taza": "cup", "tazas": "cup",
+    "pint": "pt", "pints": "pt", "quart": "qt", "quarts": "qt", "gallon": "gal", "gallons": "gal",
+    "units": "unit", "u": "unit", "pc": "unit", "pcs": "unit", "piece": "unit", "pieces": "unit",
+    "each": "unit", "ea": "unit", "pieza": "unit", "piezas": "unit", "dozens": "dozen", "docena": "dozen",
+}  # fmt: skip
+
+
+def clean_unit_name(unit):
+    name = " ".join(unit.lower().replace(".", " ").split())
+    return ALIASES.get(name, name)
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """Fold repeated ingredients of a recipe into its first line before they become unique."""
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+    duplicates = (
+        RecipeIngredient.objects.values("recipe_id", "ingredient_id")
+        .annotate(lines=Count("id"))
+        .filter(lines__gt=1)
+    )
+    for duplicate in duplicates:
+        first, *rest = RecipeIngredient.objects.filter(
+            recipe_id=duplicate["recipe_id"], ingredient_id=duplicate["ingredient_id"]
+        ).order_by("pk")
+        target = UNITS.get(clean_unit_name(first.unit))
+        for line in rest:
+            source = UNITS.get(clean_unit_name(line.unit))
+            if clean_unit_name(line.unit) == clean_unit_name(first.unit):
+                first.quantity += line.quantity
+            elif source and target and source[0] == target[0]:
+                first.quantity += line.quantity * source[1] / target[1]
+            else:
+                raise RuntimeError(
+                    f"Recipe {first.recipe_id} uses ingredient {first.ingredient_id} in "
+                    f"'{first.unit}' and '{line.unit}', merge these lines by hand first."
+                )
+        first.quantity = round(first.quantity, 2)
+        first.save(update_fields=["quantity"])
+        RecipeIngredient.objects.filter(pk__in=[line.pk for line in rest]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0005_ingredient_units"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="ingredient",
+            name="produced_by",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="produced_ingredients",
+                to="recipes.recipe",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="recipeingredient",
+            name="recipe",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="recipes.recipe",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ingredient",
+            index=models.Index(
+                condition=models.Q(("produced_by__isnull", False)),
+                fields=["produced_by"],
+                name="ingredient_producer",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["name", "id"], name="recipe_name_keyset"),
+        ),
+        migrations.AddConstraint(
+            model_name="recipeingredient",
+            constraint=models.UniqueConstraint(
+                fields=("recipe", "ingredient"), name="unique_recipe_ingredient"
+            ),
+        ),
+    ]
@@ -0,0 +1,81 @@
+from django.db import migrations
+
+# One FTS5 document per recipe (rowid = id * 2) and per ingredient (rowid = id * 2 + 1),
+# kept current by triggers so bulk inserts and raw updates are indexed too.
+FORWARD = [
+    """
+    CREATE VIRTUAL TABLE recipes_search USING fts5(
+        name, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER recipes_search_recipe_insert AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO recipes_search (rowid, name, body)
+        VALUES (new.id * 2, new.name, new.description || ' ' || new.instructions);
+    END
+    """,
+    """
+    CREATE TRIGGER recipes_search_recipe_update AFTER UPDATE OF name, description, instructions ON recipes_recipe BEGIN
+        UPDATE recipes_search SET name = new.name, body = new.description || ' ' || new.instructions
+        WHERE rowid = new.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER recipes_search_recipe_delete AFTER DELETE ON recipes_recipe BEGIN
+        DELETE FROM recipes_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER recipes_search_ingredient_insert AFTER INSERT ON recipes_ingredient BEGIN
+        INSERT INTO recipes_search (rowid, name, body) VALUES (new.id * 2 + 1, new.name, '');
+    END
+    """,
+    """
+    CREATE TRIGGER recipes_search_ingredient_update AFTER UPDATE OF name ON recipes_ingredient BEGIN
+        UPDATE recipes_search SET name = new.name WHERE rowid = new.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER recipes_search_ingredient_delete AFTER DELETE ON recipes_ingredient BEGIN
+        DELETE FROM recipes_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+    """
+    INSERT INTO recipes_search (rowid, name, body)
+    SELECT id * 2, name, description || ' ' || instructions FROM recipes_recipe
+    """,
+    """
+    INSERT INTO recipes_search (rowid, name, body) SELECT id * 2 + 1, name, '' FROM recipes_ingredient
+    """,
+]
+
+BACKWARD = [
+    "DROP TRIGGER IF EXISTS recipes_search_recipe_insert",
+    "DROP TRIGGER IF EXISTS recipes_search_recipe_update",
+    "DROP TRIGGER IF EXISTS recipes_search_recipe_delete",
+    "DROP TRIGGER IF EXISTS recipes_search_ingredient_insert",
+    "DROP TRIGGER IF EXISTS recipes_search_ingredient_update",
+    "DROP TRIGGER IF EXISTS recipes_search_ingredient_delete",
+    "DROP TABLE IF EXISTS recipes_search",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # FTS5 is SQLite only, other databases search with the LIKE fallback in recipes.search.
+        if schema_editor.connection.vendor == "sqlite":
+            for statement in statements:
+                schema_editor.execute(statement)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0006_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD), run(BACKWARD)),
+    ]
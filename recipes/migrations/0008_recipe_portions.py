@@ -0,0 +1,71 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:45
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+# Adding columns rebuilds recipes_recipe on SQLite, which drops the search index triggers
+# created in 0007_search_index; they are created again here.
+RECIPE_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS recipes_search_recipe_insert",
+    "DROP TRIGGER IF EXISTS recipes_search_recipe_update",
+    "DROP TRIGGER IF EXISTS recipes_search_recipe_delete",
+    """
+    CREATE TRIGGER recipes_search_recipe_insert AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO recipes_search (rowid, name, body)
+        VALUES (new.id * 2, new.name, new.description || ' ' || new.instructions);
+    END
+    """,
+    """
+    CREATE TRIGGER recipes_search_recipe_update AFTER UPDATE OF name, description, instructions ON recipes_recipe BEGIN
+        UPDATE recipes_search SET name = new.name, body = new.description || ' ' || new.instructions
+        WHERE rowid = new.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER recipes_search_recipe_delete AFTER DELETE ON recipes_recipe BEGIN
+        DELETE FROM recipes_search WHERE rowid = old.id * 2;
+    END
+    """,
+]
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in RECIPE_TRIGGERS:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0007_search_index"),
+    ]
+
+    operations = [
+        # Reversed last, after the columns are removed and the table rebuilt again.
+        migrations.RunPython(migrations.RunPython.noop, create_triggers),
+        migrations.AddField(
+            model_name="recipe",
+            name="portions",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=1,
+                max_digits=10,
+                validators=[django.core.validators.MinValueValidator(Decimal("0.01"))],
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="yield_quantity",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="yield_unit",
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.RunPython(create_triggers, migrations.RunPython.noop),
+    ]
@@ -1,26 +1,93 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
 from django.db import models
 
 class Ingredient(models.Model):
     name = models.CharField(max_length=255, unique=True)
     is_commercial = models.BooleanField(default=True) # To distinguish between commercial and elaborated ingredients
+    produced_by = models.ForeignKey('Recipe', on_delete=models.SET_NULL, null=True, blank=True, db_index=False, related_name='produced_ingredients') # Sub-recipe for elaborated ingredients
+    batch_yield = models.DecimalField(max_digits=10, decimal_places=2, default=1) # Quantity of this ingredient one batch of produced_by makes
+    batch_unit = models.CharField(max_length=50, blank=True)
+    density = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True) # Grams per millilitre, lets volumes compare with weights
+
+    class Meta:
+        indexes = [
+            # Most ingredients are commercial, so only index the ones a sub-recipe produces.
+            models.Index(fields=['produced_by'], condition=models.Q(produced_by__isnull=False), name='ingredient_producer'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if self.produced_by_id is None:
+            return
+        if self.is_commercial:
+            raise ValidationError({'is_commercial': 'Ingredients produced by a recipe are elaborated, not commercial.'})
+        if self.batch_yield <= 0:
+            raise ValidationError({'batch_yield': 'Batch yield must be positive.'})
+        if self.pk:
+            from .bom import get_graph
+            users = RecipeIngredient.objects.filter(ingredient=self).values_list('recipe_id', flat=True)
+            if get_graph().reaches(self.produced_by_id, set(users)):
+                raise ValidationError({'produced_by': 'This recipe already uses this ingredient, directly or through a sub-recipe.'})
+
+class IngredientUnit(models.Model):
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='units')
+    name = models.CharField(max_length=50) # Pack or count unit, e.g. "case" or "unit"
+    quantity = models.DecimalField(max_digits=10, decimal_places=3)
+    unit = models.CharField(max_length=50)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ingredient', 'name'], name='unique_ingredient_unit_name'),
+        ]
+
+    def __str__(self):
+        return f"1 {self.name} of {self.ingredient.name} = {self.quantity} {self.unit}"
+
 class Recipe(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField()
     instructions = models.TextField()
+    portions = models.DecimalField(max_digits=10, decimal_places=2, default=1, validators=[MinValueValidator(Decimal('0.01'))]) # Portions the ingredient quantities make
+    yield_quantity = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True) # Total the recipe makes, e.g. 2.5 kg of soup
+    yield_unit = models.CharField(max_length=50, blank=True)
     ingredients = models.ManyToManyField(Ingredient, through='RecipeIngredient')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'], name='recipe_name_keyset'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if self.yield_quantity is not None and not self.yield_unit:
+            raise ValidationError({'yield_unit': 'Give the unit of the yield.'})
+
 class RecipeIngredient(models.Model):
-    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, db_index=False) # Indexed by unique_recipe_ingredient
     ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
     unit = models.CharField(max_length=50)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'ingredient'], name='unique_recipe_ingredient'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} {self.unit} of {self.ingredient.name} for {self.recipe.name}"
+
+class RecipeCost(models.Model):
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True, related_name='cost')
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    unpriced_lines = models.PositiveIntegerField(default=0) # Lines whose ingredient has no supplier price
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.total} for {self.recipe.name}"
@@ -0,0 +1,92 @@
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from .models import Recipe, RecipeIngredient
+from .units import get_unit_table
+
+CENT = Decimal('0.01')  # Recipe lines are stored to hundredths
+MAX_TARGETS = 1000
+MAX_PORTIONS = 100000  # Keeps scaled quantities well inside Decimal precision
+
+
+class ScalingError(ValueError):
+    pass
+
+
+def _round(quantity):
+    return quantity.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def load_lines(recipe_ids):
+    """{recipe_id: [(ingredient_id, ingredient, quantity, unit, base quantity, base unit)]}, in one query."""
+    table = get_unit_table()
+    rows = (
+        RecipeIngredient.objects
+        .filter(recipe_id__in=recipe_ids)
+        .order_by('recipe_id', 'pk')
+        .values_list('recipe_id', 'ingredient_id', 'ingredient__name', 'quantity', 'unit')
+    )
+    lines = defaultdict(list)
+    for recipe_id, ingredient_id, name, quantity, unit in rows:
+        base_quantity, base_unit = table.try_normalize(ingredient_id, quantity, unit)
+        lines[recipe_id].append((ingredient_id, name, quantity, unit, base_quantity, base_unit))
+    return lines
+
+
+def scale_recipes(targets):
+    """Scale recipes to portion counts, ``targets`` being (recipe_id, portions) pairs.
+
+    The recipes and all their lines are loaded and normalized once, in two queries, however
+    many targets there are or how often a recipe repeats; each target then multiplies the
+    preloaded lines by its portions over the recipe's. Quantities are rounded half up to
+    hundredths. Returns the scaled recipes in target order and the totals per ingredient and
+    base unit across all of them.
+    """
+    targets = list(targets)
+    if len(targets) > MAX_TARGETS:
+        raise ScalingError(f'At most {MAX_TARGETS} recipes can be scaled at once.')
+    for recipe_id, portions in targets:
+        if portions <= 0:
+            raise ScalingError(f'Portions for recipe {recipe_id} must be positive.')
+        if portions > MAX_PORTIONS:
+            raise ScalingError(f'Portions for recipe {recipe_id} must be at most {MAX_PORTIONS}.')
+    recipe_ids = {recipe_id for recipe_id, portions in targets}
+    recipes = {
+        recipe['id']: recipe
+        for recipe in Recipe.objects.filter(pk__in=recipe_ids).values('id', 'name', 'portions', 'yield_quantity', 'yield_unit')
+    }
+    missing = recipe_ids - set(recipes)
+    if missing:
+        raise ScalingError(f"Unknown recipe {', '.join(str(recipe_id) for recipe_id in sorted(missing))}.")
+    lines = load_lines(recipe_ids)
+
+    scaled, totals, names = [], defaultdict(Decimal), {}
+    for recipe_id, portions in targets:
+        recipe = recipes[recipe_id]
+        factor = portions / recipe['portions']
+        scaled_lines = []
+        for ingredient_id, name, quantity, unit, base_quantity, base_unit in lines[recipe_id]:
+            scaled_lines.append({
+                'ingredient_id': ingredient_id,
+                'ingredient': name,
+                'quantity': _round(quantity * factor),
+                'unit': unit,
+                'base_quantity': _round(base_quantity * factor),
+                'base_unit': base_unit,
+            })
+            totals[(ingredient_id, base_unit)] += base_quantity * factor
+            names[ingredient_id] = name
+        scaled.append({
+            'recipe_id': recipe_id,
+            'recipe': recipe['name'],
+            'portions': portions,
+            'factor': factor,
+            'yield_quantity': _round(recipe['yield_quantity'] * factor) if recipe['yield_quantity'] is not None else None,
+            'yield_unit': recipe['yield_unit'],
+            'lines': scaled_lines,
+        })
+    totals = [
+        {'ingredient_id': ingredient_id, 'ingredient': names[ingredient_id], 'quantity': _round(quantity), 'unit': unit}
+        for (ingredient_id, unit), quantity in sorted(totals.items(), key=lambda item: (names[item[0][0]], item[0]))
+    ]
+    return scaled, totals
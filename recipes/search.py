@@ -0,0 +1,122 @@
+"""Ranked full-text search and name autocomplete over recipes and ingredients.
+
+On SQLite both run against the recipes_search FTS5 table, which triggers keep in step
+with the recipe and ingredient tables. Other databases fall back to matching names with
+a case-insensitive LIKE.
+"""
+import re
+from dataclasses import dataclass
+
+from django.db import connection
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Ingredient, Recipe
+
+RECIPE = 'recipe'
+INGREDIENT = 'ingredient'
+KINDS = {RECIPE: 0, INGREDIENT: 1}  # rowid % 2 in recipes_search
+WORDS = re.compile(r'\w+')
+MARK_START, MARK_END = '\x02', '\x03'
+NAME_WEIGHT, BODY_WEIGHT = 10.0, 1.0
+
+
+@dataclass
+class SearchResult:
+    kind: str
+    id: int
+    name: str
+    snippet: str = ''  # Safe HTML, matched terms wrapped in <mark>
+
+    def get_absolute_url(self):
+        if self.kind == RECIPE:
+            return reverse('recipes:recipe_detail', args=[self.id])
+        return None
+
+    def as_dict(self):
+        return {'kind': self.kind, 'id': self.id, 'name': self.name}
+
+
+def match_expression(query):
+    """FTS5 query matching every word of ``query``, the last one as a prefix.
+
+    Words are quoted, so user input can never inject FTS5 operators.
+    """
+    words = WORDS.findall(query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def _highlight(snippet):
+    return mark_safe(escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def _kind_filter(kind):
+    if kind is None:
+        return '', []
+    return 'AND recipes_search.rowid %% 2 = %s', [KINDS[kind]]
+
+
+def _result(rowid, name, snippet=''):
+    kind = RECIPE if rowid % 2 == 0 else INGREDIENT
+    return SearchResult(kind, rowid // 2, name, _highlight(snippet) if snippet else '')
+
+
+def search(query, kind=None, limit=20):
+    """Recipes and ingredients matching every word of ``query``, best first.
+
+    Matches in names weigh more than matches in descriptions and instructions.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    if connection.vendor != 'sqlite':
+        return _fallback(query, kind, limit)
+    kind_sql, kind_params = _kind_filter(kind)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT rowid, name, snippet(recipes_search, -1, %s, %s, '…', 12)
+            FROM recipes_search
+            WHERE recipes_search MATCH %s {kind_sql}
+            ORDER BY bm25(recipes_search, %s, %s)
+            LIMIT %s
+            """,
+            [MARK_START, MARK_END, expression, *kind_params, NAME_WEIGHT, BODY_WEIGHT, limit],
+        )
+        return [_result(*row) for row in cursor.fetchall()]
+
+
+def autocomplete(prefix, kind=None, limit=10):
+    """Recipes and ingredients whose name contains words starting with those typed, best first."""
+    expression = match_expression(prefix)
+    if expression is None:
+        return []
+    if connection.vendor != 'sqlite':
+        return _fallback(prefix, kind, limit)
+    kind_sql, kind_params = _kind_filter(kind)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT rowid, name
+            FROM recipes_search
+            WHERE recipes_search MATCH %s {kind_sql}
+            ORDER BY bm25(recipes_search), length(name)
+            LIMIT %s
+            """,
+            [f'name : ({expression})', *kind_params, limit],
+        )
+        return [_result(*row) for row in cursor.fetchall()]
+
+
+def _fallback(query, kind, limit):
+    results = []
+    if kind in (None, RECIPE):
+        recipes = Recipe.objects.filter(name__icontains=query).order_by('name').values_list('pk', 'name')[:limit]
+        results += [SearchResult(RECIPE, pk, name) for pk, name in recipes]
+    if kind in (None, INGREDIENT):
+        ingredients = Ingredient.objects.filter(name__icontains=query).order_by('name').values_list('pk', 'name')[:limit]
+        results += [SearchResult(INGREDIENT, pk, name) for pk, name in ingredients]
+    return results[:limit]
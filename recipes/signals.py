@@ -0,0 +1,99 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from tochinalli_project.cache_versions import bump_version, bump_versions
+from . import costing
+from .bom import get_graph
+from .lines import saving_lines
+from .models import Ingredient, IngredientUnit, Recipe, RecipeIngredient
+from .units import invalidate_unit_table
+
+COMPOSITION_FIELDS = ('produced_by_id', 'batch_yield', 'batch_unit', 'density')
+
+
+@receiver(post_save, sender='inventory.SupplierStock')
+@receiver(post_delete, sender='inventory.SupplierStock')
+def invalidate_costs_for_supplier_stock(sender, instance, **kwargs):
+    # _previous_ingredient_id is recorded by inventory.signals before the save.
+    ingredient_ids = {instance.ingredient_id, getattr(instance, '_previous_ingredient_id', None)}
+    ingredient_ids.discard(None)
+    costing.invalidate_ingredients(ingredient_ids)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_recipe_line(sender, instance, **kwargs):
+    if saving_lines():
+        return
+    costing.invalidate_recipes([instance.recipe_id])
+    get_graph().invalidate_recipe(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_new_recipe(sender, instance, created, **kwargs):
+    if created:
+        get_graph().invalidate_recipe(instance.pk)
+
+
+@receiver(pre_delete, sender=Recipe)
+def invalidate_deleted_recipe(sender, instance, **kwargs):
+    costing.invalidate_recipes([instance.pk])
+    get_graph().invalidate_all()
+
+
+@receiver(pre_save, sender=Ingredient)
+def remember_ingredient_composition(sender, instance, **kwargs):
+    instance._previous_composition = None
+    if instance.pk:
+        instance._previous_composition = sender.objects.filter(pk=instance.pk).values_list(*COMPOSITION_FIELDS).first()
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_composition(sender, instance, created, **kwargs):
+    composition = tuple(getattr(instance, field) for field in COMPOSITION_FIELDS)
+    previous = getattr(instance, '_previous_composition', None)
+    if created:
+        if instance.density is not None:
+            invalidate_unit_table()
+    elif previous is not None and previous != composition:
+        if previous[-1] != composition[-1]:
+            invalidate_unit_table()
+        costing.invalidate_ingredients([instance.pk])
+        get_graph().invalidate_all()
+
+
+@receiver(post_save, sender=IngredientUnit)
+@receiver(post_delete, sender=IngredientUnit)
+def invalidate_ingredient_unit(sender, instance, **kwargs):
+    invalidate_unit_table()
+    costing.invalidate_ingredients([instance.ingredient_id])
+    get_graph().invalidate_all()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def bump_recipe_version(sender, instance, **kwargs):
+    bump_version('recipe', instance.pk)
+    bump_version('recipes')
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def bump_recipe_line_version(sender, instance, **kwargs):
+    if saving_lines():
+        return
+    bump_version('recipe', instance.recipe_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def bump_versions_of_recipes_using_ingredient(sender, instance, created, **kwargs):
+    # Recipe pages show ingredient names, so a renamed ingredient changes every page using it.
+    if not created:
+        recipe_ids = RecipeIngredient.objects.filter(ingredient=instance).values_list('recipe_id', flat=True)
+        bump_versions([('recipe', recipe_id) for recipe_id in recipe_ids])
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredient_version(sender, instance, **kwargs):
+    bump_version('ingredients')
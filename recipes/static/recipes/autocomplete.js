@@ -0,0 +1,48 @@
+// Fills the datalist of every [data-autocomplete-url] text box from its search endpoint as
+// the user types, and copies the id of the chosen suggestion into the hidden input before it.
+(function () {
+    const DELAY = 150;
+    const timers = new WeakMap();
+    const choices = new WeakMap();
+
+    function hiddenInput(input) {
+        return input.previousElementSibling;
+    }
+
+    async function suggest(input) {
+        const params = new URLSearchParams({q: input.value});
+        if (input.dataset.autocompleteKind) {
+            params.set('kind', input.dataset.autocompleteKind);
+        }
+        const response = await fetch(`${input.dataset.autocompleteUrl}?${params}`, {headers: {Accept: 'application/json'}});
+        if (!response.ok) {
+            return;
+        }
+        const {results} = await response.json();
+        const byName = new Map(results.map((result) => [result.name, result.id]));
+        choices.set(input, byName);
+        input.list.replaceChildren(...results.map((result) => new Option(result.name)));
+        select(input);
+    }
+
+    function select(input) {
+        const id = (choices.get(input) || new Map()).get(input.value);
+        if (id !== undefined) {
+            hiddenInput(input).value = id;
+        }
+    }
+
+    document.addEventListener('input', (event) => {
+        const input = event.target;
+        if (!input.dataset || !input.dataset.autocompleteUrl) {
+            return;
+        }
+        // Typing invalidates the previous choice until a suggestion matches again.
+        hiddenInput(input).value = '';
+        select(input);
+        clearTimeout(timers.get(input));
+        if (input.value.trim().length >= 2) {
+            timers.set(input, setTimeout(() => suggest(input), DELAY));
+        }
+    });
+})();
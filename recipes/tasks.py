@@ -0,0 +1,17 @@
+from jobs.queue import set_progress, task
+from .costing import reprice_recipes
+
+BATCH_SIZE = 1000
+
+
+@task('recipes.reprice')
+def reprice(recipe_ids=None):
+    """Refresh the cost rollup of the given recipes, or of all of them, in batches."""
+    if recipe_ids is None:
+        costs = reprice_recipes()
+    else:
+        costs = {}
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            costs.update(reprice_recipes(recipe_ids[start:start + BATCH_SIZE]))
+            set_progress(min(start + BATCH_SIZE, len(recipe_ids)) / len(recipe_ids), f'{len(costs)} recipes repriced')
+    return {'repriced': len(costs), 'unpriced': sum(1 for cost in costs.values() if cost.unpriced_lines)}
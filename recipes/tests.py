@@ -1,7 +1,28 @@
-from django.test import TestCase
-from django.urls import reverse
+from django.core.exceptions import ValidationError
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.db import connection, connections, transaction
+from django.db.utils import OperationalError
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
 from django.contrib.auth.models import User
-from .models import Recipe, Ingredient
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from inventory.models import PriceChange, Supplier, SupplierStock
+from inventory.price_history import month_ends, record_price_changes
+from .models import Recipe, Ingredient, IngredientUnit, RecipeIngredient, RecipeCost
+from .costing import cost_history, get_recipe_costs, reprice_recipes
+from .lines import save_recipe_lines, saving_lines
+from .scaling import ScalingError, scale_recipes
+from .bom import get_graph
+from .units import UnitConversionError, UnitTable, get_unit_table
+from .search import autocomplete, match_expression, search
+from tochinalli_project import profiling
+from tochinalli_project.routers import STICKY_COOKIE, pin_to_primary
 
 class RecipeViewsTestCase(TestCase):
     def setUp(self):
@@ -25,6 +46,7 @@ class RecipeViewsTestCase(TestCase):
             'name': 'New Recipe',
             'description': 'New Description',
             'instructions': 'New Instructions',
+            'portions': '1',
             'ingredients-TOTAL_FORMS': '1',
             'ingredients-INITIAL_FORMS': '0',
             'ingredients-MIN_NUM_FORMS': '0',
@@ -41,6 +63,7 @@ class RecipeViewsTestCase(TestCase):
             'name': 'Updated Recipe',
             'description': 'Updated Description',
             'instructions': 'Updated Instructions',
+            'portions': '1',
             'ingredients-TOTAL_FORMS': '1',
             'ingredients-INITIAL_FORMS': '0',
             'ingredients-MIN_NUM_FORMS': '0',
@@ -53,7 +76,619 @@ class RecipeViewsTestCase(TestCase):
         self.recipe.refresh_from_db()
         self.assertEqual(self.recipe.name, 'Updated Recipe')
 
+    def test_repeated_ingredient_is_rejected(self):
+        line = {'ingredient': self.ingredient.pk, 'quantity': '1', 'unit': 'cup'}
+        data = {
+            'name': 'New Recipe',
+            'description': 'New Description',
+            'instructions': 'New Instructions',
+            'portions': '1',
+            'ingredients-TOTAL_FORMS': '2',
+            'ingredients-INITIAL_FORMS': '0',
+            'ingredients-MIN_NUM_FORMS': '0',
+            'ingredients-MAX_NUM_FORMS': '1000',
+        }
+        for i in range(2):
+            data.update({f'ingredients-{i}-{key}': value for key, value in line.items()})
+        response = self.client.post(reverse('recipes:recipe_create'), data)
+        self.assertContains(response, 'Each ingredient can only appear once in a recipe.')
+        self.assertFalse(Recipe.objects.filter(name='New Recipe').exists())
+
     def test_recipe_delete_view(self):
         response = self.client.post(reverse('recipes:recipe_delete', args=[self.recipe.pk]))
         self.assertEqual(response.status_code, 302)
         self.assertFalse(Recipe.objects.filter(pk=self.recipe.pk).exists())
+
+class RecipeLineSaveTestCase(TestCase):
+    def setUp(self):
+        User.objects.create_user(username='cook', password='password')
+        self.client.login(username='cook', password='password')
+        self.ingredients = Ingredient.objects.bulk_create([Ingredient(name=f'Ingredient {i}') for i in range(60)])
+        self.supplier = Supplier.objects.create(name='Mill', contact_info='')
+        SupplierStock.objects.create(supplier=self.supplier, ingredient=self.ingredients[0], quantity=10, unit='kg', price=Decimal('2.00'))
+
+    def make_recipe(self, lines):
+        recipe = Recipe.objects.create(name=f'Recipe {lines}', description='Description', instructions='Instructions')
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, quantity=1, unit='kg') for ingredient in self.ingredients[:lines]
+        ])
+        return recipe
+
+    def edit_data(self, recipe, **fields):
+        """Post data keeping every line, doubling every third, deleting every fifth and adding one."""
+        lines = list(recipe.recipeingredient_set.order_by('pk'))
+        data = {
+            'name': 'Edited', 'description': 'Description', 'instructions': 'Instructions', 'portions': '1',
+            'ingredients-TOTAL_FORMS': str(len(lines) + 1), 'ingredients-INITIAL_FORMS': str(len(lines)),
+            'ingredients-MIN_NUM_FORMS': '0', 'ingredients-MAX_NUM_FORMS': '1000',
+        }
+        for i, line in enumerate(lines):
+            data.update({
+                f'ingredients-{i}-id': line.pk, f'ingredients-{i}-recipe': recipe.pk, f'ingredients-{i}-ingredient': line.ingredient_id,
+                f'ingredients-{i}-quantity': '2' if i % 3 == 0 else '1', f'ingredients-{i}-unit': 'kg',
+            })
+            if i % 5 == 4:
+                data[f'ingredients-{i}-DELETE'] = 'on'
+        data.update({
+            f'ingredients-{len(lines)}-ingredient': self.ingredients[len(lines)].pk,
+            f'ingredients-{len(lines)}-quantity': '3', f'ingredients-{len(lines)}-unit': 'kg',
+        })
+        data.update(fields)
+        return data
+
+    def test_only_differences_are_written(self):
+        recipe = self.make_recipe(3)
+        reprice_recipes()
+        [first, second, third] = self.ingredients[:3]
+        changes = save_recipe_lines(recipe, [(first.pk, Decimal('1.00'), 'kg'), (second.pk, '2', 'kg'), (self.ingredients[5].pk, '1', 'g')])
+        self.assertEqual((changes.created, changes.updated, changes.deleted, changes.unchanged), (1, 1, 1, 1))
+        self.assertEqual(
+            sorted(recipe.recipeingredient_set.values_list('ingredient_id', 'quantity', 'unit')),
+            [(first.pk, Decimal('1.00'), 'kg'), (second.pk, Decimal('2.00'), 'kg'), (self.ingredients[5].pk, Decimal('1.00'), 'g')],
+        )
+        self.assertFalse(RecipeCost.objects.filter(recipe=recipe).exists())
+        self.assertFalse(save_recipe_lines(recipe, [(first.pk, 1, 'kg'), (second.pk, 2, 'kg'), (self.ingredients[5].pk, 1, 'g')]).changed)
+
+    def test_deleted_lines_skip_per_line_receivers(self):
+        recipe = self.make_recipe(3)
+        reprice_recipes()
+        changes = save_recipe_lines(recipe, [(self.ingredients[0].pk, 1, 'kg')])
+        self.assertEqual(changes.deleted, 2)
+        self.assertFalse(saving_lines())
+        self.assertFalse(RecipeCost.objects.filter(recipe=recipe).exists())
+        reprice_recipes()
+        recipe.recipeingredient_set.get().delete()
+        self.assertFalse(RecipeCost.objects.filter(recipe=recipe).exists())
+
+    def test_edit_queries_do_not_grow_with_lines(self):
+        for lines in (10, 40):
+            recipe = self.make_recipe(lines)
+            data = self.edit_data(recipe)
+            get_unit_table()
+            with self.assertNumQueries(18):  # The delete selects the lines it removes first
+                response = self.client.post(reverse('recipes:recipe_update', args=[recipe.pk]), data)
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(recipe.recipeingredient_set.count(), lines - lines // 5 + 1)
+            self.assertEqual(recipe.recipeingredient_set.filter(quantity=2).count(), len([i for i in range(lines) if i % 3 == 0 and i % 5 != 4]))
+
+    def test_invalid_line_rejects_whole_save(self):
+        recipe = self.make_recipe(5)
+        data = self.edit_data(recipe, **{'ingredients-1-unit': 'furlong'})
+        response = self.client.post(reverse('recipes:recipe_update', args=[recipe.pk]), data)
+        self.assertContains(response, 'Unknown unit &quot;furlong&quot;')
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Recipe 5')
+        self.assertEqual(recipe.recipeingredient_set.count(), 5)
+
+    def test_edit_updates_cost(self):
+        recipe = self.make_recipe(1)
+        self.assertEqual(get_recipe_costs([recipe.pk])[recipe.pk].total, Decimal('2.00'))
+        self.client.post(reverse('recipes:recipe_update', args=[recipe.pk]), self.edit_data(recipe))
+        self.assertEqual(get_recipe_costs([recipe.pk])[recipe.pk].total, Decimal('4.00'))
+        self.assertContains(self.client.get(reverse('recipes:recipe_detail', args=[recipe.pk])), '$4.00')
+
+class RecipeCostTestCase(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='Test Contact')
+        self.flour = Ingredient.objects.create(name='Flour')
+        self.salt = Ingredient.objects.create(name='Salt')
+        self.flour_stock = SupplierStock.objects.create(
+            supplier=self.supplier, ingredient=self.flour, quantity=50, unit='kg', price=Decimal('1.50')
+        )
+        SupplierStock.objects.create(
+            supplier=Supplier.objects.create(name='Other Supplier', contact_info='Other Contact'),
+            ingredient=self.flour, quantity=10, unit='kg', price=Decimal('2.00')
+        )
+        self.bread = Recipe.objects.create(name='Bread', description='Bread', instructions='Bake')
+        self.pizza = Recipe.objects.create(name='Pizza', description='Pizza', instructions='Bake')
+        RecipeIngredient.objects.create(recipe=self.bread, ingredient=self.flour, quantity=Decimal('2'), unit='kg')
+        RecipeIngredient.objects.create(recipe=self.bread, ingredient=self.salt, quantity=Decimal('0.05'), unit='kg')
+        RecipeIngredient.objects.create(recipe=self.pizza, ingredient=self.salt, quantity=Decimal('0.01'), unit='kg')
+        get_unit_table()
+
+    def test_reprice_uses_cheapest_supplier(self):
+        costs = reprice_recipes()
+        self.assertEqual(costs[self.bread.pk].total, Decimal('3.00'))
+        self.assertEqual(costs[self.bread.pk].unpriced_lines, 1)
+        self.assertEqual(costs[self.pizza.pk].total, Decimal('0.00'))
+        self.assertEqual(RecipeCost.objects.count(), 2)
+
+    def test_reprice_query_count_does_not_grow_with_lines(self):
+        for i in range(20):
+            recipe = Recipe.objects.create(name=f'Recipe {i}', description='', instructions='')
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=self.flour, quantity=1, unit='kg')
+        with self.assertNumQueries(6):
+            reprice_recipes()
+
+    def test_price_change_invalidates_only_affected_recipes(self):
+        reprice_recipes()
+        self.flour_stock.price = Decimal('1.00')
+        self.flour_stock.save()
+        self.assertFalse(RecipeCost.objects.filter(recipe=self.bread).exists())
+        self.assertTrue(RecipeCost.objects.filter(recipe=self.pizza).exists())
+        self.assertEqual(get_recipe_costs([self.bread.pk])[self.bread.pk].total, Decimal('2.00'))
+
+    def test_recipe_line_change_invalidates_recipe(self):
+        reprice_recipes()
+        RecipeIngredient.objects.create(recipe=self.pizza, ingredient=self.flour, quantity=Decimal('0.5'), unit='kg')
+        self.assertFalse(RecipeCost.objects.filter(recipe=self.pizza).exists())
+        self.assertEqual(get_recipe_costs([self.pizza.pk])[self.pizza.pk].total, Decimal('0.75'))
+
+    def test_cost_history_reprices_at_each_month_end(self):
+        january, february, march = month_ends(3)
+        PriceChange.objects.update(valid_from=january - timedelta(days=1))
+        record_price_changes([(self.flour.pk, self.supplier.pk, 'kg', Decimal('2.50'))], when=january + timedelta(days=1))
+        record_price_changes([(self.flour.pk, self.supplier.pk, 'lb', Decimal('0.50'))], when=march - timedelta(days=1))
+        with self.assertNumQueries(3):
+            history = cost_history([january, february, march])
+        self.assertEqual(history[self.bread.pk], [(Decimal('3.00'), 1), (Decimal('4.00'), 1), (Decimal('2.20'), 1)])
+        self.assertEqual(history[self.pizza.pk], [(Decimal('0.00'), 1)] * 3)
+
+    def test_cost_history_export(self):
+        User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        response = self.client.get(reverse('recipes:cost_history_export'), {'format': 'csv', 'months': '2'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        months = [when.strftime('%Y-%m') for when in month_ends(2)]
+        self.assertEqual(lines[0], ','.join(['recipe_id', 'recipe'] + months))
+        self.assertEqual(lines[1], f'{self.bread.pk},Bread,0.00,0.00')  # Priced only from today on
+        response = self.client.get(reverse('recipes:cost_history_export'), {'months': '0'})
+        self.assertEqual(response.status_code, 400)
+
+class SubRecipeGraphTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='Test Contact')
+        self.tomato = Ingredient.objects.create(name='Tomato')
+        SupplierStock.objects.create(supplier=self.supplier, ingredient=self.tomato, quantity=50, unit='kg', price=Decimal('2.00'))
+        # Each level is made from 2 of the level below, and each batch yields 4.
+        self.levels = []
+        below = self.tomato
+        for depth in range(5):
+            recipe = Recipe.objects.create(name=f'Level {depth}', description='', instructions='')
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=below, quantity=2, unit='kg')
+            below = Ingredient.objects.create(
+                name=f'Preparation {depth}', is_commercial=False, produced_by=recipe, batch_yield=4, batch_unit='kg'
+            )
+            self.levels.append((recipe, below))
+        self.menu = Recipe.objects.create(name='Menu', description='', instructions='')
+        RecipeIngredient.objects.create(recipe=self.menu, ingredient=below, quantity=8, unit='kg')
+        get_graph().clear()
+        get_unit_table()
+
+    def test_explode_flattens_to_commercial_ingredients(self):
+        with self.assertNumQueries(6):
+            exploded = get_graph().explode(self.menu.pk)
+        self.assertEqual(exploded, {(self.tomato.pk, 'g'): Decimal('250')})
+        with self.assertNumQueries(0):
+            get_graph().explode(self.menu.pk)
+
+    def test_cost_includes_sub_recipes(self):
+        self.assertEqual(reprice_recipes([self.menu.pk])[self.menu.pk].total, Decimal('0.50'))
+
+    def test_sub_recipe_change_updates_explosion_and_cost(self):
+        get_recipe_costs([self.menu.pk])
+        line = RecipeIngredient.objects.get(recipe=self.levels[0][0])
+        line.quantity = 4
+        line.save()
+        self.assertFalse(RecipeCost.objects.filter(recipe=self.menu).exists())
+        self.assertEqual(get_graph().explode(self.menu.pk), {(self.tomato.pk, 'g'): Decimal('500')})
+
+    def test_formset_rejects_cycle(self):
+        bottom = self.levels[0][0]
+        response = self.client.post(reverse('recipes:recipe_update', args=[bottom.pk]), {
+            'name': bottom.name,
+            'description': 'Cyclic',
+            'instructions': 'Cyclic',
+            'portions': '1',
+            'ingredients-TOTAL_FORMS': '1',
+            'ingredients-INITIAL_FORMS': '0',
+            'ingredients-MIN_NUM_FORMS': '0',
+            'ingredients-MAX_NUM_FORMS': '1000',
+            'ingredients-0-ingredient': self.levels[-1][1].pk,
+            'ingredients-0-quantity': '1',
+            'ingredients-0-unit': 'kg',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'directly or through a sub-recipe')
+        self.assertEqual(bottom.recipeingredient_set.count(), 1)
+
+    def test_ingredient_clean_rejects_cycle(self):
+        self.tomato.is_commercial = False
+        self.tomato.produced_by = self.menu
+        with self.assertRaises(ValidationError):
+            self.tomato.full_clean()
+
+class UnitTableTestCase(TestCase):
+    def setUp(self):
+        self.milk = Ingredient.objects.create(name='Milk', density=Decimal('1.03'))
+        self.egg = Ingredient.objects.create(name='Egg')
+        IngredientUnit.objects.create(ingredient=self.egg, name='unit', quantity=50, unit='g')
+        IngredientUnit.objects.create(ingredient=self.egg, name='case', quantity=30, unit='dozen')
+        self.table = UnitTable.compile()
+
+    def test_registry_conversions(self):
+        self.assertEqual(self.table.convert(None, Decimal('5'), 'kg', 'grams'), Decimal('5000'))
+        self.assertEqual(self.table.convert(None, Decimal('2'), 'Cups', 'ml'), Decimal('480'))
+        with self.assertRaises(UnitConversionError):
+            self.table.convert(None, Decimal('1'), 'l', 'kg')
+
+    def test_density_bridges_volume_and_mass(self):
+        self.assertEqual(self.table.normalize(self.milk.pk, Decimal('1'), 'l'), (Decimal('1030'), 'g'))
+        self.assertEqual(self.table.convert(self.milk.pk, Decimal('2.06'), 'kg', 'l'), Decimal('2'))
+
+    def test_pack_sizes_and_counts(self):
+        self.assertEqual(self.table.normalize(self.egg.pk, Decimal('1'), 'case'), (Decimal('18000'), 'g'))
+        self.assertEqual(self.table.normalize(self.egg.pk, Decimal('6'), 'units'), (Decimal('300'), 'g'))
+
+    def test_normalize_many_keeps_unknown_units(self):
+        rows = [(self.milk.pk, Decimal('250'), 'ml'), (self.milk.pk, Decimal('1'), 'splash')]
+        self.assertEqual(
+            list(self.table.normalize_many(rows)),
+            [(self.milk.pk, Decimal('257.5'), 'g'), (self.milk.pk, Decimal('1'), 'splash')],
+        )
+
+    def test_cost_compares_recipe_and_pack_units(self):
+        supplier = Supplier.objects.create(name='Test Supplier', contact_info='Test Contact')
+        SupplierStock.objects.create(supplier=supplier, ingredient=self.egg, quantity=4, unit='case', price=Decimal('90.00'))
+        SupplierStock.objects.create(supplier=supplier, ingredient=self.milk, quantity=10, unit='l', price=Decimal('1.03'))
+        recipe = Recipe.objects.create(name='Custard', description='', instructions='')
+        RecipeIngredient.objects.create(recipe=recipe, ingredient=self.egg, quantity=6, unit='unit')
+        RecipeIngredient.objects.create(recipe=recipe, ingredient=self.milk, quantity=500, unit='g')
+        self.assertEqual(reprice_recipes([recipe.pk])[recipe.pk].total, Decimal('2.00'))
+
+class RecipeQueryBudgetTestCase(TestCase):
+    def setUp(self):
+        self.recipes = []
+        for i in range(10):
+            recipe = Recipe.objects.create(name=f'Recipe {i}', description='', instructions='')
+            for j in range(5):
+                ingredient, created = Ingredient.objects.get_or_create(name=f'Ingredient {j}')
+                RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=j + 1, unit='g')
+            self.recipes.append(recipe)
+        reprice_recipes()
+
+    def test_recipe_list_query_budget(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('recipes:recipe_list'))
+        self.assertContains(response, 'Recipe 9')
+
+    def test_recipe_detail_query_budget(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('recipes:recipe_detail', args=[self.recipes[0].pk]))
+        self.assertContains(response, 'of Ingredient 4')
+
+    def test_recipe_form_does_not_list_catalog(self):
+        User.objects.create_user(username='cook', password='password')
+        self.client.login(username='cook', password='password')
+        Ingredient.objects.bulk_create([Ingredient(name=f'Unused {i}') for i in range(200)])
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('recipes:recipe_update', args=[self.recipes[0].pk]))
+        self.assertContains(response, 'value="Ingredient 4"')
+        self.assertContains(response, reverse('recipes:autocomplete'))
+        self.assertNotContains(response, 'Unused')
+        self.assertNotContains(response, '<option')
+
+class RecipeExportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        self.flour = Ingredient.objects.create(name='Flour')
+        self.bread = Recipe.objects.create(name='Bread', description='Bread', instructions='Bake')
+        self.water = Recipe.objects.create(name='Water', description='Water', instructions='Pour')
+        self.pizza = Recipe.objects.create(name='Pizza', description='Pizza', instructions='Bake')
+        RecipeIngredient.objects.create(recipe=self.bread, ingredient=self.flour, quantity=2, unit='kg')
+        RecipeIngredient.objects.create(recipe=self.pizza, ingredient=self.flour, quantity=1, unit='kg')
+
+    def test_jsonl_export_nests_lines(self):
+        response = self.client.get(reverse('recipes:recipe_export'), {'format': 'jsonl'})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['name'] for record in records], ['Bread', 'Water', 'Pizza'])
+        self.assertEqual(records[0]['lines'], [{'ingredient_id': self.flour.pk, 'ingredient': 'Flour', 'quantity': '2.00', 'unit': 'kg'}])
+        self.assertEqual(records[1]['lines'], [])
+
+    def test_csv_export_has_one_row_per_line(self):
+        response = self.client.get(reverse('recipes:recipe_export'), {'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[1:], [
+            f'{self.bread.pk},Bread,{self.flour.pk},Flour,2.00,kg',
+            f'{self.water.pk},Water,,,,',
+            f'{self.pizza.pk},Pizza,{self.flour.pk},Flour,1.00,kg',
+        ])
+
+class RecipeAPITestCase(TestCase):
+    def setUp(self):
+        self.flour = Ingredient.objects.create(name='Flour')
+        self.recipe = Recipe.objects.create(name='Bread', description='Bread', instructions='Bake')
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=self.flour, quantity=2, unit='kg')
+        self.url = reverse('recipes_api:recipe_detail', args=[self.recipe.pk])
+
+    def test_recipe_detail_payload(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['lines'], [{'ingredient_id': self.flour.pk, 'ingredient': 'Flour', 'quantity': '2.00', 'unit': 'kg'}])
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_warm_and_conditional_requests_skip_the_database(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_line_change_invalidates_payload(self):
+        etag = self.client.get(self.url)['ETag']
+        RecipeIngredient.objects.filter(recipe=self.recipe).get().delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['lines'], [])
+
+    def test_ingredient_rename_invalidates_catalog(self):
+        url = reverse('recipes_api:ingredient_list')
+        etag = self.client.get(url)['ETag']
+        self.flour.name = 'Wheat Flour'
+        self.flour.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Wheat Flour')
+
+    def test_missing_recipe(self):
+        response = self.client.get(reverse('recipes_api:recipe_detail', args=[self.recipe.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+class RecipeScalingTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.flour = Ingredient.objects.create(name='Flour')
+        self.egg = Ingredient.objects.create(name='Egg')
+        self.bread = Recipe.objects.create(
+            name='Bread', description='', instructions='', portions=4, yield_quantity=Decimal('1.2'), yield_unit='kg',
+        )
+        self.cake = Recipe.objects.create(name='Cake', description='', instructions='', portions=3)
+        RecipeIngredient.objects.create(recipe=self.bread, ingredient=self.flour, quantity=Decimal('0.75'), unit='kg')
+        RecipeIngredient.objects.create(recipe=self.bread, ingredient=self.egg, quantity=Decimal('1'), unit='unit')
+        RecipeIngredient.objects.create(recipe=self.cake, ingredient=self.flour, quantity=Decimal('100'), unit='g')
+        get_unit_table()
+
+    def test_batch_is_scaled_from_preloaded_lines(self):
+        targets = [(self.bread.pk, Decimal('10')), (self.cake.pk, Decimal('2')), (self.bread.pk, Decimal('1'))]
+        with self.assertNumQueries(2):
+            recipes, totals = scale_recipes(targets)
+        bread, cake, slice_ = recipes
+        self.assertEqual(bread['yield_quantity'], Decimal('3.00'))
+        self.assertEqual(
+            [(line['quantity'], line['unit'], line['base_quantity'], line['base_unit']) for line in bread['lines']],
+            [(Decimal('1.88'), 'kg', Decimal('1875.00'), 'g'), (Decimal('2.50'), 'unit', Decimal('2.50'), 'unit')],
+        )
+        self.assertEqual(cake['lines'][0]['quantity'], Decimal('66.67'))  # Rounded half up
+        self.assertEqual(slice_['lines'][0]['quantity'], Decimal('0.19'))
+        self.assertEqual(
+            [(total['ingredient'], total['quantity'], total['unit']) for total in totals],
+            [('Egg', Decimal('2.75'), 'unit'), ('Flour', Decimal('2129.17'), 'g')],
+        )
+
+    def test_invalid_targets(self):
+        with self.assertRaises(ScalingError):
+            scale_recipes([(self.bread.pk, Decimal('0'))])
+        with self.assertRaisesMessage(ScalingError, 'must be at most'):
+            scale_recipes([(self.bread.pk, Decimal('1e30'))])
+        with self.assertRaisesMessage(ScalingError, 'Unknown recipe'):
+            scale_recipes([(self.bread.pk + 100, Decimal('1'))])
+
+    def test_scale_api(self):
+        url = reverse('recipes_api:recipe_scale')
+        response = self.client.get(f'{url}?recipe={self.bread.pk}&portions=8&recipe={self.cake.pk}&portions=6')
+        data = response.json()
+        self.assertEqual([recipe['recipe'] for recipe in data['recipes']], ['Bread', 'Cake'])
+        self.assertEqual(data['recipes'][0]['lines'][0]['quantity'], '1.50')
+        self.assertEqual(data['totals'][1], {'ingredient_id': self.flour.pk, 'ingredient': 'Flour', 'quantity': '1700.00', 'unit': 'g'})
+        for query in (f'recipe={self.bread.pk}', f'recipe={self.bread.pk}&portions=x', f'recipe={self.bread.pk}&portions=-1',
+                      f'recipe={self.bread.pk}&portions=1e30'):
+            self.assertEqual(self.client.get(f'{url}?{query}').status_code, 400)
+
+    def test_detail_page_scales_and_costs_per_portion(self):
+        SupplierStock.objects.create(
+            supplier=Supplier.objects.create(name='Mill', contact_info=''), ingredient=self.flour, quantity=1, unit='kg',
+            price=Decimal('2.00'),
+        )
+        self.client.login(username='testuser', password='password')
+        url = reverse('recipes:recipe_detail', args=[self.bread.pk])
+        response = self.client.get(url)
+        self.assertContains(response, 'Makes 4 portions, 1.20 kg.')
+        self.assertContains(response, '($0.38 per portion)')
+        response = self.client.get(url, {'portions': '2'})
+        self.assertContains(response, '0.38 kg of Flour')
+        self.assertContains(response, 'Portions must be a positive number.', count=0)
+        self.assertContains(self.client.get(url, {'portions': 'many'}), 'Portions must be a positive number.')
+
+class FragmentCacheTestCase(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name='Mill', contact_info='')
+        self.flour = Ingredient.objects.create(name='Flour')
+        self.stock = SupplierStock.objects.create(supplier=self.supplier, ingredient=self.flour, quantity=10, unit='kg', price=Decimal('2.00'))
+        self.recipe = Recipe.objects.create(name='Bread', description='', instructions='')
+        self.line = RecipeIngredient.objects.create(recipe=self.recipe, ingredient=self.flour, quantity=Decimal('500'), unit='g')
+        self.url = reverse('recipes:recipe_detail', args=[self.recipe.pk])
+        get_unit_table()
+
+    def test_warm_hits_issue_no_queries(self):
+        self.client.get(self.url)
+        self.client.get(reverse('recipes:recipe_list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, '<title>Bread</title>', html=False)
+        self.assertContains(response, '500.00 g of Flour')
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(reverse('recipes:recipe_list')), '$1.00')
+
+    def test_changes_invalidate_fragments(self):
+        self.assertContains(self.client.get(self.url), '$1.00')
+        self.line.quantity = Decimal('1000')
+        self.line.save()
+        self.assertContains(self.client.get(self.url), '1000.00 g of Flour')
+        self.flour.name = 'Rye flour'
+        self.flour.save()
+        self.assertContains(self.client.get(self.url), 'of Rye flour')
+        self.stock.price = Decimal('3.00')
+        self.stock.save()
+        self.assertContains(self.client.get(self.url), '$3.00')
+        self.assertContains(self.client.get(reverse('recipes:recipe_list')), '$3.00')
+        self.recipe.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        profiling.stats.reset()
+        self.recipe = Recipe.objects.create(name='Bread', description='', instructions='')
+        self.ingredients = [Ingredient.objects.create(name=f'Ingredient {i}') for i in range(6)]
+
+    def test_disabled_middleware_is_not_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            profiling.ProfilingMiddleware(lambda request: HttpResponse())
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_server_timing_and_repeated_queries(self):
+        def n_plus_one(request):
+            names = [Ingredient.objects.get(pk=ingredient.pk).name for ingredient in self.ingredients]
+            return HttpResponse(', '.join(names))
+
+        request = RequestFactory().get('/recipes/')
+        request.resolver_match = resolve('/recipes/')
+        response = profiling.ProfilingMiddleware(n_plus_one)(request)
+        self.assertRegex(response['Server-Timing'], r'^sql;dur=[\d.]+;desc="6 queries", tpl;dur=[\d.]+, app;dur=[\d.]+, total;dur=[\d.]+$')
+        [endpoint] = profiling.stats.slowest()
+        self.assertEqual((endpoint['name'], endpoint['requests'], endpoint['mean_queries']), ('recipes:recipe_list', 1, 6))
+        [repeated] = profiling.stats.repeated_queries()
+        self.assertEqual(repeated['max_repetitions'], 6)
+        self.assertIn('recipes_ingredient', repeated['sql'])
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_queries_from_worker_threads_are_counted(self):
+        def count_in_thread():
+            try:
+                return Ingredient.objects.count()
+            finally:
+                connection.close()
+
+        def threaded(request):
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                count = executor.submit(contextvars.copy_context().run, count_in_thread).result()
+            return HttpResponse(str(count))
+
+        request = RequestFactory().get('/recipes/')
+        request.resolver_match = resolve('/recipes/')
+        response = profiling.ProfilingMiddleware(threaded)(request)
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_stats_view_is_staff_only(self):
+        user = User.objects.create_user(username='cook', password='password')
+        self.client.login(username='cook', password='password')
+        self.assertEqual(self.client.get(reverse('profiling_stats')).status_code, 403)
+        user.is_staff = True
+        user.save()
+        self.assertIn('Server-Timing', self.client.get(reverse('recipes:recipe_detail', args=[self.recipe.pk])))
+        response = self.client.get(reverse('profiling_stats'))
+        self.assertContains(response, 'recipes:recipe_detail')
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        self.soup = Recipe.objects.create(name='Tomato Soup', description='Roasted tomatoes and basil', instructions='Blend.')
+        self.tart = Recipe.objects.create(name='Onion Tart', description='Caramelised onions', instructions='Serve with tomato salad.')
+        self.tomato = Ingredient.objects.create(name='Tomato')
+        Ingredient.objects.create(name='Crème fraîche')
+
+    def test_match_expression_quotes_words(self):
+        self.assertEqual(match_expression('tom "soup OR'), '"tom" "soup" "OR"*')
+        self.assertIsNone(match_expression(' - '))
+
+    def test_name_matches_rank_first(self):
+        results = search('tomato', kind='recipe')
+        self.assertEqual([result.id for result in results], [self.soup.pk, self.tart.pk])
+        self.assertIn('<mark>tomato</mark>', results[1].snippet)
+        self.assertEqual({(result.kind, result.id) for result in search('tomato')} - {('recipe', self.soup.pk), ('recipe', self.tart.pk)}, {('ingredient', self.tomato.pk)})
+
+    def test_snippet_is_escaped(self):
+        Recipe.objects.create(name='Pickles', description='<b>Brine</b> cucumbers', instructions='')
+        [result] = search('brine')
+        self.assertIn('&lt;b&gt;<mark>Brine</mark>&lt;/b&gt;', result.snippet)
+
+    def test_index_follows_writes(self):
+        self.soup.name = 'Gazpacho'
+        self.soup.save()
+        self.assertEqual([result.id for result in autocomplete('gaz')], [self.soup.pk])
+        self.tart.delete()
+        self.assertEqual(search('onion'), [])
+        Ingredient.objects.bulk_create([Ingredient(name='Tomatillo')])
+        self.assertEqual([result.name for result in autocomplete('tom', kind='ingredient')], ['Tomato', 'Tomatillo'])
+
+    def test_autocomplete_ignores_accents_and_descriptions(self):
+        self.assertEqual([result.name for result in autocomplete('creme')], ['Crème fraîche'])
+        self.assertEqual(autocomplete('basil'), [])
+
+    def test_views(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('recipes:autocomplete'), {'q': 'tom', 'kind': 'recipe'})
+        self.assertEqual(response.json(), {'results': [{'kind': 'recipe', 'id': self.soup.pk, 'name': 'Tomato Soup'}]})
+        response = self.client.get(reverse('recipes:search'), {'q': 'onion'})
+        self.assertContains(response, reverse('recipes:recipe_detail', args=[self.tart.pk]))
+        self.assertContains(response, '<mark>Onion</mark>')
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTestCase(TransactionTestCase):
+    # In tests the replica alias is a second, query only connection to the test database.
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        User.objects.create_user(username='cook', password='password')
+        self.client.login(username='cook', password='password')
+        self.recipe = Recipe.objects.create(name='Bread', description='', instructions='')
+
+    def queries(self, alias, func):
+        with CaptureQueriesContext(connections[alias]) as context:
+            func()
+        return len(context)
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        self.assertEqual(Recipe.objects.all().db, 'replica')
+        self.assertEqual(self.queries('replica', lambda: Recipe.objects.get(pk=self.recipe.pk)), 1)
+        self.assertEqual(self.queries('default', lambda: Recipe.objects.create(name='Soup', description='', instructions='')), 1)
+        with self.assertRaisesMessage(OperationalError, 'readonly'):
+            with connections['replica'].cursor() as cursor:
+                cursor.execute('DELETE FROM recipes_recipe')
+
+    def test_pinned_and_transactional_reads_use_primary(self):
+        with pin_to_primary():
+            self.assertEqual(Recipe.objects.all().db, 'default')
+        with transaction.atomic():
+            self.assertEqual(Recipe.objects.all().db, 'default')
+        self.assertEqual(Recipe.objects.all().db, 'replica')
+
+    def test_client_reads_primary_after_a_post(self):
+        url = reverse('recipes:recipe_detail', args=[self.recipe.pk])
+        self.assertGreater(self.queries('replica', lambda: self.client.get(url)), 0)
+        self.assertNotIn(STICKY_COOKIE, self.client.cookies)
+        response = self.client.post(reverse('recipes:recipe_delete', args=[Recipe.objects.create(name='Old', description='', instructions='').pk]))
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 10)
+        self.assertEqual(self.queries('replica', lambda: self.client.get(url)), 0)
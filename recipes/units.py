@@ -0,0 +1,181 @@
+import threading
+from decimal import Decimal
+
+from django.core.cache import cache
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+
+BASE_UNITS = {MASS: 'g', VOLUME: 'ml', COUNT: 'unit'}
+
+# Factor to the base unit of each dimension.
+UNITS = {
+    'mg': (MASS, Decimal('0.001')),
+    'g': (MASS, Decimal('1')),
+    'kg': (MASS, Decimal('1000')),
+    'oz': (MASS, Decimal('28.349523125')),
+    'lb': (MASS, Decimal('453.59237')),
+    'ml': (VOLUME, Decimal('1')),
+    'cl': (VOLUME, Decimal('10')),
+    'dl': (VOLUME, Decimal('100')),
+    'l': (VOLUME, Decimal('1000')),
+    'tsp': (VOLUME, Decimal('5')),
+    'tbsp': (VOLUME, Decimal('15')),
+    'cup': (VOLUME, Decimal('240')),
+    'fl oz': (VOLUME, Decimal('29.5735295625')),
+    'pt': (VOLUME, Decimal('473.176473')),
+    'qt': (VOLUME, Decimal('946.352946')),
+    'gal': (VOLUME, Decimal('3785.411784')),
+    'unit': (COUNT, Decimal('1')),
+    'dozen': (COUNT, Decimal('12')),
+}
+
+ALIASES = {
+    'gr': 'g', 'gram': 'g', 'grams': 'g', 'gramo': 'g', 'gramos': 'g',
+    'kilo': 'kg', 'kilos': 'kg', 'kilogram': 'kg', 'kilograms': 'kg', 'kilogramo': 'kg', 'kilogramos': 'kg',
+    'milligram': 'mg', 'milligrams': 'mg', 'ounce': 'oz', 'ounces': 'oz',
+    'lbs': 'lb', 'pound': 'lb', 'pounds': 'lb',
+    'millilitre': 'ml', 'milliliter': 'ml', 'millilitres': 'ml', 'milliliters': 'ml', 'mililitro': 'ml', 'mililitros': 'ml',
+    'litre': 'l', 'liter': 'l', 'litres': 'l', 'liters': 'l', 'lt': 'l', 'litro': 'l', 'litros': 'l',
+    'teaspoon': 'tsp', 'teaspoons': 'tsp', 'tablespoon': 'tbsp', 'tablespoons': 'tbsp', 'cups': 'cup', 'taza': 'cup', 'tazas': 'cup',
+    'pint': 'pt', 'pints': 'pt', 'quart': 'qt', 'quarts': 'qt', 'gallon': 'gal', 'gallons': 'gal',
+    'units': 'unit', 'u': 'unit', 'pc': 'unit', 'pcs': 'unit', 'piece': 'unit', 'pieces': 'unit',
+    'each': 'unit', 'ea': 'unit', 'pieza': 'unit', 'piezas': 'unit', 'dozens': 'dozen', 'docena': 'dozen',
+}
+
+VERSION_KEY = 'recipes:units:version'
+
+
+class UnitConversionError(ValueError):
+    pass
+
+
+def clean_unit_name(unit):
+    name = ' '.join(unit.lower().replace('.', ' ').split())
+    return ALIASES.get(name, name)
+
+
+class UnitTable:
+    """Unit registry compiled with per-ingredient densities and pack sizes.
+
+    Every distinct (ingredient, unit) pair is resolved once into a dimension and a factor
+    to the ingredient's reference base unit, so normalizing a queryset is a dict lookup
+    and a Decimal multiplication per row. The reference dimension is mass whenever a
+    density or pack definition makes it reachable, so weights and volumes compare.
+    """
+
+    def __init__(self, densities=None, packs=None):
+        self.densities = densities or {}  # ingredient_id -> grams per millilitre
+        self.packs = packs or {}  # (ingredient_id, unit name) -> (quantity, unit)
+        self._factors = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def compile(cls):
+        from .models import Ingredient, IngredientUnit
+        densities = dict(Ingredient.objects.filter(density__isnull=False).values_list('pk', 'density'))
+        packs = {
+            (ingredient_id, clean_unit_name(name)): (quantity, unit)
+            for ingredient_id, name, quantity, unit in IngredientUnit.objects.values_list(
+                'ingredient_id', 'name', 'quantity', 'unit'
+            )
+        }
+        return cls(densities, packs)
+
+    def resolve(self, ingredient_id, unit):
+        """(base unit, factor) such that quantity * factor is in the base unit."""
+        resolved = self._lookup(ingredient_id, unit)
+        if resolved is None:
+            raise UnitConversionError(f"Unknown unit '{unit}'")
+        return resolved
+
+    def _lookup(self, ingredient_id, unit):
+        key = (ingredient_id, unit)
+        try:
+            return self._factors[key]
+        except KeyError:
+            pass
+        try:
+            dimension, factor = self._native(ingredient_id, clean_unit_name(unit), ())
+        except UnitConversionError:
+            resolved = None
+        else:
+            density = self.densities.get(ingredient_id)
+            if dimension == VOLUME and density:
+                dimension, factor = MASS, factor * density
+            resolved = (BASE_UNITS[dimension], factor)
+        with self._lock:
+            self._factors[key] = resolved
+        return resolved
+
+    def _native(self, ingredient_id, name, seen):
+        pack = self.packs.get((ingredient_id, name))
+        if pack is not None:
+            if name in seen:
+                raise UnitConversionError(f"Pack '{name}' is defined in terms of itself")
+            quantity, unit = pack
+            dimension, factor = self._native(ingredient_id, clean_unit_name(unit), seen + (name,))
+            return dimension, quantity * factor
+        if name not in UNITS:
+            raise UnitConversionError(f"Unknown unit '{name}'")
+        dimension, factor = UNITS[name]
+        if dimension == COUNT and (ingredient_id, 'unit') in self.packs:
+            # Counted units (dozen) follow the ingredient's own definition of one unit.
+            unit_dimension, unit_factor = self._native(ingredient_id, 'unit', seen + (name,))
+            return unit_dimension, factor * unit_factor
+        return dimension, factor
+
+    def normalize(self, ingredient_id, quantity, unit):
+        base_unit, factor = self.resolve(ingredient_id, unit)
+        return quantity * factor, base_unit
+
+    def try_normalize(self, ingredient_id, quantity, unit):
+        resolved = self._lookup(ingredient_id, unit)
+        if resolved is None:
+            return quantity, unit
+        return quantity * resolved[1], resolved[0]
+
+    def normalize_many(self, rows):
+        """Normalize (ingredient_id, quantity, unit) rows, yielding (ingredient_id, quantity, base unit).
+
+        Rows whose unit cannot be resolved keep their quantity and raw unit.
+        """
+        lookup = self._lookup
+        for ingredient_id, quantity, unit in rows:
+            resolved = lookup(ingredient_id, unit)
+            if resolved is None:
+                yield ingredient_id, quantity, unit
+            else:
+                yield ingredient_id, quantity * resolved[1], resolved[0]
+
+    def convert(self, ingredient_id, quantity, from_unit, to_unit):
+        from_base, from_factor = self.resolve(ingredient_id, from_unit)
+        to_base, to_factor = self.resolve(ingredient_id, to_unit)
+        if from_base != to_base:
+            raise UnitConversionError(f"Cannot convert {from_unit} to {to_unit} without a density or pack size")
+        return quantity * from_factor / to_factor
+
+
+_table = None
+_table_version = None
+_table_lock = threading.Lock()
+
+
+def get_unit_table():
+    global _table, _table_version
+    version = cache.get(VERSION_KEY)
+    with _table_lock:
+        if _table is None or version != _table_version:
+            _table, _table_version = UnitTable.compile(), version
+        return _table
+
+
+def invalidate_unit_table():
+    global _table
+    with _table_lock:
+        _table = None
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
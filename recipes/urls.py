@@ -1,10 +1,15 @@
 from django.urls import path
+from tochinalli_project.exports import ExportView
+from .exports import RecipeDataset
 from .views import (
     RecipeListView,
     RecipeDetailView,
     RecipeCreateView,
     RecipeUpdateView,
     RecipeDeleteView,
+    RecipeSearchView,
+    AutocompleteView,
+    RecipeCostHistoryExportView,
 )
 
 app_name = 'recipes'
@@ -15,4 +20,8 @@ urlpatterns = [
     path('new/', RecipeCreateView.as_view(), name='recipe_create'),
     path('<int:pk>/edit/', RecipeUpdateView.as_view(), name='recipe_update'),
     path('<int:pk>/delete/', RecipeDeleteView.as_view(), name='recipe_delete'),
+    path('search/', RecipeSearchView.as_view(), name='search'),
+    path('search/autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
+    path('export/', ExportView.as_view(dataset_class=RecipeDataset), name='recipe_export'),
+    path('cost-history/export/', RecipeCostHistoryExportView.as_view(), name='cost_history_export'),
 ]
@@ -1,70 +1,143 @@
+from decimal import Decimal
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db import transaction
-from django.views.generic import ListView, DetailView
+from django.db.models import Prefetch
+from django.http import HttpResponseRedirect, JsonResponse
+from django.views import View
+from django.views.generic import ListView, DetailView, TemplateView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
-from .models import Recipe
+from .models import Recipe, RecipeIngredient
 from .forms import RecipeForm, IngredientFormSet
+from .costing import get_recipe_costs
+from .exports import RecipeCostHistoryDataset
+from .lines import save_recipe_lines
+from .scaling import CENT, scale_recipes
+from .search import KINDS, autocomplete, search
+from tochinalli_project.exports import ExportView
+from tochinalli_project.fragments import FragmentCacheMixin
+from tochinalli_project.pagination import KeysetPaginationMixin
 
-class RecipeListView(ListView):
+class RecipeListView(FragmentCacheMixin, KeysetPaginationMixin, ListView):
     model = Recipe
     template_name = 'recipes/recipe_list.html'
+    fragment_template_name = 'recipes/includes/recipe_list_content.html'
+    row_template_name = 'recipes/includes/recipe_row.html'
     context_object_name = 'recipes'
+    sort_fields = {'name': 'name', 'id': 'pk'}
+    default_sort = 'name'
+    filter_fields = {'q': 'name__istartswith'}
+
+    def get_fragment_versions(self):
+        return [('recipes',)]
+
+    def use_fragment_cache(self):
+        return super().use_fragment_cache() and not self.request.GET.get('stream')
+
+    def prepare_rows(self, rows):
+        costs = get_recipe_costs(recipe.pk for recipe in rows)
+        for recipe in rows:
+            recipe.current_cost = costs[recipe.pk]
+        return rows
 
-class RecipeDetailView(DetailView):
+class RecipeDetailView(FragmentCacheMixin, DetailView):
     model = Recipe
+    queryset = Recipe.objects.prefetch_related(
+        Prefetch('recipeingredient_set', queryset=RecipeIngredient.objects.select_related('ingredient'))
+    )
     template_name = 'recipes/recipe_detail.html'
+    fragment_template_name = 'recipes/includes/recipe_detail_content.html'
 
-class RecipeCreateView(LoginRequiredMixin, CreateView):
-    model = Recipe
-    form_class = RecipeForm
-    template_name = 'recipes/recipe_form.html'
-    success_url = reverse_lazy('recipes:recipe_list')
+    def get_fragment_versions(self):
+        return [('recipe', self.kwargs['pk'])]
+
+    def get_fragment_title(self):
+        return self.object.name
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
-        if self.request.POST:
-            data['ingredient_formset'] = IngredientFormSet(self.request.POST)
-        else:
-            data['ingredient_formset'] = IngredientFormSet()
+        data['cost'] = get_recipe_costs([self.object.pk])[self.object.pk]
+        data['portion_cost'] = (data['cost'].total / self.object.portions).quantize(CENT)
+        portions = self.request.GET.get('portions')
+        if portions:
+            try:
+                data['scaled'] = scale_recipes([(self.object.pk, Decimal(portions))])[0][0]
+            except (ArithmeticError, ValueError):
+                data['scaling_error'] = 'Portions must be a positive number.'
         return data
 
-    def form_valid(self, form):
-        context = self.get_context_data()
-        ingredient_formset = context['ingredient_formset']
-        with transaction.atomic():
-            self.object = form.save()
-            if ingredient_formset.is_valid():
-                ingredient_formset.instance = self.object
-                ingredient_formset.save()
-        return super().form_valid(form)
+class RecipeLinesMixin:
+    """Create and update a recipe together with its ingredient lines.
 
-class RecipeUpdateView(LoginRequiredMixin, UpdateView):
+    The recipe form and the line formset are built and validated once; the recipe is only
+    saved when both are valid, and the lines are written as a diff by save_recipe_lines.
+    """
     model = Recipe
     form_class = RecipeForm
     template_name = 'recipes/recipe_form.html'
     success_url = reverse_lazy('recipes:recipe_list')
 
+    def get_ingredient_formset(self):
+        data = self.request.POST if self.request.method == 'POST' else None
+        return IngredientFormSet(data, instance=self.object, prefix='ingredients')
+
     def get_context_data(self, **kwargs):
-        data = super().get_context_data(**kwargs)
-        if self.request.POST:
-            data['ingredient_formset'] = IngredientFormSet(self.request.POST, instance=self.object)
-        else:
-            data['ingredient_formset'] = IngredientFormSet(instance=self.object)
-        return data
+        if 'ingredient_formset' not in kwargs:
+            kwargs['ingredient_formset'] = self.get_ingredient_formset()
+        return super().get_context_data(**kwargs)
 
-    def form_valid(self, form):
-        context = self.get_context_data()
-        ingredient_formset = context['ingredient_formset']
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object() if self.pk_url_kwarg in kwargs else None
+        form = self.get_form()
+        ingredient_formset = self.get_ingredient_formset()
+        # Validate both so every error is shown at once.
+        if not all([form.is_valid(), ingredient_formset.is_valid()]):
+            return self.render_to_response(self.get_context_data(form=form, ingredient_formset=ingredient_formset))
         with transaction.atomic():
             self.object = form.save()
-            if ingredient_formset.is_valid():
-                ingredient_formset.instance = self.object
-                ingredient_formset.save()
-        return super().form_valid(form)
+            save_recipe_lines(self.object, ingredient_formset.cleaned_lines())
+        return HttpResponseRedirect(self.get_success_url())
+
+class RecipeCreateView(LoginRequiredMixin, RecipeLinesMixin, CreateView):
+    pass
+
+class RecipeUpdateView(LoginRequiredMixin, RecipeLinesMixin, UpdateView):
+    pass
 
 class RecipeDeleteView(LoginRequiredMixin, DeleteView):
     model = Recipe
     template_name = 'recipes/recipe_confirm_delete.html'
     success_url = reverse_lazy('recipes:recipe_list')
+
+# Search Views
+class RecipeSearchView(TemplateView):
+    template_name = 'recipes/search.html'
+
+    def get_context_data(self, **kwargs):
+        data = super().get_context_data(**kwargs)
+        data['query'] = self.request.GET.get('q', '').strip()
+        kind = self.request.GET.get('kind')
+        data['kind'] = kind if kind in KINDS else ''
+        data['results'] = search(data['query'], kind=data['kind'] or None) if data['query'] else []
+        return data
+
+class AutocompleteView(View):
+    http_method_names = ['get']
+    limit = 10
+
+    def get(self, request, *args, **kwargs):
+        kind = request.GET.get('kind')
+        results = autocomplete(request.GET.get('q', ''), kind=kind if kind in KINDS else None, limit=self.limit)
+        return JsonResponse({'results': [result.as_dict() for result in results]})
+
+# Report Views
+class RecipeCostHistoryExportView(ExportView):
+    dataset_class = RecipeCostHistoryDataset
+
+    def get_dataset(self):
+        months = self.request.GET.get('months', '12')
+        if not months.isdigit():
+            raise ValueError('months must be a whole number')
+        return self.dataset_class(int(months))
@@ -0,0 +1,46 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views import View
+
+from .cache_versions import get_versions
+
+PAYLOAD_TIMEOUT = 60 * 60 * 24
+
+
+class CachedJSONView(View):
+    """Read-only JSON resource whose serialized body is cached per resource version.
+
+    The ETag and Last-Modified headers are derived from the cache versions alone, so a
+    conditional request for an unchanged resource is answered with 304 without touching
+    the database or the serializer, and a warm hit is served from the cached bytes.
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    def get_version_keys(self, **kwargs):
+        raise NotImplementedError
+
+    def get_payload(self, **kwargs):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        versions = get_versions(self.get_version_keys(**kwargs))
+        etag = quote_etag(hashlib.md5(repr((request.path, versions)).encode()).hexdigest())
+        last_modified = max(versions) // 10**9
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            cache_key = f'api:payload:{etag}'
+            body = cache.get(cache_key)
+            if body is None:
+                body = json.dumps(self.get_payload(**kwargs), cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+                cache.set(cache_key, body, PAYLOAD_TIMEOUT)
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'no-cache'
+        return response
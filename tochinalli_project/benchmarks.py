@@ -0,0 +1,105 @@
+import json
+import math
+import subprocess
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+@dataclass
+class Result:
+    name: str
+    samples: list = field(default_factory=list)  # Seconds per run
+    queries: int = 0
+    peak_memory: int = 0  # Bytes allocated at the peak of one run
+
+    def as_dict(self):
+        return {
+            'p50_ms': round(percentile(self.samples, 50) * 1000, 3),
+            'p95_ms': round(percentile(self.samples, 95) * 1000, 3),
+            'p99_ms': round(percentile(self.samples, 99) * 1000, 3),
+            'max_ms': round(max(self.samples) * 1000, 3),
+            'queries': self.queries,
+            'peak_kb': round(self.peak_memory / 1024, 1),
+        }
+
+
+def measure(name, func, iterations=20, warmup=2):
+    """Time ``func`` over several runs, then count its queries and trace its memory in one run each.
+
+    Queries and memory are measured apart from the timed runs so neither instrument skews
+    the latencies.
+    """
+    for _ in range(warmup):
+        func()
+    result = Result(name)
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        result.samples.append(time.perf_counter() - started)
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    result.queries = len(queries)
+    tracemalloc.start()
+    try:
+        func()
+        result.peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as baseline:
+            return json.load(baseline)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as baseline:
+        json.dump({
+            'commit': current_commit(),
+            'results': {result.name: result.as_dict() for result in results},
+        }, baseline, indent=2, sort_keys=True)
+
+
+# Smallest change that counts as a regression, so sub-millisecond noise is not reported.
+MIN_CHANGE = {'p50_ms': 1, 'p95_ms': 1, 'peak_kb': 64}
+
+
+def regressions(results, baseline, tolerance=0.25):
+    """(name, metric, baseline value, current value) for every metric worse than the baseline.
+
+    Latency and memory may grow by ``tolerance`` before they count, query counts may not grow at all.
+    """
+    found = []
+    previous = (baseline or {}).get('results', {})
+    for result in results:
+        before = previous.get(result.name)
+        if before is None:
+            continue
+        now = result.as_dict()
+        for metric, min_change in MIN_CHANGE.items():
+            if now[metric] > before[metric] * (1 + tolerance) and now[metric] - before[metric] >= min_change:
+                found.append((result.name, metric, before[metric], now[metric]))
+        if now['queries'] > before['queries']:
+            found.append((result.name, 'queries', before['queries'], now['queries']))
+    return found
@@ -0,0 +1,60 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIX = 'version'
+
+
+def version_key(*parts):
+    return ':'.join([PREFIX, *map(str, parts)])
+
+
+def get_version(*parts):
+    """Current version of a cached resource, a nanosecond timestamp of its last change.
+
+    A resource that has no version yet (or whose version was evicted) gets a fresh one, so
+    anything cached under an older version is never served again.
+    """
+    key = version_key(*parts)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(*parts):
+    bump_versions([parts])
+
+
+def bump_versions(keys):
+    """Give several resources a new version now, and again once the current transaction commits.
+
+    The second bump orphans anything a concurrent reader cached from the not yet committed
+    state between the two.
+    """
+    keys = [version_key(*parts) for parts in keys]
+    if not keys:
+        return
+
+    def bump():
+        now = time.time_ns()
+        cache.set_many({key: now for key in keys}, None)
+
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def get_versions(keys):
+    """Versions for several resources in one cache round trip."""
+    keys = [version_key(*parts) for parts in keys]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        now = time.time_ns()
+        cache.set_many({key: now for key in missing}, None)
+        found.update(dict.fromkeys(missing, now))
+    return [found[key] for key in keys]
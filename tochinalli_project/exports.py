@@ -0,0 +1,76 @@
+import csv
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.views import View
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class Dataset:
+    """A table exported row by row from a server-side cursor."""
+    name = None
+    columns = ()
+
+    def rows(self):
+        raise NotImplementedError
+
+    def records(self):
+        for row in self.rows():
+            yield dict(zip(self.columns, row))
+
+    def csv_lines(self):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.columns)
+        for row in self.rows():
+            yield writer.writerow(row)
+
+    def jsonl_lines(self):
+        encoder = DjangoJSONEncoder(separators=(',', ':'))
+        for record in self.records():
+            yield encoder.encode(record) + '\n'
+
+    def stream(self, fmt, batch=500):
+        """Yield the export as text in batches of lines, keeping the number of writes low."""
+        lines = self.csv_lines() if fmt == 'csv' else self.jsonl_lines()
+        buffer = []
+        for line in lines:
+            buffer.append(line)
+            if len(buffer) == batch:
+                yield ''.join(buffer)
+                buffer = []
+        if buffer:
+            yield ''.join(buffer)
+
+
+def export_response(dataset, fmt):
+    response = StreamingHttpResponse(dataset.stream(fmt), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{dataset.name}.{fmt}"'
+    return response
+
+
+class ExportView(LoginRequiredMixin, View):
+    dataset_class = None
+
+    def get_dataset(self):
+        return self.dataset_class()
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in FORMATS:
+            return HttpResponseBadRequest(f"Unknown format '{fmt}', use one of: {', '.join(FORMATS)}")
+        try:
+            dataset = self.get_dataset()
+        except ValueError as error:
+            return HttpResponseBadRequest(str(error))
+        return export_response(dataset, fmt)
@@ -0,0 +1,55 @@
+import hashlib
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .cache_versions import get_versions
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
+class FragmentCacheMixin:
+    """Caches the rendered main content of a page under the versions of what it shows.
+
+    The versions are read before anything is rendered, so a warm hit only wraps the
+    cached fragment in the page shell without touching the database, and a fragment
+    rendered while its data changes is stored under a version that is already stale.
+    """
+    fragment_template_name = None
+    fragment_timeout = FRAGMENT_TIMEOUT
+
+    def get_fragment_versions(self):
+        raise NotImplementedError
+
+    def get_fragment_title(self):
+        return ''
+
+    def use_fragment_cache(self):
+        return self.request.method in ('GET', 'HEAD')
+
+    def get(self, request, *args, **kwargs):
+        self.fragment_key = None
+        if self.use_fragment_cache():
+            versions = get_versions(self.get_fragment_versions())
+            digest = hashlib.md5(repr((self.fragment_template_name, request.get_full_path(), versions)).encode()).hexdigest()
+            self.fragment_key = f'fragment:{digest}'
+            cached = cache.get(self.fragment_key)
+            if cached is not None:
+                title, fragment = cached
+                # The page template is named directly, list and detail views derive theirs from the object.
+                return self.response_class(
+                    request=request,
+                    template=[self.template_name],
+                    context={'view': self, 'fragment_title': title, 'fragment': mark_safe(fragment)},
+                    using=self.template_engine,
+                )
+        return super().get(request, *args, **kwargs)
+
+    def render_to_response(self, context, **response_kwargs):
+        title = self.get_fragment_title()
+        fragment = render_to_string(self.fragment_template_name, context, self.request)
+        if self.fragment_key:
+            cache.set(self.fragment_key, (title, fragment), self.fragment_timeout)
+        context.update(fragment_title=title, fragment=mark_safe(fragment))
+        return super().render_to_response(context, **response_kwargs)
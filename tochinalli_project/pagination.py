@@ -0,0 +1,150 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.template import engines
+from django.template.loader import render_to_string
+
+STREAM_PLACEHOLDER = '<!--rows-->'
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+
+
+class KeysetPaginationMixin:
+    """Cursor pagination for list views over a stable (sort field, pk) order.
+
+    Each page is an indexed range scan starting after the last row of the previous page,
+    so its cost does not grow with the page number. ``?stream=1`` renders the whole
+    filtered list as a streaming response, one chunk of rows at a time.
+    """
+    page_size = 50
+    stream_chunk_size = 2000
+    sort_fields = {}  # sort parameter -> model field
+    default_sort = None
+    filter_fields = {}  # query parameter -> lookup
+    row_template_name = None
+
+    def get_sort(self):
+        sort = self.request.GET.get('sort', self.default_sort or '')
+        descending = sort.startswith('-')
+        field = self.sort_fields.get(sort.lstrip('-'))
+        if field is None:
+            return 'pk', False
+        return field, descending
+
+    def get_filters(self):
+        filters = {}
+        for param, lookup in self.filter_fields.items():
+            value = self.request.GET.get(param)
+            if value:
+                filters[lookup] = value
+        return filters
+
+    def get_queryset(self):
+        queryset = super().get_queryset().filter(**self.get_filters())
+        field, descending = self.get_sort()
+        order = [f'-{field}', '-pk'] if descending else [field, 'pk']
+        if field == 'pk':
+            order = order[:1]
+        return queryset.order_by(*order)
+
+    def get_cursor(self, queryset):
+        """(value, pk) to continue after, None on the first page or for a cursor this view did not make."""
+        values = decode_cursor(self.request.GET.get('cursor', ''))
+        field, descending = self.get_sort()
+        if not isinstance(values, list) or len(values) != (1 if field == 'pk' else 2) or None in values:
+            return None
+        model = queryset.model
+        *path, name = field.split('__')
+        for part in path:
+            model = model._meta.get_field(part).related_model
+        try:
+            pk = queryset.model._meta.pk.to_python(values[-1])
+            value = model._meta.get_field(name).to_python(values[0]) if field != 'pk' else pk
+        except ValidationError:
+            return None
+        return value, pk
+
+    def get_page_queryset(self, queryset):
+        cursor = self.get_cursor(queryset)
+        if cursor is None:
+            return queryset
+        field, descending = self.get_sort()
+        after = 'lt' if descending else 'gt'
+        value, pk = cursor
+        if field == 'pk':
+            return queryset.filter(**{f'pk__{after}': pk})
+        # The redundant bound lets the database start the index scan at the cursor instead of the first row.
+        bound = queryset.filter(**{f'{field}__{after}e': value})
+        return bound.filter(Q(**{f'{field}__{after}': value}) | Q(**{field: value, f'pk__{after}': pk}))
+
+    def cursor_for(self, obj):
+        field, descending = self.get_sort()
+        if field == 'pk':
+            return encode_cursor([obj.pk])
+        value = obj
+        for part in field.split('__'):
+            value = getattr(value, part)
+        return encode_cursor([str(value) if value is not None else None, obj.pk])
+
+    def prepare_rows(self, rows):
+        return rows
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get('stream'):
+            self.object_list = self.get_queryset()
+            return self.stream_response()
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        rows = list(self.get_page_queryset(self.object_list)[: self.page_size + 1])
+        has_next = len(rows) > self.page_size
+        rows = self.prepare_rows(rows[: self.page_size])
+        context = super().get_context_data(object_list=rows, **kwargs)
+        context['row_template_name'] = self.row_template_name
+        context['first_page_url'] = self.page_url(None) if 'cursor' in self.request.GET else None
+        context['next_page_url'] = self.page_url(self.cursor_for(rows[-1])) if has_next else None
+        context['stream_url'] = self.page_url(None, stream=1)
+        return context
+
+    def page_url(self, cursor, **extra):
+        params = self.request.GET.copy()
+        params.pop('cursor', None)
+        if cursor:
+            params['cursor'] = cursor
+        params.update(extra)
+        return f'?{params.urlencode()}' if params else '?'
+
+    def stream_response(self):
+        context = super().get_context_data(object_list=[])
+        context['streaming'] = STREAM_PLACEHOLDER
+        page = render_to_string(self.get_template_names(), context, self.request)
+        head, tail = page.split(STREAM_PLACEHOLDER, 1)
+        rows_template = engines['django'].from_string(
+            '{% for item in rows %}{% include row_template_name %}{% endfor %}'
+        )
+
+        def render():
+            yield head
+            chunk = []
+            for obj in self.object_list.iterator(chunk_size=self.stream_chunk_size):
+                chunk.append(obj)
+                if len(chunk) == self.stream_chunk_size:
+                    yield rows_template.render({'rows': self.prepare_rows(chunk), 'row_template_name': self.row_template_name})
+                    chunk = []
+            if chunk:
+                yield rows_template.render({'rows': self.prepare_rows(chunk), 'row_template_name': self.row_template_name})
+            yield tail
+
+        return StreamingHttpResponse(render(), content_type='text/html; charset=utf-8')
@@ -0,0 +1,215 @@
+import bisect
+import contextvars
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponseRedirect
+from django.template.backends.django import Template
+from django.views.generic import TemplateView
+
+# Upper bounds in milliseconds of the latency histogram buckets, the last one is open ended.
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+NUMBERS = re.compile(r'\b\d+\b')
+PLACEHOLDER_LISTS = re.compile(r'\((?:%s, )+%s\)')
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+@dataclass
+class RequestProfile:
+    started: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    sql_time: float = 0.0
+    template_time: float = 0.0
+    template_sql_time: float = 0.0  # SQL run while a template renders, e.g. lazy querysets
+    template_depth: int = 0
+    statements: Counter = field(default_factory=Counter)
+
+    def timings(self):
+        """(total, sql, templates, python) in milliseconds, each one excluding the others."""
+        total = (time.perf_counter() - self.started) * 1000
+        sql = self.sql_time * 1000
+        templates = (self.template_time - self.template_sql_time) * 1000
+        return total, sql, templates, max(total - sql - templates, 0.0)
+
+
+def record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        profile.queries += 1
+        profile.sql_time += elapsed
+        if profile.template_depth:
+            profile.template_sql_time += elapsed
+        # Literals and parameter lists are folded so "IN (1, 2)" and "IN (3, 4, 5)" count as one statement.
+        profile.statements[PLACEHOLDER_LISTS.sub('(%s, ...)', NUMBERS.sub('?', sql))] += 1
+
+
+def install_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+_original_render = Template.render
+
+
+def timed_render(self, context=None, request=None):
+    profile = _current.get()
+    if profile is None:
+        return _original_render(self, context, request)
+    profile.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        profile.template_depth -= 1
+        if not profile.template_depth:
+            profile.template_time += time.perf_counter() - started
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    sql_ms: float = 0.0
+    queries: int = 0
+    buckets: list = field(default_factory=lambda: [0] * len(BUCKETS))
+    repeated: dict = field(default_factory=dict)  # statement -> [requests repeating it, most repetitions in one request]
+
+    def add(self, total, sql, queries, repeated):
+        self.requests += 1
+        self.total_ms += total
+        self.max_ms = max(self.max_ms, total)
+        self.sql_ms += sql
+        self.queries += queries
+        self.buckets[bisect.bisect_left(BUCKETS, total)] += 1
+        for statement, count in repeated:
+            seen = self.repeated.setdefault(statement, [0, 0])
+            seen[0] += 1
+            seen[1] = max(seen[1], count)
+
+    def percentile(self, p):
+        """Upper bound of the histogram bucket holding the p-th percentile, capped at the slowest request."""
+        rank, seen = p / 100 * self.requests, 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+class ProfilingStats:
+    """Per URL name aggregates, shared by every thread of the process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def add(self, name, total, sql, queries, repeated):
+        with self.lock:
+            self.endpoints.setdefault(name, EndpointStats()).add(total, sql, queries, repeated)
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+
+    def slowest(self, limit=20):
+        with self.lock:
+            rows = [
+                {
+                    'name': name,
+                    'requests': endpoint.requests,
+                    'mean_ms': endpoint.total_ms / endpoint.requests,
+                    'p95_ms': endpoint.percentile(95),
+                    'max_ms': endpoint.max_ms,
+                    'mean_queries': endpoint.queries / endpoint.requests,
+                    'mean_sql_ms': endpoint.sql_ms / endpoint.requests,
+                }
+                for name, endpoint in self.endpoints.items()
+            ]
+        return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)[:limit]
+
+    def repeated_queries(self, limit=20):
+        with self.lock:
+            rows = [
+                {'name': name, 'sql': statement, 'requests': requests, 'max_repetitions': repetitions}
+                for name, endpoint in self.endpoints.items()
+                for statement, (requests, repetitions) in endpoint.repeated.items()
+            ]
+        return sorted(rows, key=lambda row: (row['max_repetitions'], row['requests']), reverse=True)[:limit]
+
+
+stats = ProfilingStats()
+
+
+class ProfilingMiddleware:
+    """Opt-in request profiling, enabled by the PROFILING_ENABLED setting.
+
+    Adds a Server-Timing header with SQL, template, Python and total time and feeds the
+    per URL name statistics. When disabled the middleware removes itself at startup, so
+    requests pay nothing for it. Connections opened by other threads, such as the
+    sync_to_async workers behind the async ORM, record their queries into the profile of
+    the request whose context they run in.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.repeat_threshold = getattr(settings, 'PROFILING_REPEATED_QUERY_THRESHOLD', 5)
+        Template.render = timed_render
+        connection_created.connect(install_recorder, dispatch_uid='profiling_install_recorder')
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as wrappers:
+                for alias in connections:
+                    if record_query not in connections[alias].execute_wrappers:
+                        wrappers.enter_context(connections[alias].execute_wrapper(record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total, sql, templates, python = profile.timings()
+        response['Server-Timing'] = (
+            f'sql;dur={sql:.1f};desc="{profile.queries} queries", tpl;dur={templates:.1f}, '
+            f'app;dur={python:.1f}, total;dur={total:.1f}'
+        )
+        match = request.resolver_match
+        repeated = [(statement, count) for statement, count in profile.statements.items() if count >= self.repeat_threshold]
+        stats.add(match.view_name if match else 'unresolved', total, sql, profile.queries, repeated)
+        return response
+
+
+class ProfilingStatsView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    template_name = 'profiling_stats.html'
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get_context_data(self, **kwargs):
+        data = super().get_context_data(**kwargs)
+        data['enabled'] = getattr(settings, 'PROFILING_ENABLED', False)
+        data['slowest'] = stats.slowest()
+        data['repeated'] = stats.repeated_queries()
+        return data
+
+    def post(self, request, *args, **kwargs):
+        stats.reset()
+        return HttpResponseRedirect(request.path)
@@ -0,0 +1,83 @@
+import contextvars
+import random
+from contextlib import contextmanager, nullcontext
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'read_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_pinned = contextvars.ContextVar('read_from_primary', default=False)
+
+
+@contextmanager
+def pin_to_primary():
+    """Send every read in the block to the primary, e.g. right after writing."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Writes go to the primary, reads to one of settings.DATABASE_REPLICAS.
+
+    Reads stay on the primary when there are no replicas, inside pin_to_primary(), and
+    inside a transaction on the primary, which must see its own uncommitted rows.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        if not replicas or _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryStickinessMiddleware:
+    """Read your own writes: unsafe requests, and a client's requests for a few seconds after
+    one, read from the primary instead of a replica that may not have caught up yet.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.pinning(request):
+            response = self.get_response(request)
+        return self.stick(request, response)
+
+    async def __acall__(self, request):
+        with self.pinning(request):
+            response = await self.get_response(request)
+        return self.stick(request, response)
+
+    def pinning(self, request):
+        if request.method not in SAFE_METHODS or STICKY_COOKIE in request.COOKIES:
+            return pin_to_primary()
+        return nullcontext()
+
+    def stick(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 10), httponly=True, samesite='Lax',
+            )
+        return response
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,18 +41,28 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     'recipes',
     'inventory',
+    'jobs',
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # Before anything that reads, so sessions are read from the primary too when pinned.
+    "tochinalli_project.routers.PrimaryStickinessMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "tochinalli_project.profiling.ProfilingMiddleware",
 ]
 
+# Request profiling: Server-Timing headers and per URL stats at /profiling/.
+# The middleware removes itself unless this is set.
+PROFILING_ENABLED = os.environ.get("TOCHINALLI_PROFILING") == "1"
+# A statement run this many times in one request is reported as a likely N+1 query.
+PROFILING_REPEATED_QUERY_THRESHOLD = 5
+
 ROOT_URLCONF = "tochinalli_project.urls"
 
 TEMPLATES = [
@@ -74,13 +86,65 @@ WSGI_APPLICATION = "tochinalli_project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# WAL lets readers and the writer work at the same time, NORMAL sync is safe with WAL and
+# skips an fsync per commit. The busy timeout is the "timeout" option.
+SQLITE_INIT_COMMAND = "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL"
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        # Writers take the lock when the transaction starts and queue behind each other
+        # instead of failing when a read turns into a write.
+        "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20, "init_command": SQLITE_INIT_COMMAND},
+        # Keep connections open between requests, checking them before reuse.
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        # A file rather than shared in-memory database, so threads wait on locks like they do in
+        # production. It lives in the temporary directory to keep it and its WAL out of the tree.
+        "TEST": {"NAME": Path(tempfile.gettempdir()) / "tochinalli_test.sqlite3"},
+    },
+    # Read-only copy that tochinalli_project.routers.PrimaryReplicaRouter sends reads to when
+    # listed in DATABASE_REPLICAS. Locally it is a second SQLite file kept in step with
+    # "manage.py sync_replica"; without TOCHINALLI_REPLICA_DB it is the primary file.
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("TOCHINALLI_REPLICA_DB", BASE_DIR / "db.sqlite3"),
+        "OPTIONS": {"timeout": 20, "init_command": SQLITE_INIT_COMMAND + "; PRAGMA query_only=1"},
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "TEST": {"MIRROR": "default"},
+    },
 }
 
+DATABASE_ROUTERS = ["tochinalli_project.routers.PrimaryReplicaRouter"]
+# Aliases reads are spread over, writes always go to "default".
+DATABASE_REPLICAS = ["replica"] if os.environ.get("TOCHINALLI_REPLICA_DB") else []
+# After a POST, the client reads from the primary for this long so it sees its own writes.
+REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is enough for a single process. Several worker processes on one node
+# should share a file based cache so version bumps reach all of them.
+
+if os.environ.get("TOCHINALLI_CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["TOCHINALLI_CACHE_DIR"],
+            "OPTIONS": {"MAX_ENTRIES": 50000},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": 50000},
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -118,6 +182,10 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Background jobs
+# Files handed over to "manage.py run_jobs", such as price lists uploaded for a background import.
+JOB_FILES_ROOT = BASE_DIR / "job_files"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
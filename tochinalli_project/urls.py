@@ -1,8 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .profiling import ProfilingStatsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('recipes/', include('recipes.urls')),
     path('inventory/', include('inventory.urls')),
+    path('jobs/', include('jobs.urls')),
+    path('api/', include('recipes.api_urls')),
+    path('api/', include('inventory.api_urls')),
+    path('profiling/', ProfilingStatsView.as_view(), name='profiling_stats'),
 ]